@@ -2,7 +2,14 @@ import asyncio
 import os
 
 from aiohttp import web
-from slurk_setup_descil.chatbot import Chatbot
+from slurk_setup_descil.chatbot import (
+    Chatbot,
+    completion_metrics,
+    llm_usage,
+    prompt_metrics,
+    reply_metrics,
+)
+from slurk_setup_descil.slurk_api import close_client, open_client
 
 SLURK_HOST = os.environ.get("SLURK_HOST", "http://localhost")
 SLURK_PORT = os.environ.get("SLURK_PORT", "8088")
@@ -12,6 +19,7 @@ app = web.Application()
 routes = web.RouteTableDef()
 
 _async_tasks = dict()
+_bots = dict()
 
 
 @routes.post("/register")
@@ -24,7 +32,31 @@ async def register(request):
     )
     task = asyncio.create_task(bot.run())
     _async_tasks[id(bot)] = task
+    _bots[id(bot)] = bot
+    task.add_done_callback(lambda _: _forget(id(bot)))
     return web.Response()
 
 
+def _forget(key):
+    _async_tasks.pop(key, None)
+    _bots.pop(key, None)
+
+
+@routes.get("/metrics")
+async def metrics(request):
+    replies = reply_metrics()
+    replies["pending"] = sum(bot.replies.pending() for bot in _bots.values())
+    return web.json_response(
+        dict(
+            bots=len(_bots),
+            replies=replies,
+            llm=llm_usage(),
+            prompts=prompt_metrics(),
+            completions=completion_metrics(),
+        )
+    )
+
+
 app.add_routes(routes)
+app.on_startup.append(open_client)
+app.on_cleanup.append(close_client)
@@ -4,6 +4,8 @@ import os
 
 from aiohttp import web
 from slurk_setup_descil.concierge_plus import ConciergeBot
+from slurk_setup_descil.slurk_api import close_client, open_client
+from slurk_setup_descil.timers import timer_metrics
 
 LOG = logging.getLogger(__name__)
 
@@ -35,4 +37,12 @@ async def register(request):
     return web.Response()
 
 
+@routes.get("/metrics")
+async def metrics(request):
+    running = sum(not task.done() for task in _async_tasks.values())
+    return web.json_response(dict(bots=running, timers=timer_metrics()))
+
+
 app.add_routes(routes)
+app.on_startup.append(open_client)
+app.on_cleanup.append(close_client)
@@ -0,0 +1,3 @@
+from slurk_setup_descil.fake_openai_api.core import app
+
+__all__ = ["app"]
@@ -0,0 +1,3 @@
+from slurk_setup_descil.fake_openai import FakeOpenAI
+
+app = FakeOpenAI().app()
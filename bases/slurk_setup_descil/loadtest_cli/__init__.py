@@ -0,0 +1,3 @@
+from slurk_setup_descil.loadtest_cli.core import main
+
+__all__ = ["main"]
@@ -0,0 +1,91 @@
+"""Load test a running setup, e.g. `docker compose --profile loadtest up`
+
+    loadtest --experiments 20 --participants 2 --output results.json
+    loadtest --baseline results.json --tolerance 0.2
+
+Exits with status 1 if a p95 latency regressed against the baseline.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+
+from slurk_setup_descil.loadtest import regressions, run
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--setup-url", default="http://localhost:8789")
+    parser.add_argument("--slurk-url", default="http://localhost:8788")
+    parser.add_argument("--api-token", default="666")
+    parser.add_argument("--experiments", type=int, default=10)
+    parser.add_argument("--participants", type=int, default=2)
+    parser.add_argument("--messages", type=int, default=5, help="per participant")
+    parser.add_argument(
+        "--think-time", type=float, default=3, help="mean seconds between messages"
+    )
+    parser.add_argument(
+        "--ramp-up", type=float, default=10, help="seconds to start all experiments"
+    )
+    parser.add_argument("--bot-ids", type=int, nargs="+", default=[1])
+    parser.add_argument("--chatbot-name", default="Ash")
+    parser.add_argument("--redirect-timeout", type=int, default=120)
+    parser.add_argument("--chat-seconds", type=int, default=300)
+    parser.add_argument(
+        "--linger", type=float, default=10, help="seconds to wait for replies"
+    )
+    parser.add_argument(
+        "--resources",
+        action="store_true",
+        help="sample CPU and memory of the containers with docker stats",
+    )
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    return parser.parse_args(argv)
+
+
+def print_summary(results):
+    print(f"{results['messages']} messages in {results['duration']:.1f} s")
+    for metric, summary in results["latencies"].items():
+        if not summary["count"]:
+            print(f"  {metric:<10} no samples")
+            continue
+        print(
+            f"  {metric:<10} n={summary['count']:<6}"
+            f" p50 {summary['p50'] * 1000:8.1f} ms"
+            f"  p95 {summary['p95'] * 1000:8.1f} ms"
+            f"  p99 {summary['p99'] * 1000:8.1f} ms"
+        )
+    for kind, count in results["errors"].items():
+        print(f"  error {kind}: {count}")
+    for name, usage in (results["resources"] or {}).items():
+        cpu, memory = usage["cpu_percent"], usage["memory_mb"]
+        print(
+            f"  {name:<30} cpu mean {cpu['mean']:6.1f} % max {cpu['max']:6.1f} %"
+            f"  memory max {memory['max']:8.1f} MiB"
+        )
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    baseline, tolerance = args.baseline, args.tolerance
+    results = asyncio.run(run(args))
+    print_summary(results)
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+    if baseline:
+        with open(baseline) as fh:
+            regressed = regressions(results, json.load(fh), tolerance)
+        for metric, p95 in regressed.items():
+            print(f"REGRESSION {metric}: p95 {p95['baseline']:.3f} -> {p95['p95']:.3f}")
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ import os
 
 from aiohttp import web
 from slurk_setup_descil.managerbot import Managerbot
+from slurk_setup_descil.slurk_api import close_client, open_client
+from slurk_setup_descil.timers import timer_metrics
 
 SLURK_HOST = os.environ.get("SLURK_HOST", "http://localhost")
 SLURK_PORT = os.environ.get("SLURK_PORT", "8088")
@@ -27,4 +29,12 @@ async def register(request):
     return web.Response()
 
 
+@routes.get("/metrics")
+async def metrics(request):
+    running = sum(not task.done() for task in _async_tasks.values())
+    return web.json_response(dict(bots=running, timers=timer_metrics()))
+
+
 app.add_routes(routes)
+app.on_startup.append(open_client)
+app.on_cleanup.append(close_client)
@@ -1,25 +1,30 @@
 import os
 import traceback
 import uuid
+from contextlib import asynccontextmanager
 from typing import List
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from slurk_setup_descil.setup_service import (
-    create_waiting_room_tokens,
-    setup_and_register_concierge,
-    setup_chat_room,
-    setup_waiting_room,
-)
-from slurk_setup_descil.slurk_api import get_api_token
+from slurk_setup_descil.setup_service import provision_experiment
+from slurk_setup_descil.slurk_api import close_client, get_api_token, open_client
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await open_client()
+    yield
+    await close_client()
+
+
+app = FastAPI(lifespan=lifespan)
 
 SLURK_HOST = os.environ.get("SLURK_HOST", "http://slurk")
 SLURK_PORT = os.environ.get("SLURK_PORT", "80")
 CONCIERGE_URL = os.environ.get("CONCIERGE_URL", "http://localhost:83")
 CHATBOT_URL = os.environ.get("CHATBOT_URL", "http://localhost:84")
+SETUP_MAX_CONCURRENCY = int(os.environ.get("SETUP_MAX_CONCURRENCY", "8"))
 
 
 @app.exception_handler(Exception)
@@ -62,42 +67,21 @@ async def setup(setup_data: SetupData):
     if api_token != submittted_api_token:
         raise HTTPException(status_code=401, detail="api token invalid.")
 
-    num_users = setup_data.num_users
-
     slurk_url = f"{SLURK_HOST}:{SLURK_PORT}"
 
-    waiting_room_id, waiting_room_task_id = await setup_waiting_room(
-        slurk_url,
-        api_token,
-        num_users,
-        setup_data.chat_room_timeout_seconds,
-    )
     setup = setup_data.dict()
-
-    user_tokens = await create_waiting_room_tokens(
-        slurk_url, api_token, waiting_room_id, waiting_room_task_id, num_users
-    )
-
-    chat_room_id, _ = await setup_chat_room(slurk_url, api_token, num_users)
-    setup.update(
-        dict(
-            waiting_room_id=waiting_room_id,
-            waiting_room_task_id=waiting_room_task_id,
-            user_tokens=user_tokens,
-            chat_room_id=chat_room_id,
-        )
-    )
-
-    request_id = uuid.uuid1().hex
-
-    await setup_and_register_concierge(
+    timings = await provision_experiment(
         slurk_url,
         CONCIERGE_URL,
         setup,
+        max_concurrency=SETUP_MAX_CONCURRENCY,
     )
 
+    request_id = uuid.uuid1().hex
+
     return dict(
-        user_tokens=user_tokens,
+        user_tokens=setup["user_tokens"],
         request_id=request_id,
-        chat_room_id=chat_room_id,
+        chat_room_id=setup["chat_room_id"],
+        timings=timings,
     )
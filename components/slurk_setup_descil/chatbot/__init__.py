@@ -1,3 +1,17 @@
+from slurk_setup_descil.chatbot.completion_cache import completion_metrics
+from slurk_setup_descil.chatbot.context import Conversation
 from slurk_setup_descil.chatbot.core import Chatbot
+from slurk_setup_descil.chatbot.gpt_bot import llm_usage
+from slurk_setup_descil.chatbot.prompt_cache import PromptCache, prompt_metrics
+from slurk_setup_descil.chatbot.scheduler import ReplyScheduler, reply_metrics
 
-__all__ = ["Chatbot"]
+__all__ = [
+    "Chatbot",
+    "Conversation",
+    "PromptCache",
+    "ReplyScheduler",
+    "completion_metrics",
+    "llm_usage",
+    "prompt_metrics",
+    "reply_metrics",
+]
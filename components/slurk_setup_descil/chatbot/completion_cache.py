@@ -0,0 +1,406 @@
+"""Content addressed cache and replay of chat completions.
+
+`AI_COMPLETION_CACHE` selects the mode:
+
+- `off` (default): every completion is requested from the provider.
+- `cache`: completions are served from the store if the model, the
+  parameters and the messages match a recorded one, otherwise they are
+  requested and recorded.
+- `record`: every completion is requested and recorded.
+- `replay`: completions are only served from the store, no provider is
+  needed. Each answer is delayed by the latency it had when it was
+  recorded, so load tests see the latency distribution of the recording.
+  Requests that were never recorded get a recorded completion with the
+  same model, parameters and first message, picked by the hash of the
+  messages.
+
+Identical requests, like the gating question asked for every message, are
+told apart by how often they were made before in this process. The n-th
+one is stored as variant n, up to `AI_COMPLETION_CACHE_VARIANTS`
+variants, so the cache keeps the different answers and their latencies.
+A replay serves the variants of a request in turn.
+
+Recordings are kept in the SQLite database `AI_COMPLETION_CACHE_PATH`.
+Beyond `AI_COMPLETION_CACHE_SIZE` completions the least recently used
+ones are evicted. Streamed and plain completions share their recordings,
+a streamed completion is recorded once the stream is complete.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict, namedtuple
+
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+LOG = logging.getLogger(__name__)
+
+MODES = ("off", "cache", "record", "replay")
+
+CACHE_SIZE = int(os.environ.get("AI_COMPLETION_CACHE_SIZE", "100000"))
+MEMORY_SIZE = int(os.environ.get("AI_COMPLETION_CACHE_MEMORY", "1024"))
+VARIANTS = int(os.environ.get("AI_COMPLETION_CACHE_VARIANTS", "32"))
+# `last_used` is written in batches of this many hits, or with the next put
+TOUCH_BATCH = 256
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    key TEXT NOT NULL,
+    variant INTEGER NOT NULL,
+    params_key TEXT NOT NULL,
+    response TEXT NOT NULL,
+    first_latency REAL NOT NULL,
+    latency REAL NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (key, variant)
+);
+CREATE INDEX IF NOT EXISTS ix_recordings_params_key ON recordings (params_key);
+CREATE INDEX IF NOT EXISTS ix_recordings_last_used ON recordings (last_used);
+"""
+
+
+class CompletionNotRecorded(Exception):
+    pass
+
+
+def get_mode():
+    mode = os.getenv("AI_COMPLETION_CACHE", "").lower().strip() or "off"
+    if mode not in MODES:
+        raise ValueError(f"Unknown AI_COMPLETION_CACHE {mode!r}, use one of {MODES}")
+    return mode
+
+
+def _digest(value):
+    data = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def keys(params):
+    """Key of the completion and key of its model, parameters and prompt
+
+    The prompt is the first message, the system prompt of a reply or the
+    question of the gating.
+    """
+    params = {k: v for k, v in params.items() if k != "stream"}
+    messages = params.pop("messages", None) or [None]
+    return (
+        _digest(dict(params, messages=messages)),
+        _digest(dict(params, prompt=messages[0])),
+    )
+
+
+# the completion as JSON and the seconds until its first chunk and its end
+Recording = namedtuple("Recording", "response first_latency latency")
+
+
+class CompletionStore:
+    """Recorded completions in SQLite with a LRU of the recently used ones"""
+
+    def __init__(self, path, size=None, memory_size=None):
+        self.path = path
+        self.size = CACHE_SIZE if size is None else size
+        self.memory_size = MEMORY_SIZE if memory_size is None else memory_size
+        self.stats = Counter()
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        (self._count,) = self._db.execute("SELECT count(*) FROM recordings").fetchone()
+        # (key, variant) -> time of the last hit not written yet
+        self._touched = {}
+
+    def _touch(self, key):
+        self._touched[key] = time.time()
+        if len(self._touched) >= TOUCH_BATCH:
+            with self._db:
+                self._write_touched()
+
+    def _write_touched(self):
+        self._db.executemany(
+            "UPDATE recordings SET last_used = ? WHERE key = ? AND variant = ?",
+            [(used, key, variant) for (key, variant), used in self._touched.items()],
+        )
+        self._touched.clear()
+
+    def _remember(self, key, recording):
+        self._memory[key] = recording
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, key, variant=0):
+        with self._lock:
+            recording = self._memory.get((key, variant))
+            if recording is None:
+                row = self._db.execute(
+                    "SELECT response, first_latency, latency FROM recordings"
+                    " WHERE key = ? AND variant = ?",
+                    (key, variant),
+                ).fetchone()
+                if row is None:
+                    return None
+                recording = Recording(*row)
+            self._remember((key, variant), recording)
+            self._touch((key, variant))
+            return recording
+
+    def variants(self, key):
+        """The number of recordings of `key`"""
+        with self._lock:
+            (count,) = self._db.execute(
+                "SELECT count(*) FROM recordings WHERE key = ?", (key,)
+            ).fetchone()
+            return count
+
+    def pick(self, key, params_key):
+        """A recording with the same `params_key`, chosen by `key`"""
+        with self._lock:
+            (count,) = self._db.execute(
+                "SELECT count(*) FROM recordings WHERE params_key = ?", (params_key,)
+            ).fetchone()
+            if not count:
+                return None
+            row = self._db.execute(
+                "SELECT response, first_latency, latency FROM recordings"
+                " WHERE params_key = ? ORDER BY key, variant LIMIT 1 OFFSET ?",
+                (params_key, int(key, 16) % count),
+            ).fetchone()
+            return Recording(*row)
+
+    def put(self, key, params_key, recording, variant=0):
+        now = time.time()
+        with self._lock, self._db:
+            self._write_touched()
+            exists = self._db.execute(
+                "SELECT 1 FROM recordings WHERE key = ? AND variant = ?",
+                (key, variant),
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO recordings VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    variant,
+                    params_key,
+                    recording.response,
+                    recording.first_latency,
+                    recording.latency,
+                    now,
+                    now,
+                ),
+            )
+            if exists is None:
+                self._count += 1
+            self._remember((key, variant), recording)
+            if self._count > self.size:
+                evict = self._count - self.size
+                self._db.execute(
+                    "DELETE FROM recordings WHERE rowid IN (SELECT rowid FROM"
+                    " recordings ORDER BY last_used LIMIT ?)",
+                    (evict,),
+                )
+                (self._count,) = self._db.execute(
+                    "SELECT count(*) FROM recordings"
+                ).fetchone()
+                self._memory.clear()
+                self.stats["evicted"] += evict
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        with self._lock:
+            with self._db:
+                self._write_touched()
+            self._db.close()
+
+
+class RecordingStream:
+    """Pass the chunks of a stream through and record the whole completion"""
+
+    def __init__(self, stream, on_complete, started):
+        self._stream = stream
+        self._on_complete = on_complete
+        self._started = started
+
+    async def __aiter__(self):
+        first = None
+        chunks = []
+        async for chunk in self._stream:
+            if first is None:
+                first = time.perf_counter() - self._started
+            chunks.append(chunk)
+            yield chunk
+        if chunks:
+            await self._on_complete(
+                _from_chunks(chunks), first, time.perf_counter() - self._started
+            )
+
+    async def close(self):
+        await self._stream.close()
+
+
+class ReplayStream:
+    """Stream a recorded completion word by word at its recorded pace"""
+
+    def __init__(self, response, recording):
+        self._response = response
+        self._recording = recording
+
+    async def __aiter__(self):
+        response = self._response
+        content = ""
+        if response.choices:
+            content = response.choices[0].message.content or ""
+        words = re.findall(r"\S+\s*|\s+", content) or [""]
+        await asyncio.sleep(self._recording.first_latency)
+        pause = (self._recording.latency - self._recording.first_latency) / len(words)
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(pause)
+            yield ChatCompletionChunk.model_validate(
+                {
+                    "id": response.id,
+                    "object": "chat.completion.chunk",
+                    "created": response.created,
+                    "model": response.model,
+                    "choices": [
+                        {"index": 0, "delta": {"content": word}, "finish_reason": None}
+                    ],
+                }
+            )
+
+    async def close(self):
+        pass
+
+
+def _from_chunks(chunks):
+    content = "".join(
+        chunk.choices[0].delta.content or ""
+        for chunk in chunks
+        if chunk.choices and chunk.choices[0].delta
+    )
+    return json.dumps(
+        {
+            "id": chunks[0].id,
+            "object": "chat.completion",
+            "created": chunks[0].created,
+            "model": chunks[0].model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+        }
+    )
+
+
+class CompletionCache:
+    def __init__(self, mode=None, path=None):
+        self.mode = get_mode() if mode is None else mode
+        self.path = path or os.getenv("AI_COMPLETION_CACHE_PATH", "completions.sqlite3")
+        self.stats = Counter()
+        self._store = None
+        self._lock = threading.Lock()
+        # key -> number of requests made with it, bounded like the memory
+        self._seen = OrderedDict()
+
+    def _variant(self, key):
+        seen = self._seen.pop(key, 0)
+        self._seen[key] = seen + 1
+        while len(self._seen) > MEMORY_SIZE:
+            self._seen.popitem(last=False)
+        return seen % VARIANTS
+
+    @property
+    def store(self):
+        with self._lock:
+            if self._store is None:
+                self._store = CompletionStore(self.path)
+            return self._store
+
+    @property
+    def replaying(self):
+        return self.mode == "replay"
+
+    async def create(self, client, **params):
+        """`client.chat.completions.create(**params)` through the cache"""
+        if self.mode == "off":
+            return await client.chat.completions.create(**params)
+
+        key, params_key = keys(params)
+        variant = self._variant(key)
+        stream = params.get("stream", False)
+        # the store blocks on SQLite, which must not stall the event loop
+        store = await asyncio.to_thread(lambda: self.store)
+
+        recording = None
+        if self.mode in ("cache", "replay"):
+            recording = await asyncio.to_thread(store.get, key, variant)
+        if recording is None and self.replaying and variant:
+            # fewer variants were recorded, take them in turn
+            count = await asyncio.to_thread(store.variants, key)
+            if count:
+                recording = await asyncio.to_thread(store.get, key, variant % count)
+        if recording is None and self.replaying:
+            recording = await asyncio.to_thread(store.pick, key, params_key)
+            if recording is None:
+                raise CompletionNotRecorded(f"No completion recorded for {params_key}")
+            self.stats["replay_fallbacks"] += 1
+
+        if recording is not None:
+            self.stats["hits"] += 1
+            response = ChatCompletion.model_validate_json(recording.response)
+            if stream:
+                return ReplayStream(response, recording)
+            if self.replaying:
+                await asyncio.sleep(recording.latency)
+            return response
+
+        self.stats["misses"] += 1
+        started = time.perf_counter()
+        response = await client.chat.completions.create(**params)
+
+        async def record(response, first_latency, latency):
+            recording = Recording(response, first_latency, latency)
+            await asyncio.to_thread(store.put, key, params_key, recording, variant)
+            self.stats["recorded"] += 1
+
+        if stream:
+            return RecordingStream(response, record, started)
+        latency = time.perf_counter() - started
+        await record(response.model_dump_json(), latency, latency)
+        return response
+
+    def metrics(self):
+        metrics = dict(hits=0, misses=0, recorded=0, replay_fallbacks=0)
+        metrics.update(self.stats)
+        metrics["mode"] = self.mode
+        if self._store is not None:
+            metrics["evicted"] = self._store.stats["evicted"]
+            metrics["stored"] = len(self._store)
+        return metrics
+
+
+_cache = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = CompletionCache()
+    return _cache
+
+
+def completion_metrics():
+    return get_cache().metrics()
@@ -0,0 +1,136 @@
+"""Token budgeted conversation of a room.
+
+`Conversation` replaces the plain list of past messages of a room. Every
+message is formatted for the chat completion api and its tokens are counted
+once, when it is appended. The oldest messages are dropped as soon as the
+messages exceed `CHATBOT_CONTEXT_TOKENS`, and `bot_messages` leaves out more
+of them to make room for the system prompt, so the prompt size and the work
+per reply stay bounded in long chats.
+
+Tokens are counted with `tiktoken` if it is installed, otherwise estimated
+from the number of words and punctuation characters. `load_tokenizer` loads
+the encoding in a thread, since `tiktoken` may have to download it.
+"""
+
+import asyncio
+import logging
+import os
+import re
+from collections import deque
+from functools import lru_cache
+
+LOG = logging.getLogger(__name__)
+
+CONTEXT_TOKENS = int(os.environ.get("CHATBOT_CONTEXT_TOKENS", "3000"))
+
+# tokens the chat format adds to every message
+MESSAGE_OVERHEAD = 4
+
+BOT_NAME = "Ash"
+
+
+def _tokenizer():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base").encode
+    except Exception as e:
+        # not installed, or the encoding cannot be downloaded
+        LOG.info(f"Estimating token counts, tiktoken is not available: {e!r}")
+        return re.compile(r"\w+|[^\w\s]").findall
+
+
+_encode = None
+
+
+async def load_tokenizer():
+    """Load the tokenizer without blocking the event loop"""
+    global _encode
+    if _encode is None:
+        _encode = await asyncio.to_thread(_tokenizer)
+
+
+def count_tokens(text):
+    global _encode
+    if _encode is None:
+        _encode = _tokenizer()
+    return len(_encode(text)) + MESSAGE_OVERHEAD
+
+
+@lru_cache(maxsize=64)
+def _system_tokens(prompt):
+    return count_tokens(prompt)
+
+
+def bot_message(msg):
+    """The chat completion message for a message of the room"""
+    role = "assistant" if msg["sender"] == BOT_NAME else "user"
+    return {"role": role, "content": msg["sender"] + ": " + msg["text"]}
+
+
+class Conversation:
+    """Past messages of a room, as `{"sender": ..., "text": ...}` dicts.
+
+    Supports `append`, `len`, iteration and indexing like the list it
+    replaces, `bot_messages` returns the formatted messages.
+    """
+
+    def __init__(self, messages=(), budget=None):
+        self.budget = CONTEXT_TOKENS if budget is None else budget
+        self.tokens = 0
+        self.dropped = 0
+        self._messages = deque()
+        self._formatted = deque()
+        self._tokens = deque()
+        for msg in messages:
+            self.append(msg)
+
+    def append(self, msg):
+        formatted = bot_message(msg)
+        tokens = count_tokens(formatted["content"])
+        self._messages.append(msg)
+        self._formatted.append(formatted)
+        self._tokens.append(tokens)
+        self.tokens += tokens
+        self._trim()
+
+    def _trim(self):
+        # the latest message is kept even if it exceeds the budget alone
+        while self.tokens > self.budget and len(self._messages) > 1:
+            self._messages.popleft()
+            self._formatted.popleft()
+            self.tokens -= self._tokens.popleft()
+            self.dropped += 1
+
+    def bot_messages(self, system=None):
+        """The formatted messages, after the `system` prompt if given.
+
+        The oldest messages are left out as long as they and the system prompt
+        exceed the budget, the latest message is always included.
+        """
+        messages = list(self._formatted)
+        if system is None:
+            return messages
+        tokens = self.tokens + _system_tokens(system)
+        start = 0
+        for count in self._tokens:
+            if tokens <= self.budget or start == len(messages) - 1:
+                break
+            tokens -= count
+            start += 1
+        return [{"role": "system", "content": system}] + messages[start:]
+
+    def __len__(self):
+        return len(self._messages)
+
+    def __iter__(self):
+        return iter(self._messages)
+
+    def __getitem__(self, index):
+        return self._messages[index]
+
+    def __repr__(self):
+        return (
+            f"<Conversation {len(self)} messages, {self.tokens} tokens,"
+            f" {self.dropped} dropped>"
+        )
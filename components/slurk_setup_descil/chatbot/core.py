@@ -13,15 +13,15 @@ import socketio
 from slurk_setup_descil.slurk_api import catch_error
 
 from .config import TASK_GREETING
-from .interaction import generate_bot_message
+from .context import Conversation, load_tokenizer
+from .gpt_bot import use_streaming
+from .interaction import generate_bot_message, stream_bot_message
+from .scheduler import ReplyScheduler
 
 LOG = logging.getLogger(__name__)
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
-current_task = None
-
-
 class Chatbot:
     def __init__(self, config, host, port):
         """Serves as a template for task bots.
@@ -46,10 +46,30 @@ class Chatbot:
 
         self.players_per_room = []
         self.message_history = dict()
+        self.replies = ReplyScheduler()
+
+    async def stream_reply(self, room_id):
+        """Collect the streamed answer for `room_id`.
+
+        Returns the answer and the time its first chunk arrived, or None and
+        None if there is no answer.
+        """
+        chunks = []
+        first_chunk = None
+        async for chunk in stream_bot_message(
+            self.bot_id, self.message_history[room_id], room_id
+        ):
+            if first_chunk is None:
+                first_chunk = time.time()
+            chunks.append(chunk)
+        if first_chunk is None:
+            return None, None
+        return "".join(chunks), first_chunk
 
     @catch_error
     async def run(self):
         """Establish a connection to the slurk chat server."""
+        await load_tokenizer()
         await self.sio.connect(
             self.uri,
             headers={
@@ -57,6 +77,8 @@ class Chatbot:
                 "user": str(self.bot_user),
             },
             namespaces="/",
+            # no sticky sessions needed when slurk runs several workers
+            transports=["websocket"],
         )
         self.register_callbacks()
         await self.sio.wait()
@@ -76,6 +98,7 @@ class Chatbot:
                             "room": self.chat_room_id,
                         },
                     )
+                    self.replies.cancel_all()
                     await self.sio.disconnect()
 
                     print("CLOSED CHAT ROOM", flush=True)
@@ -134,7 +157,7 @@ class Chatbot:
 
             room_id = data["room"]
             if room_id not in self.message_history:
-                self.message_history[room_id] = []
+                self.message_history[room_id] = Conversation()
 
             # if the message is part of the main discussion count it
             for usr in self.players_per_room:
@@ -154,14 +177,20 @@ class Chatbot:
 
             @catch_error
             async def finish_reply():
-                started = time.time()
-                # feed message to language model and get response
-                answer = await generate_bot_message(
-                    self.bot_id, self.message_history[room_id], room_id
-                )
+                async with self.replies.llm():
+                    if use_streaming():
+                        # the typing clock starts with the first chunk, generating
+                        # the rest of the answer overlaps with typing it
+                        answer, started = await self.stream_reply(room_id)
+                    else:
+                        started = time.time()
+                        # feed message to language model and get response
+                        answer = await generate_bot_message(
+                            self.bot_id, self.message_history[room_id], room_id
+                        )
                 if answer is None:
                     logging.debug("Not answering due to no answer!")
-                    return
+                    return False
 
                 needed = time.time() - started
                 self.message_history[room_id].append({"sender": "Ash", "text": answer})
@@ -189,10 +218,8 @@ class Chatbot:
                         "broadcast": True,
                     },
                 )
+                return True
 
-            global current_task
-            if current_task is not None:
-                print("CANCEL TASK", current_task)
-                current_task.cancel()
-                print("CANCELLED")
-            current_task = asyncio.create_task(finish_reply())
+            # replaces a reply still pending in this room, bursts of messages
+            # are answered once
+            self.replies.schedule(room_id, finish_reply)
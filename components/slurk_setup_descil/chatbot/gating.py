@@ -0,0 +1,163 @@
+"""Strategies deciding whether the bot answers a message.
+
+- `TwoCallGate` asks the model a fixed yes/no question first and generates
+  the reply with a second call.
+- `CombinedGate` decides and generates the reply in a single call with a
+  JSON structured output.
+- `HeuristicGate` decides locally from the last messages, only the reply
+  costs a call.
+
+`AI_GATING` selects the strategy, it defaults to `two_call`. Every strategy
+is called with a `complete(messages, **kwargs)` coroutine function returning
+a chat completion and the messages for the reply (system prompt followed by
+the conversation).
+"""
+
+import json
+import logging
+import os
+import re
+from collections import namedtuple
+from datetime import datetime
+
+LOG = logging.getLogger(__name__)
+
+# `reply` is None when the caller still has to generate the reply
+Decision = namedtuple("Decision", "answer reply")
+
+SKIP = Decision(False, None)
+
+ANSWER_RULES = (
+    "You most of the times want to answer when you are asked a question."
+    "You can also answer when you want to add something to the discussion."
+    "You can also answer when you want to ask a question."
+    "You can also answer when you want to make a comment."
+    "You can also answer when you want to make a suggestion."
+    "You can also answer when you want to make a remark."
+    "You can also answer when you want to make a statement."
+    "You can also answer when you want to make a contribution."
+    "You can also answer when you want to make a point."
+    "You can also answer when you want to make a proposal."
+    "You can also answer when you want to make a request."
+    "You must not answer to irrelevant messages."
+    "You must not answer to messages that ar off topic."
+    "You must not answer to messages that are not related to the discussion."
+    "You must not answer like a bot or an assistant."
+    "You must answer like a human."
+    "You must answer in 1-2 sentences"
+    "Avoid being too friendly."
+    "Avoid being too formal."
+    "Avoid answering in sophisticated language."
+    "Avoid answering in academic language."
+    "Make spelling mistakes."
+    "Speak only English."
+)
+
+QUESTION_MESSAGE = {
+    "role": "user",
+    "content": "You are a human participant in a chat."
+    "You are eager to engage in the discussion with the other people."
+    "Based on the previous messages, do you think you want to answer now? "
+    "Please answer only yes or no." + ANSWER_RULES,
+}
+
+COMBINED_MESSAGE = {
+    "role": "user",
+    "content": "You are a human participant in a chat."
+    "You are eager to engage in the discussion with the other people."
+    "Based on the previous messages, decide if you want to answer now. "
+    'Reply only with a JSON object, {"answer": true, "message": "<your message>"} '
+    'if you answer and {"answer": false} if you do not.' + ANSWER_RULES,
+}
+
+SENDER_PREFIX = re.compile(r"^[a-zA-Z]*:\s*")
+
+
+class TwoCallGate:
+    name = "two_call"
+
+    async def decide(self, complete, bot_messages):
+        now = datetime.now
+
+        print(now(), "ASK", flush=True)
+        response = await complete([QUESTION_MESSAGE])
+        answer = response.choices[0].message.content
+        print(now(), "ANSWER", answer, flush=True)
+
+        if answer.lower().rstrip(".") != "yes":
+            logging.debug("Irrelevant answer, not answering")
+            return SKIP
+
+        logging.debug("Answering yes")
+        return Decision(True, None)
+
+
+class CombinedGate:
+    name = "combined"
+
+    # room for the JSON around the message
+    extra_tokens = 20
+
+    async def decide(self, complete, bot_messages):
+        response = await complete(
+            bot_messages + [COMBINED_MESSAGE],
+            response_format={"type": "json_object"},
+            stop=None,
+            extra_tokens=self.extra_tokens,
+        )
+        content = response.choices[0].message.content
+        try:
+            decision = json.loads(content)
+            answer = bool(decision.get("answer"))
+            message = str(decision.get("message") or "").strip()
+        except (ValueError, AttributeError):
+            LOG.warning(f"Not answering, no decision in {content!r}")
+            return SKIP
+
+        if not answer or not message:
+            logging.debug("Irrelevant message, not answering")
+            return SKIP
+        return Decision(True, SENDER_PREFIX.sub("", message))
+
+
+class HeuristicGate:
+    """Answer questions, mentions and longer statements, skip short reactions
+
+    Messages from the bot itself are passed as the assistant role, the bot
+    does not answer twice in a row without a user message in between.
+    """
+
+    name = "heuristic"
+
+    bot_name = "Ash"
+    min_words = 4
+    reactions = frozenset(
+        "ok okay k yes yeah yep no nope lol haha hahaha thanks thx ty cool nice "
+        "sure right true agreed hmm bye".split()
+    )
+
+    async def decide(self, complete, bot_messages):
+        conversation = [m for m in bot_messages if m["role"] != "system"]
+        if not conversation or conversation[-1]["role"] == "assistant":
+            return SKIP
+        return Decision(self.score(conversation[-1]["content"]), None)
+
+    def score(self, content):
+        text = SENDER_PREFIX.sub("", content).strip().lower()
+        words = re.findall(r"[a-z']+", text)
+        if "?" in text or self.bot_name.lower() in words:
+            return True
+        if not words or all(word in self.reactions for word in words):
+            return False
+        return len(words) >= self.min_words
+
+
+GATES = {gate.name: gate for gate in (TwoCallGate, CombinedGate, HeuristicGate)}
+
+
+def get_gate(name=None):
+    name = name or os.getenv("AI_GATING", "") or TwoCallGate.name
+    try:
+        return GATES[name.lower().strip()]()
+    except KeyError:
+        raise ValueError(f"Unknown AI_GATING {name!r}, use one of {sorted(GATES)}")
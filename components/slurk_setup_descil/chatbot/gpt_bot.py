@@ -1,21 +1,26 @@
 import asyncio
-import logging
 import os
 import re
+from collections import Counter
 from concurrent.futures.thread import ThreadPoolExecutor
-from datetime import datetime
 from functools import partial
 
 from openai import AsyncAzureOpenAI, AsyncOpenAI
 
+from .completion_cache import get_cache
+from .context import Conversation, load_tokenizer
+from .gating import SENDER_PREFIX, get_gate
 from .prompti import prompts
 
 client = None
 
+# chat completion requests and tokens used by this process
+USAGE = Counter()
+
 
 def connect():
     global client
-    if client is not None:
+    if client is not None or get_cache().replaying:
         return client
     if use_azure_openai():
         client = AsyncAzureOpenAI(
@@ -24,7 +29,11 @@ def connect():
             azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
         )
     else:
-        client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            # e.g. the fake_openai service, the default is the OpenAI api
+            base_url=os.getenv("OPENAI_BASE_URL") or None,
+        )
     return client
 
 
@@ -42,12 +51,25 @@ def get_ai_parameters():
     return model, temperature, max_tokens
 
 
+def use_streaming():
+    return os.getenv("AI_MODEL_STREAM", "").lower().strip() in ("1", "true", "yes")
+
+
+def llm_usage():
+    """Chat completion requests and tokens used by this process"""
+    usage = dict(requests=0, prompt_tokens=0, completion_tokens=0)
+    usage.update(USAGE)
+    usage["gating"] = get_gate().name
+    return usage
+
+
 def gpt_bot(variant):
-    return partial(_gpt_bot, variant=variant)
+    bot = partial(_gpt_bot, variant=variant)
+    bot.stream = partial(_gpt_bot_stream, variant=variant)
+    return bot
 
 
-async def _gpt_bot(past_messages, room_number, variant):
-    bot_messages = []
+async def _bot_messages(past_messages, room_number, variant):
     print("VARIANT", variant, flush=True)
 
     if callable(variant):
@@ -55,93 +77,105 @@ async def _gpt_bot(past_messages, room_number, variant):
     else:
         prompt = prompts.get(variant, "")
 
-    bot_messages.append({"role": "system", "content": prompt})
+    await load_tokenizer()
+    if not isinstance(past_messages, Conversation):
+        past_messages = Conversation(past_messages)
+    return past_messages.bot_messages(prompt)
 
-    for msg in past_messages:
-        if msg["sender"] == "Ash":
-            bot_role = "assistant"
-        else:
-            bot_role = "user"
-        bot_messages.append(
-            {"role": bot_role, "content": msg["sender"] + ": " + msg["text"]}
-        )
-
-    question_message = {
-        "role": "user",
-        "content": "You are a human participant in a chat."
-        "You are eager to engage in the discussion with the other people."
-        "Based on the previous messages, do you think you want to answer now? "
-        "Please answer only yes or no."
-        "You most of the times want to answer when you are asked a question."
-        "You can also answer when you want to add something to the discussion."
-        "You can also answer when you want to ask a question."
-        "You can also answer when you want to make a comment."
-        "You can also answer when you want to make a suggestion."
-        "You can also answer when you want to make a remark."
-        "You can also answer when you want to make a statement."
-        "You can also answer when you want to make a contribution."
-        "You can also answer when you want to make a point."
-        "You can also answer when you want to make a proposal."
-        "You can also answer when you want to make a request."
-        "You must not answer to irrelevant messages."
-        "You must not answer to messages that ar off topic."
-        "You must not answer to messages that are not related to the discussion."
-        "You must not answer like a bot or an assistant."
-        "You must answer like a human."
-        "You must answer in 1-2 sentences"
-        "Avoid being too friendly."
-        "Avoid being too formal."
-        "Avoid answering in sophisticated language."
-        "Avoid answering in academic language."
-        "Make spelling mistakes."
-        "Speak only English.",
-    }
 
+async def _complete(client, messages, extra_tokens=0, **kwargs):
     model, temperature, max_tokens = get_ai_parameters()
-
-    client = connect()
-
-    now = datetime.now
-
-    print(now(), "ASK", flush=True)
-    response = await client.chat.completions.create(
+    max_tokens += extra_tokens
+    kwargs.setdefault("stop", ["\n"])
+    response = await get_cache().create(
+        client,
         model=model,
-        messages=[question_message],
+        messages=messages,
         # this is recieving our prompt based on the question parameter and start sequence
         temperature=temperature,  # temperature designates how creative you want the chatbot to be on a scale of 0-1
         max_tokens=max_tokens,  # max_tokens states how long the answer can be
         # top_p=1,  # top_p is another creativity measure, but should be set to 1 when temperature is in use
         # frequency_penalty=0,
         # presence_penalty=0.1,
-        stop=["\n"],
+        **{key: value for key, value in kwargs.items() if value is not None},
     )
-    answer = response.choices[0].message.content
-    print(now(), "ANSWER", answer, flush=True)
+    USAGE["requests"] += 1
+    if getattr(response, "usage", None) is not None:
+        USAGE["prompt_tokens"] += response.usage.prompt_tokens
+        USAGE["completion_tokens"] += response.usage.completion_tokens
+    return response
 
-    if answer.lower().rstrip(".") != "yes":
-        logging.debug("Irrelevant answer, not answering")
 
-        return answer
+async def _gpt_bot(past_messages, room_number, variant):
+    """The answer of the bot or None if it does not want to answer"""
+    bot_messages = await _bot_messages(past_messages, room_number, variant)
 
-    logging.debug("Answering yes")
-    response = await client.chat.completions.create(
-        model=model,
-        messages=bot_messages,
-        # this is recieving our prompt based on the question parameter and start sequence
-        temperature=temperature,  # temperature designates how creative you want the chatbot to be on a scale of 0-1
-        max_tokens=max_tokens,  # max_tokens states how long the answer can be
-        # top_p=1,  # top_p is another creativity measure, but should be set to 1 when temperature is in use
-        # frequency_penalty=0,
-        # presence_penalty=0.1,
-        stop=["\n"],
-    )
+    complete = partial(_complete, connect())
+
+    decision = await get_gate().decide(complete, bot_messages)
+    if not decision.answer:
+        return None
+    if decision.reply is not None:
+        return decision.reply
+
+    response = await complete(bot_messages)
 
     answer = response.choices[0].message.content
-    answer = re.sub(r"^[a-zA-Z]*:\s*", "", answer)
+    answer = SENDER_PREFIX.sub("", answer)
 
     return answer
 
 
+async def _gpt_bot_stream(past_messages, room_number, variant):
+    """Like `_gpt_bot`, but yields the answer in chunks as they are generated.
+
+    Closing the generator, e.g. because the consuming task is cancelled,
+    closes the response, which stops the generation on the provider side.
+    Nothing is yielded if the bot does not want to answer.
+    """
+    bot_messages = await _bot_messages(past_messages, room_number, variant)
+
+    complete = partial(_complete, connect())
+
+    decision = await get_gate().decide(complete, bot_messages)
+    if not decision.answer:
+        return
+    if decision.reply is not None:
+        yield decision.reply
+        return
+
+    stream = await complete(bot_messages, stream=True)
+    try:
+        async for chunk in _strip_sender(_deltas(stream)):
+            yield chunk
+    finally:
+        await stream.close()
+
+
+async def _deltas(stream):
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+async def _strip_sender(chunks):
+    """Drop a leading "Name: " as `SENDER_PREFIX` does for a complete answer"""
+    head = ""
+    async for chunk in chunks:
+        if head is None:
+            yield chunk
+            continue
+        head += chunk
+        # wait until the prefix is complete or cannot be one anymore
+        if re.fullmatch(r"[a-zA-Z]*(:\s*)?", head):
+            continue
+        head, chunk = None, SENDER_PREFIX.sub("", head)
+        if chunk:
+            yield chunk
+    if head:
+        yield SENDER_PREFIX.sub("", head)
+
+
 def test():
     from openai import AzureOpenAI
 
@@ -34,3 +34,19 @@ bot_variants = {
 
 async def generate_bot_message(bot_id, past_messages, room_number):
     return await bot_variants[bot_id](past_messages, room_number)
+
+
+async def stream_bot_message(bot_id, past_messages, room_number):
+    """Yield the bot message in chunks as they are generated.
+
+    Variants without a `stream` attribute yield their whole message at once.
+    """
+    variant = bot_variants[bot_id]
+    if hasattr(variant, "stream"):
+        async for chunk in variant.stream(past_messages, room_number):
+            yield chunk
+        return
+
+    answer = await variant(past_messages, room_number)
+    if answer is not None:
+        yield answer
@@ -1,6 +1,12 @@
 import os
 
-import aiohttp
+from . import prompt_cache
+
+
+async def _read(resp):
+    prompt = await resp.text()
+    print("GOT PROMPT", resp.status, repr(prompt))
+    return prompt
 
 
 async def fetch_prompt(variant=None):
@@ -8,11 +14,7 @@ async def fetch_prompt(variant=None):
         "POLYBOX_URL", "https://polybox.ethz.ch/index.php/s/MAZlGw1ZPBFYUJn/download"
     )
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as resp:
-            prompt = await resp.text()
-            if resp.status != 200:
-                print("REQUEST TO FETCH PROMPT FAILED", resp.reason)
-                return ""
-            print("GOT PROMPT", resp.status, repr(prompt))
-            return prompt
+    # the prompt is the same for all rooms
+    return await prompt_cache.cache.get(
+        ("polybox", url), lambda etag: prompt_cache.fetch("GET", url, etag, _read)
+    )
@@ -0,0 +1,132 @@
+"""Cache for prompts fetched from external sources.
+
+The prompt of a bot variant is fetched once and then served from memory
+for `PROMPT_CACHE_TTL` seconds. Within the following `PROMPT_CACHE_STALE`
+seconds the cached prompt is still served while a background task fetches
+it again, older prompts are fetched before answering. Fetches send the last
+`ETag` as `If-None-Match`, and concurrent requests for the same key share a
+single fetch. If a fetch fails the last prompt is served, however old it is.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import Counter, namedtuple
+
+import aiohttp
+from slurk_setup_descil.slurk_api import get_client
+
+LOG = logging.getLogger(__name__)
+
+PROMPT_CACHE_TTL = float(os.environ.get("PROMPT_CACHE_TTL", "60"))
+PROMPT_CACHE_STALE = float(os.environ.get("PROMPT_CACHE_STALE", "3600"))
+PROMPT_FETCH_TIMEOUT = float(os.environ.get("PROMPT_FETCH_TIMEOUT", "10"))
+
+Entry = namedtuple("Entry", "prompt etag fetched")
+
+
+class PromptUnavailable(Exception):
+    pass
+
+
+class PromptCache:
+    def __init__(self, ttl=None, stale=None, clock=time.monotonic):
+        self.ttl = PROMPT_CACHE_TTL if ttl is None else ttl
+        self.stale = PROMPT_CACHE_STALE if stale is None else stale
+        self.clock = clock
+        self.stats = Counter()
+        self._entries = {}
+        self._fetches = {}
+
+    async def get(self, key, load):
+        """The prompt for `key`, `load(etag)` fetches it.
+
+        `load` returns the prompt and its etag, None if the prompt did not
+        change since `etag`, and raises `PromptUnavailable` if it fails. Any
+        other exception is logged and treated the same way. Returns "" if
+        there is no prompt at all.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = self.clock() - entry.fetched
+            if age < self.ttl:
+                self.stats["hits"] += 1
+                return entry.prompt
+            if age < self.ttl + self.stale:
+                self.stats["stale"] += 1
+                self._refresh(key, load)
+                return entry.prompt
+
+        self.stats["misses"] += 1
+        entry = await asyncio.shield(self._refresh(key, load))
+        return "" if entry is None else entry.prompt
+
+    def _refresh(self, key, load):
+        fetch = self._fetches.get(key)
+        if fetch is None:
+            fetch = self._fetches[key] = asyncio.create_task(self._fetch(key, load))
+            fetch.add_done_callback(lambda _: self._fetches.pop(key, None))
+        return fetch
+
+    async def _fetch(self, key, load):
+        entry = self._entries.get(key)
+        self.stats["fetches"] += 1
+        try:
+            loaded = await load(None if entry is None else entry.etag)
+        except PromptUnavailable as e:
+            self.stats["errors"] += 1
+            LOG.warning(f"Fetching prompt {key} failed: {e}")
+            return entry
+        except Exception:
+            # background refreshes are never awaited, so never raise here
+            self.stats["errors"] += 1
+            LOG.exception(f"Fetching prompt {key} failed unexpectedly")
+            return entry
+
+        if loaded is None:
+            self.stats["not_modified"] += 1
+            prompt, etag = entry.prompt, entry.etag
+        else:
+            prompt, etag = loaded
+        entry = self._entries[key] = Entry(prompt, etag, self.clock())
+        return entry
+
+    def invalidate(self, key=None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def metrics(self):
+        metrics = dict(hits=0, stale=0, misses=0, fetches=0, not_modified=0, errors=0)
+        metrics.update(self.stats)
+        metrics["prompts"] = len(self._entries)
+        return metrics
+
+
+cache = PromptCache()
+
+
+def prompt_metrics():
+    return cache.metrics()
+
+
+async def fetch(method, url, etag, read, **kwargs):
+    """Request `url` on the pooled session, `read(resp)` extracts the prompt.
+
+    Implements the `load` protocol of `PromptCache.get`.
+    """
+    headers = {"If-None-Match": etag} if etag else {}
+    timeout = aiohttp.ClientTimeout(total=PROMPT_FETCH_TIMEOUT)
+    try:
+        async with get_client().session.request(
+            method, url, headers=headers, timeout=timeout, **kwargs
+        ) as resp:
+            if resp.status == 304 and etag:
+                return None
+            if resp.status != 200:
+                raise PromptUnavailable(f"{method} {url}: {resp.status} {resp.reason}")
+            return await read(resp), resp.headers.get("ETag")
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError) as e:
+        raise PromptUnavailable(f"{method} {url}: {e!r}") from e
@@ -1,25 +1,28 @@
 import os
 from functools import partial
 
-import aiohttp
+from . import prompt_cache
+
+
+async def _read(resp):
+    data = await resp.json()
+    print("GOT PROMPT DATA", repr(data))
+    return data["prompt"]
 
 
 async def _fetch_prompt(variant, room_number):
     base_url = os.environ.get(
-        "PROMPT_API_URL",
-        "https://slurkexp.vlab.ethz.ch/api/fullprompt/",
-        json=dict(variant=variant),
+        "PROMPT_API_URL", "https://slurkexp.vlab.ethz.ch/api/fullprompt/"
     ).rstrip("/")
+    url = f"{base_url}/{room_number}"
 
-    async with aiohttp.ClientSession() as session:
-        async with session.post(f"{base_url}/{room_number}", json="") as resp:
-            if resp.status != 200:
-                print("REQUEST TO FETCH PROMPT FAILED", resp.reason)
-                return ""
-            data = await resp.json()
-            print("GOT PROMPT DATA", repr(data))
-            return data["prompt"]
+    return await prompt_cache.cache.get(
+        (variant, room_number),
+        lambda etag: prompt_cache.fetch(
+            "POST", url, etag, _read, json=dict(variant=variant)
+        ),
+    )
 
 
-async def fetch_prompt(variant):
-    return partial(fetch_prompt, variant=variant)
+def fetch_prompt(variant):
+    return partial(_fetch_prompt, variant)
@@ -0,0 +1,113 @@
+"""Per room scheduling of chatbot replies.
+
+Every `Chatbot` owns a `ReplyScheduler`. A new user message replaces the
+pending reply of its room only, and bursts of messages are coalesced into a
+single reply by waiting `debounce` seconds before the language model is
+asked. Calls to the language model are bounded by a semaphore shared by all
+bots of the process, so one busy room cannot starve the others.
+"""
+
+import asyncio
+import logging
+import os
+import weakref
+from collections import Counter
+from contextlib import asynccontextmanager
+
+LOG = logging.getLogger(__name__)
+
+DEBOUNCE_SECONDS = float(os.environ.get("CHATBOT_REPLY_DEBOUNCE", "0.5"))
+MAX_CONCURRENT_REPLIES = int(os.environ.get("CHATBOT_MAX_CONCURRENT_REPLIES", "16"))
+
+# replies of all schedulers of this process
+STATS = Counter()
+
+_slots = weakref.WeakKeyDictionary()
+
+
+def llm_slots():
+    """Semaphore bounding the language model calls of the running event loop"""
+    loop = asyncio.get_running_loop()
+    slots = _slots.get(loop)
+    if slots is None:
+        slots = _slots[loop] = asyncio.Semaphore(MAX_CONCURRENT_REPLIES)
+    return slots
+
+
+def reply_metrics():
+    """Reply counters of all schedulers of this process.
+
+    - scheduled: replies requested by user messages
+    - coalesced: replies replaced by a newer message while debouncing
+    - cancelled: replies replaced while already asking the language model
+    - delivered: replies that sent a message
+    - skipped: replies that finished without sending a message
+    - failed: replies that raised an exception
+    """
+    metrics = dict(
+        scheduled=0, coalesced=0, cancelled=0, delivered=0, skipped=0, failed=0
+    )
+    metrics.update(STATS)
+    metrics["max_concurrency"] = MAX_CONCURRENT_REPLIES
+    return metrics
+
+
+class ReplyScheduler:
+    def __init__(self, debounce=None):
+        self.debounce = DEBOUNCE_SECONDS if debounce is None else debounce
+        self.stats = Counter()
+        self._tasks = {}
+
+    def _count(self, key):
+        self.stats[key] += 1
+        STATS[key] += 1
+
+    def schedule(self, room_id, reply):
+        """Replace the pending reply of `room_id` with `reply()`.
+
+        `reply` is a coroutine function returning whether a message was sent.
+        """
+        pending = self._tasks.get(room_id)
+        if pending is not None and not pending.done():
+            pending.cancel()
+
+        self._count("scheduled")
+        task = asyncio.create_task(self._run(room_id, reply))
+        self._tasks[room_id] = task
+        return task
+
+    @asynccontextmanager
+    async def llm(self):
+        """Hold one of the shared language model slots"""
+        async with llm_slots():
+            yield
+
+    async def _run(self, room_id, reply):
+        try:
+            await asyncio.sleep(self.debounce)
+        except asyncio.CancelledError:
+            self._count("coalesced")
+            raise
+
+        try:
+            sent = await reply()
+        except asyncio.CancelledError:
+            self._count("cancelled")
+            raise
+        except Exception:
+            self._count("failed")
+            LOG.exception(f"Reply in room {room_id} failed")
+            return
+        finally:
+            if self._tasks.get(room_id) is asyncio.current_task():
+                del self._tasks[room_id]
+
+        self._count("delivered" if sent else "skipped")
+
+    def pending(self):
+        return sum(1 for task in self._tasks.values() if not task.done())
+
+    def cancel_all(self):
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
@@ -1,9 +1,7 @@
 import asyncio
 import logging
 import os
-import time
 
-import aiohttp
 import socketio
 from slurk_setup_descil.slurk_api import (
     catch_error,
@@ -11,9 +9,11 @@ from slurk_setup_descil.slurk_api import (
     create_room_token,
     create_user,
     get,
+    get_client,
     redirect_user,
     set_permissions,
 )
+from slurk_setup_descil.timers import get_timers
 
 LOG = logging.getLogger(__name__)
 LOG.setLevel(logging.DEBUG)
@@ -56,6 +56,7 @@ class ConciergeBot:
 
         self.num_users_in_room_missing = self.num_users
         self.timeout_manager_active = False
+        self._timeout = None
         self.room_timeout_happened = False
 
         self.redirect_users_active = False
@@ -90,15 +91,17 @@ class ConciergeBot:
                 if task:
                     await self.user_task_leave(user, task)
 
-    @catch_error
-    async def timeout_manager(self):
-        started = time.time()
-        while time.time() < started + self.timeout:
-            if self.num_users_in_room_missing <= 0:
-                print("ROOM COMPLETE!", flush=True)
-                return
-            await asyncio.sleep(0.5)
+    def start_timeout(self):
+        self._timeout = get_timers().call_later(self.timeout, self.timeout_reached)
+
+    def cancel_timeout(self):
+        if self._timeout is not None:
+            self._timeout.cancel()
 
+    @catch_error
+    async def timeout_reached(self):
+        if self.num_users_in_room_missing <= 0:
+            return
         self.room_timeout_happened = True
         await self.redirect_users_timeout()
 
@@ -177,6 +180,8 @@ class ConciergeBot:
                 "user": str(self.concierge_user),
             },
             namespaces="/",
+            # no sticky sessions needed when slurk runs several workers
+            transports=["websocket"],
         )
 
         self.redirect_room_id = await create_forward_room(
@@ -247,9 +252,11 @@ class ConciergeBot:
 
         self.num_users_in_room_missing -= 1
         if not self.timeout_manager_active:
-            t = asyncio.create_task(self.timeout_manager())
-            _async_tasks[id(t)] = t
+            self.start_timeout()
             self.timeout_manager_active = True
+        if self.num_users_in_room_missing <= 0:
+            print("ROOM COMPLETE!", flush=True)
+            self.cancel_timeout()
 
         if self.num_users_in_room_missing > 0:
             await self.sio.emit("keypress", dict(typing=True))
@@ -320,12 +327,11 @@ class ConciergeBot:
             manager_bot_id=manager_bot_id,
         )
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{CHATBOT_URL}/register",
-                json=setup,
-            ) as r:
-                r.raise_for_status()
+        async with get_client().session.post(
+            f"{CHATBOT_URL}/register",
+            json=setup,
+        ) as r:
+            r.raise_for_status()
 
     @catch_error
     async def setup_and_register_managerbot(self):
@@ -351,19 +357,19 @@ class ConciergeBot:
             chat_room_id=self.chat_room_id,
         )
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{MANAGERBOT_URL}/register",
-                json=setup,
-            ) as r:
-                r.raise_for_status()
-                print(r)
+        async with get_client().session.post(
+            f"{MANAGERBOT_URL}/register",
+            json=setup,
+        ) as r:
+            r.raise_for_status()
+            print(r)
 
         return bot_user
 
     @catch_error
     async def disconnect(self):
         _async_tasks.pop(self, None)
+        self.cancel_timeout()
         await self.sio.disconnect()
 
     @catch_error
@@ -0,0 +1,3 @@
+from slurk_setup_descil.fake_openai.core import FakeOpenAI
+
+__all__ = ["FakeOpenAI"]
@@ -0,0 +1,232 @@
+"""Chat completions endpoint answering without a language model.
+
+Implements `POST /v1/chat/completions` of OpenAI and
+`POST /openai/deployments/{deployment}/chat/completions` of Azure OpenAI,
+plain and streamed, so the chatbot can be load tested without network
+access. Set `OPENAI_BASE_URL=http://fake_openai:86/v1`, or
+`AZURE_OPENAI_ENDPOINT=http://fake_openai:86` with `AI_PROVIDER=AZURE`.
+
+Requests wait for a log-normally distributed latency before the first
+token, then the tokens of the answer are sent at a fixed rate. A share of
+the requests fails with a server error or a rate limit error instead. The
+gating question of the chatbot is answered with "yes" with probability
+`answer_rate`, requests for a JSON object get a JSON decision, and all
+other requests get one of `replies`. Tokens are counted as words.
+"""
+
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import time
+from collections import Counter
+
+from aiohttp import web
+
+REPLIES = (
+    "i think thats a good point actually",
+    "not sure, what do you guys think?",
+    "hmm i would go for the first one tbh",
+    "yeah agreed, lets move on",
+    "idk, sounds a bit expensive to me",
+)
+
+
+def _setting(value, env_name, default, cast):
+    if value is not None:
+        return value
+    return cast(os.environ.get(env_name, default))
+
+
+def count_tokens(text):
+    return len(text.split())
+
+
+class FakeOpenAI:
+    """Fake completion server.
+
+    :param latency: Median seconds until the first token.
+    :type latency: float
+    :param latency_sigma: Sigma of the log-normal latency, 0 for a fixed
+        latency.
+    :type latency_sigma: float
+    :param tokens_per_second: Rate the tokens of an answer are generated at.
+    :type tokens_per_second: float
+    :param error_rate: Share of requests failing with status 500.
+    :type error_rate: float
+    :param rate_limit_rate: Share of requests failing with status 429.
+    :type rate_limit_rate: float
+    :param answer_rate: Share of gating questions answered with "yes".
+    :type answer_rate: float
+    :param seed: Seed of the random choices, None for a random seed.
+    :type seed: int
+    """
+
+    def __init__(
+        self,
+        latency=None,
+        latency_sigma=None,
+        tokens_per_second=None,
+        error_rate=None,
+        rate_limit_rate=None,
+        answer_rate=None,
+        seed=None,
+        replies=REPLIES,
+    ):
+        self.latency = _setting(latency, "FAKE_OPENAI_LATENCY", 0.5, float)
+        self.latency_sigma = _setting(
+            latency_sigma, "FAKE_OPENAI_LATENCY_SIGMA", 0.5, float
+        )
+        self.tokens_per_second = _setting(
+            tokens_per_second, "FAKE_OPENAI_TOKENS_PER_SECOND", 50, float
+        )
+        self.error_rate = _setting(error_rate, "FAKE_OPENAI_ERROR_RATE", 0, float)
+        self.rate_limit_rate = _setting(
+            rate_limit_rate, "FAKE_OPENAI_RATE_LIMIT_RATE", 0, float
+        )
+        self.answer_rate = _setting(answer_rate, "FAKE_OPENAI_ANSWER_RATE", 1, float)
+        seed = _setting(seed, "FAKE_OPENAI_SEED", "", str)
+        self.random = random.Random(seed or None)
+        self.replies = replies
+        self.stats = Counter()
+        self.in_flight = 0
+
+    def first_token_delay(self):
+        if self.latency <= 0:
+            return 0.0
+        return self.random.lognormvariate(math.log(self.latency), self.latency_sigma)
+
+    def token_delay(self):
+        if self.tokens_per_second <= 0:
+            return 0.0
+        return 1 / self.tokens_per_second
+
+    def content(self, body):
+        """The answer to the request `body`"""
+        messages = body.get("messages") or [{"content": ""}]
+        last = messages[-1].get("content") or ""
+        answer = self.random.random() < self.answer_rate
+        if (body.get("response_format") or {}).get("type") == "json_object":
+            if not answer:
+                return json.dumps({"answer": False})
+            return json.dumps({"answer": True, "message": self.reply()})
+        if re.search(r"answer only yes or no", last, re.IGNORECASE):
+            return "yes" if answer else "no"
+        return f"Ash: {self.reply()}"
+
+    def reply(self):
+        return self.random.choice(self.replies)
+
+    def error(self):
+        """The error response for this request, if it fails"""
+        roll = self.random.random()
+        if roll < self.error_rate:
+            self.stats["errors"] += 1
+            return web.json_response(
+                {"error": {"message": "Fake server error", "type": "server_error"}},
+                status=500,
+            )
+        if roll < self.error_rate + self.rate_limit_rate:
+            self.stats["rate_limited"] += 1
+            return web.json_response(
+                {"error": {"message": "Fake rate limit", "type": "rate_limit_error"}},
+                status=429,
+                headers={"Retry-After": "1"},
+            )
+        return None
+
+    async def completions(self, request):
+        body = await request.json()
+        self.stats["requests"] += 1
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(self.first_token_delay())
+            error = self.error()
+            if error is not None:
+                return error
+
+            model = body.get("model") or request.match_info.get("deployment", "fake")
+            content = self.content(body)
+            if body.get("stream"):
+                self.stats["streamed"] += 1
+                return await self.stream(request, model, content)
+
+            await asyncio.sleep(self.token_delay() * count_tokens(content))
+            return web.json_response(
+                dict(
+                    self.completion(model, "chat.completion"),
+                    choices=[
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": content},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    usage=self.usage(body, content),
+                )
+            )
+        finally:
+            self.in_flight -= 1
+
+    async def stream(self, request, model, content):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+
+        async def send(delta, finish_reason=None):
+            chunk = dict(
+                self.completion(model, "chat.completion.chunk"),
+                choices=[{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            )
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+
+        try:
+            await send({"role": "assistant", "content": ""})
+            for i, token in enumerate(re.findall(r"\S+\s*", content)):
+                if i:
+                    await asyncio.sleep(self.token_delay())
+                await send({"content": token})
+            await send({}, "stop")
+            await response.write(b"data: [DONE]\n\n")
+        except (ConnectionError, asyncio.CancelledError):
+            self.stats["disconnected"] += 1
+            raise
+        return response
+
+    def completion(self, model, object):
+        return {
+            "id": f"chatcmpl-fake-{self.stats['requests']}",
+            "object": object,
+            "created": int(time.time()),
+            "model": model,
+        }
+
+    def usage(self, body, content):
+        prompt_tokens = sum(
+            count_tokens(message.get("content") or "")
+            for message in body.get("messages", [])
+        )
+        completion_tokens = count_tokens(content)
+        self.stats["prompt_tokens"] += prompt_tokens
+        self.stats["completion_tokens"] += completion_tokens
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    async def metrics(self, request):
+        metrics = dict(requests=0, streamed=0, errors=0, rate_limited=0, disconnected=0)
+        metrics.update(self.stats)
+        metrics["in_flight"] = self.in_flight
+        return web.json_response(metrics)
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.completions)
+        app.router.add_post(
+            "/openai/deployments/{deployment}/chat/completions", self.completions
+        )
+        app.router.add_get("/metrics", self.metrics)
+        return app
@@ -0,0 +1,3 @@
+from slurk_setup_descil.loadtest.core import percentile, regressions, run, summarize
+
+__all__ = ["percentile", "regressions", "run", "summarize"]
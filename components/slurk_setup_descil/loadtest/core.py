@@ -0,0 +1,331 @@
+"""End to end load test of the experiment pipeline.
+
+Provisions `experiments` experiments through `/setup` of the setup service,
+then every participant of an experiment logs into slurk with its token,
+waits in the waiting room until the concierge redirects it to the chat room
+and chats there. The whole pipeline runs, setup_service -> concierge_plus
+-> managerbot/chatbot -> slurk, so the chatbot should answer with the
+`fake_openai` service or a completion replay for repeatable results.
+
+Measured latencies, in seconds:
+
+- provision: `/setup` request of an experiment
+- redirect: connecting in the waiting room until joining the chat room
+- fanout: sending a message until another participant receives it
+- bot_reply: a participant message until the next chatbot message
+"""
+
+import asyncio
+import json
+import logging
+import math
+import random
+import re
+import shutil
+import time
+from collections import defaultdict
+
+import aiohttp
+import socketio
+
+LOG = logging.getLogger(__name__)
+
+METRICS = ("provision", "redirect", "fanout", "bot_reply")
+
+
+def percentile(values, q):
+    """The `q` percentile of `values` with linear interpolation"""
+    if not values:
+        return None
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    low, high = math.floor(position), math.ceil(position)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def summarize(values):
+    summary = dict(count=len(values))
+    if values:
+        summary.update(
+            p50=percentile(values, 50),
+            p95=percentile(values, 95),
+            p99=percentile(values, 99),
+            max=max(values),
+        )
+    return summary
+
+
+class Results:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, metric, seconds):
+        self.latencies[metric].append(seconds)
+
+    def error(self, kind):
+        self.errors[kind] += 1
+
+    def summary(self):
+        return dict(
+            latencies={metric: summarize(self.latencies[metric]) for metric in METRICS},
+            errors=dict(self.errors),
+        )
+
+
+class Participant:
+    """A simulated participant of an experiment"""
+
+    def __init__(self, experiment, index, token, config, results):
+        self.experiment = experiment
+        self.index = index
+        self.token = token
+        self.config = config
+        self.results = results
+        self.name = f"load-{experiment.index}-{index}"
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.in_chat_room = asyncio.Event()
+        self.connected = None
+
+        self.sio.on("joined_room", self.joined_room)
+        self.sio.on("text_message", self.text_message)
+
+    async def login(self, session):
+        """Log in with the token, returns the session cookie of slurk"""
+        async with session.get(
+            f"{self.config.slurk_url}/login/",
+            params=dict(token=self.token, name=self.name),
+            allow_redirects=False,
+        ) as resp:
+            if resp.status != 302:
+                raise RuntimeError(f"login of {self.name} failed: {resp.status}")
+            return "; ".join(f"{c.key}={c.value}" for c in resp.cookies.values())
+
+    async def joined_room(self, data):
+        if data.get("room") != self.experiment.chat_room_id:
+            return
+        if not self.in_chat_room.is_set():
+            self.results.add("redirect", time.monotonic() - self.connected)
+            self.in_chat_room.set()
+
+    async def text_message(self, data):
+        if data.get("room") != self.experiment.chat_room_id:
+            return
+        received = time.monotonic()
+        sender = data.get("user", {}).get("name")
+        if sender == self.config.chatbot_name:
+            self.experiment.bot_replied(received)
+            return
+        sent = self.experiment.sent.get(data.get("message"))
+        if sent is not None and sender != self.name:
+            self.results.add("fanout", received - sent)
+
+    async def run(self, session):
+        cookie = await self.login(session)
+        self.connected = time.monotonic()
+        await self.sio.connect(
+            self.config.slurk_url,
+            headers={"Cookie": cookie},
+            namespaces="/",
+            transports=["websocket"],
+        )
+        try:
+            await asyncio.wait_for(
+                self.in_chat_room.wait(), self.config.redirect_timeout
+            )
+            await self.chat()
+            # wait for the last fan-out and bot replies
+            await asyncio.sleep(self.config.linger)
+        finally:
+            await self.sio.disconnect()
+
+    async def chat(self):
+        for seq in range(self.config.messages):
+            await asyncio.sleep(random.expovariate(1 / self.config.think_time))
+            message = f"{self.name} message {seq}, what do you think?"
+            self.experiment.sent[message] = time.monotonic()
+            await self.sio.emit(
+                "text", {"room": self.experiment.chat_room_id, "message": message}
+            )
+
+
+class Experiment:
+    def __init__(self, index, config, results):
+        self.index = index
+        self.config = config
+        self.results = results
+        self.chat_room_id = None
+        self.participants = []
+        # message -> time it was sent
+        self.sent = {}
+        self._replied = 0.0
+
+    def bot_replied(self, received):
+        # the latest participant message the bot did not answer yet
+        pending = [sent for sent in self.sent.values() if sent > self._replied]
+        if pending:
+            self.results.add("bot_reply", received - max(pending))
+        self._replied = received
+
+    async def provision(self, session):
+        setup = dict(
+            num_users=self.config.participants,
+            bot_ids=self.config.bot_ids,
+            api_token=self.config.api_token,
+            waiting_room_timeout_seconds=self.config.redirect_timeout,
+            chat_room_timeout_seconds=self.config.chat_seconds,
+            chatbot_name=self.config.chatbot_name,
+        )
+        started = time.monotonic()
+        async with session.post(f"{self.config.setup_url}/setup", json=setup) as resp:
+            data = await resp.json()
+            if resp.status != 200 or "user_tokens" not in data:
+                raise RuntimeError(f"setup failed: {resp.status} {data.get('error')}")
+        self.results.add("provision", time.monotonic() - started)
+        self.chat_room_id = data["chat_room_id"]
+        return data["user_tokens"]
+
+    async def run(self, session):
+        try:
+            tokens = await self.provision(session)
+        except Exception as e:
+            LOG.error(f"Provisioning experiment {self.index} failed: {e!r}")
+            self.results.error("provision")
+            return
+
+        self.participants = [
+            Participant(self, i, token, self.config, self.results)
+            for i, token in enumerate(tokens)
+        ]
+        outcomes = await asyncio.gather(
+            *(participant.run(session) for participant in self.participants),
+            return_exceptions=True,
+        )
+        for outcome in outcomes:
+            if isinstance(outcome, asyncio.TimeoutError):
+                self.results.error("redirect_timeout")
+            elif isinstance(outcome, Exception):
+                LOG.error(f"Participant of experiment {self.index} failed: {outcome!r}")
+                self.results.error(type(outcome).__name__)
+
+
+class ResourceMonitor:
+    """Samples CPU and memory of the docker compose services"""
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.samples = defaultdict(lambda: defaultdict(list))
+        self.available = shutil.which("docker") is not None
+        self._task = None
+
+    async def sample(self):
+        process = await asyncio.create_subprocess_exec(
+            "docker",
+            "stats",
+            "--no-stream",
+            "--format",
+            "{{json .}}",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        stdout, _ = await process.communicate()
+        for line in stdout.decode().splitlines():
+            name, cpu, memory = parse_stats(line)
+            if name is not None:
+                self.samples[name]["cpu_percent"].append(cpu)
+                self.samples[name]["memory_mb"].append(memory)
+
+    async def _run(self):
+        while True:
+            await self.sample()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if not self.available:
+            LOG.warning("Not sampling resources, docker is not available")
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def summary(self):
+        return {
+            name: {
+                key: dict(mean=sum(values) / len(values), max=max(values))
+                for key, values in sample.items()
+            }
+            for name, sample in self.samples.items()
+        }
+
+
+UNITS = {
+    "b": 1,
+    "kb": 1e3,
+    "mb": 1e6,
+    "gb": 1e9,
+    "kib": 2**10,
+    "mib": 2**20,
+    "gib": 2**30,
+}
+MEMORY = re.compile(r"\s*([\d.]+)\s*([kmg]i?b|b)", re.IGNORECASE)
+
+
+def parse_stats(line):
+    """Container name, CPU percentage and memory in MiB of a `docker stats` line"""
+    try:
+        stats = json.loads(line)
+        cpu = float(stats["CPUPerc"].rstrip("%"))
+        memory = MEMORY.match(stats["MemUsage"])
+        amount = float(memory[1]) * UNITS[memory[2].lower()]
+        return stats["Name"], cpu, amount / 2**20
+    except (ValueError, KeyError, TypeError):
+        return None, None, None
+
+
+async def run(config):
+    """Run the load test described by `config`, returns the results as dict"""
+    results = Results()
+    monitor = ResourceMonitor()
+    if config.resources:
+        monitor.start()
+
+    started = time.monotonic()
+    timeout = aiohttp.ClientTimeout(total=config.redirect_timeout + 60)
+    # every participant sends its own slurk session cookie
+    jar = aiohttp.DummyCookieJar()
+    async with aiohttp.ClientSession(timeout=timeout, cookie_jar=jar) as session:
+        experiments = [
+            Experiment(i, config, results) for i in range(config.experiments)
+        ]
+        tasks = []
+        for experiment in experiments:
+            tasks.append(asyncio.create_task(experiment.run(session)))
+            await asyncio.sleep(config.ramp_up / max(config.experiments, 1))
+        await asyncio.gather(*tasks)
+    await monitor.stop()
+
+    summary = results.summary()
+    summary.update(
+        config=vars(config),
+        duration=time.monotonic() - started,
+        messages=sum(len(experiment.sent) for experiment in experiments),
+        resources=monitor.summary() if config.resources else None,
+    )
+    return summary
+
+
+def regressions(results, baseline, tolerance):
+    """Latencies whose p95 grew by more than `tolerance` over `baseline`"""
+    regressed = {}
+    for metric in METRICS:
+        before = baseline["latencies"].get(metric, {}).get("p95")
+        after = results["latencies"].get(metric, {}).get("p95")
+        if before and after and after > before * (1 + tolerance):
+            regressed[metric] = dict(baseline=before, p95=after)
+    return regressed
@@ -1,6 +1,5 @@
 import asyncio
 import logging
-import time
 
 import socketio
 from slurk_setup_descil.slurk_api import (
@@ -8,7 +7,9 @@ from slurk_setup_descil.slurk_api import (
     create_forward_room,
     get,
     redirect_user,
+    set_room_close_time,
 )
+from slurk_setup_descil.timers import get_timers
 
 LOG = logging.getLogger(__name__)
 LOG.setLevel(logging.DEBUG)
@@ -46,6 +47,8 @@ class Managerbot:
 
         self.timeout_manager_active = False
         self.redirect_users_active = False
+        self.deadline = None
+        self._timeout = None
 
         self.bot_name = "ManagerBot"
 
@@ -74,28 +77,34 @@ class Managerbot:
                 if task:
                     await self.user_task_leave(user, task)
 
-    @catch_error
-    async def timeout_manager(self):
+    def start_timeout(self):
+        """Register the deadline of the room"""
         print("TIMEOUT MANAGER STARTED", flush=True)
-        started = time.time()
-        while time.time() < started + self.timeout:
-            await asyncio.sleep(1.0)
-            if not self.sio.connected:
-                return
-
-            left = max(0, int(started + self.timeout - time.time()))
-            await self.sio.emit(
-                "client_broadcast",
-                {
-                    "type": "time_left_chatroom",
-                    "room": self.chat_room_id,
-                    "time_left": left,
-                },
-            )
-            if left == 0:
-                print("LEFT IS 0, BREAK", flush=True)
-                break
+        timers = get_timers()
+        self.deadline = timers.clock() + self.timeout
+        self._timeout = timers.call_at(self.deadline, self.timeout_reached)
+
+    def cancel_timeout(self):
+        if self._timeout is not None:
+            self._timeout.cancel()
 
+    def time_left(self):
+        return max(0, int(self.deadline - get_timers().clock()))
+
+    @catch_error
+    async def announce_close_time(self):
+        """Set the close time of the chat room, slurk pushes it to the users
+        once and their clients count down locally"""
+        await set_room_close_time(
+            self.uri, self.bot_token, self.chat_room_id, self.time_left()
+        )
+
+    @catch_error
+    async def timeout_reached(self):
+        self.cancel_timeout()
+        if not self.sio.connected:
+            return
+        print("LEFT IS 0, BREAK", flush=True)
         await self.redirect_users_timeout()
 
     @catch_error
@@ -184,6 +193,8 @@ class Managerbot:
                 "user": str(self.bot_user),
             },
             namespaces="/",
+            # no sticky sessions needed when slurk runs several workers
+            transports=["websocket"],
         )
         print("CONNECTED", flush=True)
 
@@ -258,13 +269,14 @@ class Managerbot:
         self.users.add((user_id, user_name, task_id))
 
         if not self.timeout_manager_active:
-            t = asyncio.create_task(self.timeout_manager())
-            _async_tasks[id(t)] = t
+            self.start_timeout()
             self.timeout_manager_active = True
+            await self.announce_close_time()
 
     @catch_error
     async def disconnect(self):
         _async_tasks.pop(self, None)
+        self.cancel_timeout()
         print(flush=True)
         await self.sio.disconnect()
 
@@ -1,13 +1,19 @@
 from slurk_setup_descil.setup_service.core import (
     create_waiting_room_tokens,
+    provision_experiment,
+    register_concierge,
     setup_and_register_concierge,
     setup_chat_room,
+    setup_concierge_user,
     setup_waiting_room,
 )
 
 __all__ = [
     "create_waiting_room_tokens",
+    "provision_experiment",
+    "register_concierge",
     "setup_and_register_concierge",
+    "setup_concierge_user",
     "setup_waiting_room",
     "setup_chat_room",
 ]
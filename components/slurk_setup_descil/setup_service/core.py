@@ -1,67 +1,236 @@
-import aiohttp
+import asyncio
+import time
+
 from slurk_setup_descil.slurk_api import (
     create_layout,
     create_room,
     create_room_token,
+    create_room_tokens,
     create_task,
     create_user,
+    get_client,
     set_permissions,
 )
 
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+async def _limited(limit, coro):
+    """Await *coro* while holding the semaphore *limit* (if any)."""
+    if limit is None:
+        return await coro
+    async with limit:
+        return await coro
+
+
+async def _timed(timings, name, coro):
+    """Await *coro* and record its wall clock duration as *timings[name]*."""
+    started = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        timings[name] = round(time.perf_counter() - started, 4)
+
+
+async def provision_experiment(
+    uri, concierge_url, setup, max_concurrency=DEFAULT_MAX_CONCURRENCY
+):
+    """Create all slurk entities of an experiment and register the concierge.
+
+    The slurk REST calls form a small dependency graph::
+
+        waiting layout -> waiting room, waiting task -+-> user tokens -+
+        message permissions --------------------------+                |
+        concierge permissions + waiting room -> concierge token/user --+-> register
+        chat layout -> chat room, chat task ---------------------------+
+
+    Independent branches run concurrently, at most *max_concurrency* slurk
+    requests are in flight at any time. *setup* is updated in place with the
+    created ids; the returned dict holds the duration in seconds of every
+    phase plus the total.
+    """
+    api_token = setup["api_token"]
+    num_users = setup["num_users"]
+    limit = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+    timings = dict()
+    started = time.perf_counter()
+
+    waiting_room = asyncio.ensure_future(
+        _timed(
+            timings,
+            "waiting_room",
+            setup_waiting_room(
+                uri,
+                api_token,
+                num_users,
+                setup["chat_room_timeout_seconds"],
+                limit=limit,
+            ),
+        )
+    )
+    chat_room = asyncio.ensure_future(
+        _timed(timings, "chat_room", setup_chat_room(uri, api_token, num_users, limit))
+    )
+
+    async def user_tokens():
+        permissions_id = await _limited(
+            limit, set_permissions(uri, api_token, MESSAGE_PERMISSIONS)
+        )
+        waiting_room_id, waiting_room_task_id = await waiting_room
+        return await create_waiting_room_tokens(
+            uri,
+            api_token,
+            waiting_room_id,
+            waiting_room_task_id,
+            num_users,
+            limit=limit,
+            permissions_id=permissions_id,
+        )
+
+    async def concierge_user():
+        permissions_id = await _limited(
+            limit, set_permissions(uri, api_token, CONCIERGE_PERMISSIONS)
+        )
+        waiting_room_id, _ = await waiting_room
+        return await setup_concierge_user(
+            uri,
+            api_token,
+            setup["waiting_room_conciergebot_name"],
+            waiting_room_id,
+            limit=limit,
+            permissions_id=permissions_id,
+        )
+
+    tasks = [
+        waiting_room,
+        chat_room,
+        asyncio.ensure_future(_timed(timings, "user_tokens", user_tokens())),
+        asyncio.ensure_future(_timed(timings, "concierge_user", concierge_user())),
+    ]
+    try:
+        (
+            (waiting_room_id, waiting_room_task_id),
+            (chat_room_id, _),
+            waiting_room_tokens,
+            (concierge_token, concierge_user_id),
+        ) = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        # wait for the cancelled branches, so none of them keeps calling slurk
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+    setup.update(
+        dict(
+            waiting_room_id=waiting_room_id,
+            waiting_room_task_id=waiting_room_task_id,
+            user_tokens=waiting_room_tokens,
+            chat_room_id=chat_room_id,
+            concierge_token=concierge_token,
+            concierge_user=concierge_user_id,
+        )
+    )
+
+    await _timed(
+        timings, "register_concierge", register_concierge(concierge_url, setup)
+    )
+    timings["total"] = round(time.perf_counter() - started, 4)
+    return timings
+
 
 async def setup_and_register_concierge(
     uri,
     concierge_url,
     setup,
 ):
-    api_token = setup["api_token"]
-    permissions_id = await set_permissions(uri, api_token, CONCIERGE_PERMISSIONS)
-    concierge_token = await create_room_token(
-        uri, api_token, permissions_id, setup["waiting_room_id"], None, None
-    )
-
-    concierge_user = await create_user(
-        uri, api_token, setup["waiting_room_conciergebot_name"], concierge_token
+    concierge_token, concierge_user = await setup_concierge_user(
+        uri,
+        setup["api_token"],
+        setup["waiting_room_conciergebot_name"],
+        setup["waiting_room_id"],
     )
     setup["concierge_token"] = concierge_token
     setup["concierge_user"] = concierge_user
+    await register_concierge(concierge_url, setup)
 
-    async with aiohttp.ClientSession() as session:
-        async with session.post(
-            f"{concierge_url}/register",
-            json=setup,
-        ) as r:
-            r.raise_for_status()
-            print(r)
 
-
-async def setup_waiting_room(uri, api_token, num_users, timeout_seconds):
-    waiting_room_layout_id = await create_layout(uri, api_token, WAITING_ROOM_LAYOUT)
-    waiting_room_id = await create_room(uri, api_token, waiting_room_layout_id)
-    waiting_room_task_id = await create_task(
-        uri, api_token, waiting_room_layout_id, num_users, "Waiting Room"
+async def setup_concierge_user(
+    uri, api_token, name, waiting_room_id, limit=None, permissions_id=None
+):
+    if permissions_id is None:
+        permissions_id = await _limited(
+            limit, set_permissions(uri, api_token, CONCIERGE_PERMISSIONS)
+        )
+    concierge_token = await _limited(
+        limit,
+        create_room_token(uri, api_token, permissions_id, waiting_room_id, None, None),
     )
+    concierge_user = await _limited(
+        limit, create_user(uri, api_token, name, concierge_token)
+    )
+    return concierge_token, concierge_user
+
+
+async def register_concierge(concierge_url, setup):
+    async with get_client().session.post(
+        f"{concierge_url}/register",
+        json=setup,
+    ) as r:
+        r.raise_for_status()
+        print(r)
 
+
+async def setup_waiting_room(uri, api_token, num_users, timeout_seconds, limit=None):
+    waiting_room_layout_id = await _limited(
+        limit, create_layout(uri, api_token, WAITING_ROOM_LAYOUT)
+    )
+    waiting_room_id, waiting_room_task_id = await asyncio.gather(
+        _limited(limit, create_room(uri, api_token, waiting_room_layout_id)),
+        _limited(
+            limit,
+            create_task(
+                uri, api_token, waiting_room_layout_id, num_users, "Waiting Room"
+            ),
+        ),
+    )
     return waiting_room_id, waiting_room_task_id
 
 
-async def setup_chat_room(uri, api_token, num_users):
-    chat_layout_id = await create_layout(uri, api_token, CHAT_LAYOUT)
-    chat_room_id = await create_room(uri, api_token, chat_layout_id)
-    chat_task_id = await create_task(uri, api_token, chat_layout_id, num_users, "Room")
+async def setup_chat_room(uri, api_token, num_users, limit=None):
+    chat_layout_id = await _limited(limit, create_layout(uri, api_token, CHAT_LAYOUT))
+    chat_room_id, chat_task_id = await asyncio.gather(
+        _limited(limit, create_room(uri, api_token, chat_layout_id)),
+        _limited(limit, create_task(uri, api_token, chat_layout_id, num_users, "Room")),
+    )
     return chat_room_id, chat_task_id
 
 
 async def create_waiting_room_tokens(
-    uri, api_token, waiting_room_id, task_id, num_users
+    uri,
+    api_token,
+    waiting_room_id,
+    task_id,
+    num_users,
+    limit=None,
+    permissions_id=None,
 ):
-    permissions_id = await set_permissions(uri, api_token, MESSAGE_PERMISSIONS)
-    return [
-        await create_room_token(
-            uri, api_token, permissions_id, waiting_room_id, task_id, num_users
+    if permissions_id is None:
+        permissions_id = await _limited(
+            limit, set_permissions(uri, api_token, MESSAGE_PERMISSIONS)
         )
-        for _ in range(num_users)
-    ]
+    return await _limited(
+        limit,
+        create_room_tokens(
+            uri,
+            api_token,
+            permissions_id,
+            waiting_room_id,
+            task_id,
+            num_users,
+            count=num_users,
+        ),
+    )
 
 
 CHAT_LAYOUT = {
@@ -79,10 +248,12 @@ CHAT_LAYOUT = {
             "id": "",
             "layout-content": """
                  $("#text").focus();
-                 function handle_broadcast(payload) {
-                    if (payload['type'] != 'time_left_chatroom') return;
-                    if (payload['room'] != self_room) return;
-                    const time_left = payload['time_left'];
+                 // slurk sends the close time of the room on join and when it
+                 // changes, count down locally
+                 var deadline = null;
+                 function show_time_left() {
+                    if (deadline === null) return;
+                    const time_left = Math.max(0, Math.round((deadline - Date.now()) / 1000));
                     const minutes = Math.floor(time_left / 60);
                     const seconds = time_left % 60;
                     var msg = "";
@@ -96,13 +267,19 @@ CHAT_LAYOUT = {
                     }
                     $("#subtitle")[0].innerText = msg;
                  }
-                 socket.on("client_broadcast", handle_broadcast);
+                 function handle_close_time(payload) {
+                    deadline = payload['time_left'] === null ? null : Date.now() + payload['time_left'] * 1000;
+                    show_time_left();
+                 }
+                 socket.on("close_time", handle_close_time);
+                 setInterval(show_time_left, 1000);
     """,
         },
     ],
     "css": {
         "header, footer": {"background": "#115E91"},
         "#current-users": {"color": "#EEE!important"},
+        "#close-time": {"display": "none!important"},
         "#timeout-message": {"margin": "2em"},
         "#text": {"padding-top": "0.5em!important"},
         "#content": {"min-width": "100%!important"},
@@ -1,31 +1,45 @@
 from slurk_setup_descil.slurk_api.core import (
+    SlurkClient,
     catch_error,
+    close_client,
     create_forward_room,
     create_layout,
     create_room,
     create_room_token,
+    create_room_tokens,
     create_task,
     create_user,
     delete,
     get,
     get_api_token,
+    get_client,
+    open_client,
+    patch,
     post,
     redirect_user,
     set_permissions,
+    set_room_close_time,
 )
 
 __all__ = [
+    "SlurkClient",
     "catch_error",
+    "close_client",
     "create_forward_room",
     "create_layout",
     "create_room",
     "create_room_token",
+    "create_room_tokens",
     "create_task",
     "create_user",
     "delete",
     "get",
     "get_api_token",
+    "get_client",
+    "open_client",
+    "patch",
     "post",
     "redirect_user",
     "set_permissions",
+    "set_room_close_time",
 ]
@@ -1,5 +1,7 @@
+import asyncio
 import os
 import traceback
+import weakref
 from contextlib import asynccontextmanager
 from functools import wraps
 
@@ -18,39 +20,176 @@ def catch_error(coro):
     return wrapped
 
 
+def _setting(value, env_name, default, cast):
+    if value is not None:
+        return value
+    return cast(os.environ.get(env_name, default))
+
+
+class SlurkClient:
+    """Long-lived HTTP client for the slurk REST api.
+
+    Wraps a single ``aiohttp.ClientSession`` whose connector keeps connections
+    alive, so consecutive calls reuse pooled TCP connections instead of paying a
+    fresh connect per request. The session is created lazily on first use and
+    must be used from the event loop it was created in.
+
+    :param limit: Maximum number of simultaneous connections, 0 means unlimited.
+    :type limit: int
+    :param limit_per_host: Maximum number of simultaneous connections per host,
+        0 means unlimited.
+    :type limit_per_host: int
+    :param keepalive_timeout: Seconds an idle connection is kept in the pool.
+    :type keepalive_timeout: float
+    :param timeout: Total timeout in seconds for a single request.
+    :type timeout: float
+    :param connect_timeout: Timeout in seconds for acquiring a connection.
+    :type connect_timeout: float
+    """
+
+    def __init__(
+        self,
+        limit=None,
+        limit_per_host=None,
+        keepalive_timeout=None,
+        timeout=None,
+        connect_timeout=None,
+    ):
+        self.limit = _setting(limit, "SLURK_API_CONNECTION_LIMIT", 100, int)
+        self.limit_per_host = _setting(
+            limit_per_host, "SLURK_API_CONNECTION_LIMIT_PER_HOST", 0, int
+        )
+        self.keepalive_timeout = _setting(
+            keepalive_timeout, "SLURK_API_KEEPALIVE_TIMEOUT", 30, float
+        )
+        self.timeout = _setting(timeout, "SLURK_API_TIMEOUT", 60, float)
+        self.connect_timeout = _setting(
+            connect_timeout, "SLURK_API_CONNECT_TIMEOUT", 10, float
+        )
+        self._session = None
+
+    @property
+    def session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(
+                    total=self.timeout, connect=self.connect_timeout
+                ),
+            )
+        return self._session
+
+    @property
+    def closed(self):
+        return self._session is None or self._session.closed
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    @asynccontextmanager
+    async def get(self, api_token, uri):
+        headers = {
+            "Authorization": f"Bearer {api_token}",
+        }
+        async with self.session.get(uri, headers=headers) as resp:
+            yield resp
+
+    @asynccontextmanager
+    async def post(self, api_token, uri, json=None):
+        print(repr(api_token), repr(uri), repr(json), flush=True)
+        headers = {
+            "Authorization": f"Bearer {api_token}",
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+        }
+        async with self.session.post(uri, headers=headers, json=json) as resp:
+            yield resp
+
+    @asynccontextmanager
+    async def patch(self, api_token, uri, json=None, etag=None):
+        headers = {
+            "Authorization": f"Bearer {api_token}",
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+        }
+        if etag:
+            headers["If-Match"] = etag
+        async with self.session.patch(uri, headers=headers, json=json) as resp:
+            yield resp
+
+    @asynccontextmanager
+    async def delete(self, api_token, uri, etag=None):
+        headers = {
+            "Authorization": f"Bearer {api_token}",
+        }
+        if etag:
+            headers["If-Match"] = etag
+        async with self.session.delete(uri, headers=headers) as resp:
+            yield resp
+
+
+# one client per event loop: aiohttp sessions must not be shared across loops
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_client():
+    """Return the ``SlurkClient`` of the running event loop, create it if needed."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = SlurkClient()
+    return client
+
+
+async def open_client(app=None):
+    """Startup hook: create the pooled session of the running loop eagerly.
+
+    Accepts and ignores ``app`` so that it can be registered directly as an
+    aiohttp ``on_startup`` signal handler.
+    """
+    get_client().session
+
+
+async def close_client(app=None):
+    """Shutdown hook: close the pooled session of the running loop.
+
+    Accepts and ignores ``app`` so that it can be registered directly as an
+    aiohttp ``on_cleanup`` signal handler.
+    """
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
 @asynccontextmanager
 async def get(api_token, uri):
-    headers = {
-        "Authorization": f"Bearer {api_token}",
-    }
-    async with aiohttp.ClientSession() as session:
-        async with session.get(uri, headers=headers) as resp:
-            yield resp
+    async with get_client().get(api_token, uri) as resp:
+        yield resp
 
 
 @asynccontextmanager
 async def post(api_token, uri, json=None):
-    print(repr(api_token), repr(uri), repr(json), flush=True)
-    headers = {
-        "Authorization": f"Bearer {api_token}",
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-    }
-    async with aiohttp.ClientSession() as session:
-        async with session.post(uri, headers=headers, json=json) as resp:
-            yield resp
+    async with get_client().post(api_token, uri, json) as resp:
+        yield resp
+
+
+@asynccontextmanager
+async def patch(api_token, uri, json=None, etag=None):
+    async with get_client().patch(api_token, uri, json, etag) as resp:
+        yield resp
 
 
 @asynccontextmanager
 async def delete(api_token, uri, etag=None):
-    headers = {
-        "Authorization": f"Bearer {api_token}",
-    }
-    if etag:
-        headers["If-Match"] = etag
-    async with aiohttp.ClientSession() as session:
-        async with session.delete(uri, headers=headers) as resp:
-            yield resp
+    async with get_client().delete(api_token, uri, etag) as resp:
+        yield resp
 
 
 async def set_permissions(uri, api_token, permissions):
@@ -83,6 +222,25 @@ async def create_room_token(
         return (await r.json())["id"]
 
 
+async def create_room_tokens(
+    uri, api_token, permissions_id, room_id, task_id=None, num_users=None, count=1
+):
+    """Create *count* identical tokens with a single request, return their ids."""
+    token = dict(
+        permissions_id=permissions_id,
+        room_id=room_id,
+    )
+    if task_id is not None:
+        token["task_id"] = task_id
+    if num_users is not None:
+        token["registrations_left"] = num_users
+    async with post(
+        api_token, uri + "/slurk/api/tokens/bulk", dict(count=count, token=token)
+    ) as r:
+        r.raise_for_status()
+        return (await r.json())["ids"]
+
+
 async def create_layout(uri, api_token, layout):
     async with post(api_token, uri + "/slurk/api/layouts", layout) as r:
         r.raise_for_status()
@@ -182,6 +340,22 @@ async def create_forward_room(slurk_uri, token, forward_url):
         return (await r.json())["id"]
 
 
+async def set_room_close_time(slurk_uri, token, room_id, seconds):
+    """Let the room close in `seconds`, its users count down locally.
+
+    :param room_id: Identifier of room.
+    :type room_id: int
+    :param seconds: Seconds from now, None removes the close time.
+    :type seconds: float
+    """
+    uri = f"{slurk_uri}/slurk/api/rooms/{room_id}"
+    async with get(token, uri) as response:
+        response.raise_for_status()
+        etag = response.headers["ETag"]
+    async with patch(token, uri, {"closes_in": seconds}, etag) as response:
+        response.raise_for_status()
+
+
 async def get_user_etag(slurk_uri, token, user):
     async with get(token, f"{slurk_uri}/slurk/api/users/{user}") as response:
         if not response.ok:
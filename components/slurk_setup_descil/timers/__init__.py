@@ -0,0 +1,3 @@
+from slurk_setup_descil.timers.core import Timers, get_timers, timer_metrics
+
+__all__ = ["Timers", "get_timers", "timer_metrics"]
@@ -0,0 +1,154 @@
+"""Deadlines of all bots of a process.
+
+Every bot used to run its own task polling its deadline, so the process
+woke up several times per second and room even while nothing happened.
+`Timers` keeps the deadlines of all bots on one heap and schedules a single
+event loop callback for the earliest one, idle rooms cost no wakeups.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+import weakref
+from collections import Counter
+
+LOG = logging.getLogger(__name__)
+
+
+class Timer:
+    """Handle of a scheduled callback"""
+
+    __slots__ = ("deadline", "seq", "callback", "args", "cancelled", "_timers")
+
+    def __init__(self, deadline, seq, callback, args, timers):
+        self.deadline = deadline
+        self.seq = seq
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+        self._timers = timers
+
+    def cancel(self):
+        if not self.cancelled:
+            self.cancelled = True
+            self._timers._cancelled(self)
+
+    def __lt__(self, other):
+        return (self.deadline, self.seq) < (other.deadline, other.seq)
+
+
+class Timers:
+    """Timer heap of one event loop.
+
+    Callbacks may be plain functions or coroutine functions, coroutines run
+    as tasks of their own.
+    """
+
+    def __init__(self, loop=None, clock=time.monotonic):
+        self.loop = loop or asyncio.get_running_loop()
+        self.clock = clock
+        self.stats = Counter()
+        self._heap = []
+        self._seq = itertools.count()
+        self._wakeup = None
+        self._wakeup_at = None
+        self._cancelled_count = 0
+        self._tasks = set()
+
+    def call_at(self, deadline, callback, *args):
+        """Call `callback(*args)` once `clock()` reaches `deadline`"""
+        timer = Timer(deadline, next(self._seq), callback, args, self)
+        heapq.heappush(self._heap, timer)
+        self.stats["scheduled"] += 1
+        self._schedule()
+        return timer
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(self.clock() + delay, callback, *args)
+
+    def __len__(self):
+        return len(self._heap) - self._cancelled_count
+
+    def metrics(self):
+        metrics = dict(scheduled=0, fired=0, cancelled=0, wakeups=0)
+        metrics.update(self.stats)
+        metrics["pending"] = len(self)
+        return metrics
+
+    def _cancelled(self, timer):
+        self.stats["cancelled"] += 1
+        self._cancelled_count += 1
+        # drop cancelled timers once they make up most of the heap
+        if self._cancelled_count > 64 and self._cancelled_count > len(self._heap) / 2:
+            self._heap = [t for t in self._heap if not t.cancelled]
+            heapq.heapify(self._heap)
+            self._cancelled_count = 0
+        self._schedule()
+
+    def _pop_cancelled(self):
+        while self._heap and self._heap[0].cancelled:
+            heapq.heappop(self._heap)
+            self._cancelled_count -= 1
+
+    def _schedule(self):
+        """Wake up for the earliest deadline, and only then"""
+        self._pop_cancelled()
+        deadline = self._heap[0].deadline if self._heap else None
+        if deadline == self._wakeup_at:
+            return
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+        self._wakeup_at = deadline
+        if deadline is not None:
+            delay = max(0.0, deadline - self.clock())
+            self._wakeup = self.loop.call_at(self.loop.time() + delay, self._run)
+
+    def _run(self):
+        # the event loop may wake up a bit before the deadline it was given
+        now = max(self.clock(), self._wakeup_at)
+        self._wakeup = None
+        self._wakeup_at = None
+        self.stats["wakeups"] += 1
+        due = []
+        while self._heap and self._heap[0].deadline <= now:
+            timer = heapq.heappop(self._heap)
+            if timer.cancelled:
+                self._cancelled_count -= 1
+                continue
+            # a fired timer cannot be cancelled anymore
+            timer.cancelled = True
+            due.append(timer)
+        for timer in due:
+            self.stats["fired"] += 1
+            self._call(timer.callback, timer.args)
+        self._schedule()
+
+    def _call(self, callback, args):
+        try:
+            result = callback(*args)
+        except Exception:
+            LOG.exception(f"Timer callback {callback!r} failed")
+            return
+        if asyncio.iscoroutine(result):
+            task = self.loop.create_task(result)
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+
+_timers = weakref.WeakKeyDictionary()
+
+
+def get_timers():
+    """The timers of the running event loop"""
+    loop = asyncio.get_running_loop()
+    timers = _timers.get(loop)
+    if timers is None:
+        timers = _timers[loop] = Timers(loop)
+    return timers
+
+
+def timer_metrics():
+    return get_timers().metrics()
@@ -0,0 +1,118 @@
+"""Compare the chatbot gating strategies against a fake OpenAI server
+
+Replays scripted conversations through `gpt_bot` once per strategy of
+`slurk_setup_descil.chatbot.gating` and prints the latency per user message,
+the number of chat completion requests and the tokens they used. The
+`fake_openai` server answers after `--latency` seconds plus `--per-token`
+seconds per completion token, wants to answer to every message and counts
+tokens as words.
+
+    PYTHONPATH=components:bases python development/gating_benchmark.py
+    PYTHONPATH=components:bases python development/gating_benchmark.py --json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+from aiohttp.test_utils import TestServer
+from slurk_setup_descil.chatbot import gating, gpt_bot
+from slurk_setup_descil.fake_openai import FakeOpenAI
+
+CONVERSATIONS = [
+    [
+        ("Alice", "Hi everyone"),
+        ("Bob", "hey"),
+        ("Alice", "Which of the options would you pick first?"),
+        ("Bob", "ok"),
+        ("Alice", "I would go for the train, it is the most sustainable one"),
+        ("Bob", "Ash, what do you think about flying?"),
+    ],
+    [
+        ("Carol", "hello"),
+        ("Dave", "So we have to agree on a ranking of the five items"),
+        ("Carol", "lol"),
+        ("Dave", "the water is clearly the most important item"),
+        ("Carol", "agreed"),
+        ("Dave", "Should the map come second?"),
+    ],
+]
+
+
+async def run(strategy, repeat):
+    os.environ["AI_GATING"] = strategy
+    gpt_bot.USAGE.clear()
+    bot = gpt_bot.gpt_bot(1)
+
+    timings = []
+    messages = answers = 0
+    for _ in range(repeat):
+        for conversation in CONVERSATIONS:
+            past = []
+            for sender, text in conversation:
+                past.append({"sender": sender, "text": text})
+                start = time.perf_counter()
+                answer = await bot(past, 1)
+                timings.append(time.perf_counter() - start)
+                messages += 1
+                if answer is not None:
+                    answers += 1
+                    past.append({"sender": "Ash", "text": answer})
+
+    usage = gpt_bot.llm_usage()
+    timings.sort()
+    return dict(
+        strategy=strategy,
+        messages=messages,
+        answers=answers,
+        p50_ms=statistics.median(timings) * 1000,
+        p95_ms=timings[int(0.95 * (len(timings) - 1))] * 1000,
+        requests_per_message=usage["requests"] / messages,
+        prompt_tokens_per_message=usage["prompt_tokens"] / messages,
+        completion_tokens_per_message=usage["completion_tokens"] / messages,
+    )
+
+
+async def main(args):
+    openai = FakeOpenAI(
+        latency=args.latency,
+        latency_sigma=0,
+        tokens_per_second=1 / args.per_token if args.per_token else 0,
+        seed=0,
+    )
+    async with TestServer(openai.app()) as server:
+        os.environ.update(
+            AI_PROVIDER="",
+            OPENAI_API_KEY="key",
+            OPENAI_BASE_URL=str(server.make_url("/v1")),
+        )
+        gpt_bot.client = None
+        return [await run(strategy, args.repeat) for strategy in args.strategies]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--strategies", nargs="+", default=list(gating.GATES), choices=gating.GATES
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--per-token", type=float, default=0.01)
+    parser.add_argument("--json", action="store_true", help="Print JSON lines")
+    args = parser.parse_args()
+
+    for result in asyncio.run(main(args)):
+        if args.json:
+            print(json.dumps(result))
+            continue
+        print(
+            f"{result['strategy']:<10}"
+            f" answered {result['answers']:>3}/{result['messages']:<3}"
+            f" p50 {result['p50_ms']:7.1f} ms  p95 {result['p95_ms']:7.1f} ms"
+            f"  requests {result['requests_per_message']:.2f}"
+            f"  prompt tokens {result['prompt_tokens_per_message']:7.1f}"
+            f"  completion tokens {result['completion_tokens_per_message']:5.1f}"
+        )
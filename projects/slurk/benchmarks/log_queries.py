@@ -0,0 +1,229 @@
+"""Time the log, room member and token queries on a seeded database
+
+Seeds a database with users, rooms and `--rows` log entries and runs the
+queries behind the room history, the log listing, session and admin token
+lookups, once with the indexes from `slurk.models.migrations` and once
+without them. Prints the median time and the query plan of each query.
+
+    python -m benchmarks.log_queries --rows 2000000
+    python -m benchmarks.log_queries --database postgresql://... --keep
+
+Run from `projects/slurk`. An existing database is only seeded when it does
+not contain any logs yet.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from slurk.extensions.database import Base, Database
+from slurk.models import Layout, Log, Permissions, Room, Token, User
+from slurk.models.common import user_room
+from slurk.models.migrations import INDEXES
+from slurk.views.api.logs import paginate
+from sqlalchemy import create_engine, func, insert, or_, text
+
+EVENTS = ("text_message", "keystroke", "mouse", "join", "leave", "command")
+CHUNK = 50000
+
+
+def seed(session, rows, rooms, users):
+    layout = Layout(
+        title="Benchmark",
+        show_users=True,
+        show_latency=False,
+        read_only=False,
+        openvidu_settings={},
+    )
+    permissions = Permissions(
+        api=False,
+        send_message=True,
+        send_html_message=False,
+        send_image=False,
+        send_command=False,
+        send_privately=True,
+        receive_bounding_box=False,
+        broadcast=False,
+    )
+    session.add_all([layout, permissions])
+    session.flush()
+
+    session.execute(
+        insert(Room),
+        [dict(layout_id=layout.id, read_only=False) for _ in range(rooms)],
+    )
+    session.execute(
+        insert(Token),
+        [
+            dict(
+                id=f"00000000-0000-0000-0000-{i:012d}",
+                permissions_id=permissions.id,
+                registrations_left=1,
+                openvidu_settings={},
+            )
+            for i in range(1, users + 1)
+        ],
+    )
+    session.execute(
+        insert(User),
+        [
+            dict(
+                name=f"user {i}",
+                token_id=f"00000000-0000-0000-0000-{i:012d}",
+                session_id=f"session-{i}",
+            )
+            for i in range(1, users + 1)
+        ],
+    )
+    room_ids = [id for (id,) in session.query(Room.id)]
+    user_ids = [id for (id,) in session.query(User.id)]
+    members = {user_id: random.choice(room_ids) for user_id in user_ids}
+    session.execute(
+        insert(user_room),
+        [dict(user_id=user, room_id=room) for user, room in members.items()],
+    )
+    session.commit()
+
+    start = datetime.utcnow() - timedelta(days=30)
+    for offset in range(0, rows, CHUNK):
+        batch = []
+        for i in range(offset, min(offset + CHUNK, rows)):
+            user_id = random.choice(user_ids)
+            private = random.random() < 0.05
+            batch.append(
+                dict(
+                    event=random.choice(EVENTS),
+                    user_id=user_id,
+                    room_id=members[user_id],
+                    receiver_id=random.choice(user_ids) if private else None,
+                    data={"i": i},
+                    date_created=start + timedelta(milliseconds=i),
+                )
+            )
+        session.execute(insert(Log), batch)
+        session.commit()
+        print(f"  seeded {offset + len(batch)} logs", end="\r", flush=True)
+    print()
+
+    # collect statistics for the query planner, as autovacuum would
+    session.execute(text("ANALYZE"))
+    session.commit()
+
+
+def queries(session):
+    user = session.query(User).order_by(User.id).offset(17).first()
+    room_id = (
+        session.query(user_room.c.room_id)
+        .filter(user_room.c.user_id == user.id)
+        .scalar()
+    )
+
+    history = session.query(Log).filter_by(room_id=room_id)
+    history = history.filter(
+        or_(
+            Log.receiver_id == None,  # NOQA
+            Log.user_id == user.id,
+            Log.receiver_id == user.id,
+        )
+    )
+
+    return {
+        "room history": paginate(history, {}),
+        "room history, last 50 messages": paginate(
+            history.filter(Log.event.in_(["text_message"])), {"last": 50}
+        ),
+        "logs by event, first page": paginate(
+            session.query(Log).filter_by(event="command"),
+            {"limit": 100},
+            descending=True,
+        ),
+        "user by session id": session.query(User).filter_by(session_id=user.session_id),
+        "room members": session.query(user_room.c.user_id).filter(
+            user_room.c.room_id == room_id
+        ),
+        "admin token": session.query(Token)
+        .filter_by(registrations_left=-1)
+        .filter(Token.permissions.has(Permissions.api)),
+    }
+
+
+def explain(session, query):
+    statement = query.statement.compile(
+        session.bind, compile_kwargs={"literal_binds": True}
+    )
+    if session.bind.dialect.name == "sqlite":
+        rows = session.execute(text(f"EXPLAIN QUERY PLAN {statement}"))
+        return "; ".join(row[-1] for row in rows)
+    rows = session.execute(text(f"EXPLAIN {statement}"))
+    return "; ".join(row[0].strip() for row in rows)
+
+
+def run(session, repeat):
+    for name, query in queries(session).items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            count = len(query.all())
+            timings.append(time.perf_counter() - start)
+        median = statistics.median(timings) * 1000
+        print(f"  {name:<32} {median:10.2f} ms  {count:>8} rows")
+        print(f"      {explain(session, query)}")
+
+
+def indexes():
+    return [
+        index
+        for table in Base.metadata.tables.values()
+        for index in table.indexes
+        if index.name in INDEXES
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", help="SQLAlchemy URI, defaults to SQLite")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--rooms", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="Keep the database")
+    args = parser.parse_args()
+
+    path = None
+    if args.database is None:
+        path = os.path.join(tempfile.gettempdir(), "slurk-benchmark.db")
+        args.database = f"sqlite:///{path}"
+
+    random.seed(0)
+    engine = create_engine(args.database)
+    database = Database(engine=engine)
+    session = database.create_session()
+    try:
+        if session.query(func.count(Log.id)).scalar() == 0:
+            print(f"Seeding {args.rows} logs into {engine.url!r}")
+            seed(session, args.rows, args.rooms, args.users)
+
+        print("With indexes")
+        run(session, args.repeat)
+
+        session.close()
+        for index in indexes():
+            index.drop(bind=engine, checkfirst=True)
+        print("Without indexes")
+        run(session, args.repeat)
+    finally:
+        session.close()
+        for index in indexes():
+            index.create(bind=engine, checkfirst=True)
+        if not args.keep:
+            database.clear()
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
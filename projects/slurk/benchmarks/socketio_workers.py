@@ -0,0 +1,230 @@
+"""Measure the chat message throughput of slurk with several workers
+
+Starts slurk with gunicorn once for every count in `--workers`, connects
+`--clients` websocket clients to rooms of `--room-size` users, lets every
+client send `--messages` messages as fast as the server accepts them and
+prints the delivered messages per second and the delivery latency.
+
+    python -m benchmarks.socketio_workers --workers 1 2 4 \\
+        --message-queue redis://localhost:6379/0
+
+Run from `projects/slurk`. All workers share the database and, with more
+than one worker, the message queue. The clients only use websockets, so
+gunicorn may hand their connections to any worker without sticky sessions.
+Each client is a thread of this process; give the server more cores than
+this process for meaningful numbers.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import requests
+import socketio
+
+ADMIN_TOKEN = str(uuid.uuid4())
+SECRET_KEY = uuid.uuid4().hex
+
+
+def start_server(workers, port, database, message_queue):
+    env = dict(
+        os.environ,
+        SLURK_DATABASE_URI=database,
+        SLURK_SECRET_KEY=SECRET_KEY,
+        SLURK_SOCKETIO_TRANSPORTS="websocket",
+        SLURK_MESSAGE_QUEUE=message_queue or "",
+        ADMIN_TOKEN=ADMIN_TOKEN,
+    )
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "--workers",
+            str(workers),
+            "-k",
+            "geventwebsocket.gunicorn.workers.GeventWebSocketWorker",
+            "-b",
+            f"127.0.0.1:{port}",
+            "slurk:create_app()",
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(120):
+        try:
+            requests.get(f"{url}/slurk/api/layouts", headers=auth(), timeout=5)
+            # give the other workers time to boot as well
+            time.sleep(workers)
+            return server, url
+        except requests.RequestException:
+            time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError("slurk did not start")
+
+
+def auth():
+    return {"Authorization": f"Bearer {ADMIN_TOKEN}"}
+
+
+def provision(url, clients, room_size):
+    """Create the rooms and return a token per client"""
+
+    def post(path, json):
+        response = requests.post(f"{url}/slurk/api/{path}", json=json, headers=auth())
+        response.raise_for_status()
+        return response.json()["id"]
+
+    layout = post("layouts", {"title": "Benchmark"})
+    permissions = post("permissions", {"send_message": True})
+    tokens = []
+    for i in range(clients):
+        if i % room_size == 0:
+            room = post("rooms", {"layout_id": layout})
+        tokens.append(
+            (room, post("tokens", {"permissions_id": permissions, "room_id": room}))
+        )
+    return tokens
+
+
+class Client:
+    def __init__(self, url, room, token, name):
+        self.url = url
+        self.room = room
+        self.token = token
+        self.name = name
+        self.joined = threading.Event()
+        self.latencies = []
+        self.last_received = None
+        self.sio = socketio.Client(reconnection=False)
+        self.sio.on("joined_room", self._joined_room)
+        self.sio.on("text_message", self._text_message)
+
+    def _joined_room(self, data):
+        if data.get("room") == self.room:
+            self.joined.set()
+
+    def _text_message(self, data):
+        self.last_received = time.perf_counter()
+        self.latencies.append(self.last_received - float(data["message"]))
+
+    def connect(self):
+        response = requests.get(
+            f"{self.url}/login/",
+            params=dict(token=self.token, name=self.name),
+            allow_redirects=False,
+        )
+        cookie = "; ".join(f"{k}={v}" for k, v in response.cookies.items())
+        self.sio.connect(self.url, headers={"Cookie": cookie}, transports=["websocket"])
+        if not self.joined.wait(30):
+            raise RuntimeError(f"{self.name} did not join its room")
+
+    def send(self, messages):
+        for _ in range(messages):
+            # the text handler returns after the message was emitted
+            self.sio.call(
+                "text", {"room": self.room, "message": repr(time.perf_counter())}
+            )
+
+    def disconnect(self):
+        self.sio.disconnect()
+
+
+def run(url, args):
+    tokens = provision(url, args.clients, args.room_size)
+    clients = [
+        Client(url, room, token, f"client-{i}")
+        for i, (room, token) in enumerate(tokens)
+    ]
+    for client in clients:
+        client.connect()
+
+    # every message is delivered to all users of the room, the sender included
+    sizes = [
+        min(args.room_size, args.clients - i)
+        for i in range(0, args.clients, args.room_size)
+    ]
+    expected = args.messages * sum(size * size for size in sizes)
+    started = time.perf_counter()
+    senders = [
+        threading.Thread(target=client.send, args=(args.messages,))
+        for client in clients
+    ]
+    for sender in senders:
+        sender.start()
+    for sender in senders:
+        sender.join()
+
+    deadline = time.monotonic() + args.timeout
+    while time.monotonic() < deadline:
+        if sum(len(client.latencies) for client in clients) >= expected:
+            break
+        time.sleep(0.1)
+
+    for client in clients:
+        client.disconnect()
+
+    latencies = sorted(latency for client in clients for latency in client.latencies)
+    finished = max(
+        (c.last_received for c in clients if c.last_received), default=started
+    )
+    return dict(
+        delivered=len(latencies),
+        expected=expected,
+        throughput=len(latencies) / max(finished - started, 1e-9),
+        p50=statistics.median(latencies) * 1000 if latencies else None,
+        p95=latencies[int(len(latencies) * 0.95)] * 1000 if latencies else None,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--message-queue", help="e.g. redis://localhost:6379/0")
+    parser.add_argument("--database", help="SQLAlchemy URI, defaults to SQLite")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--room-size", type=int, default=4)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--port", type=int, default=5123)
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    if max(args.workers) > 1 and not args.message_queue:
+        parser.error("more than one worker requires --message-queue")
+
+    print(f"{'workers':>8} {'delivered':>12} {'msg/s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for workers in args.workers:
+        path = None
+        database = args.database
+        if database is None:
+            path = os.path.join(tempfile.mkdtemp(), "slurk-benchmark.db")
+            database = f"sqlite:///{path}"
+
+        server, url = start_server(workers, args.port, database, args.message_queue)
+        try:
+            result = run(url, args)
+        finally:
+            server.terminate()
+            server.wait()
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+
+        delivered = f"{result['delivered']}/{result['expected']}"
+        p50 = f"{result['p50']:.1f}" if result["p50"] is not None else "-"
+        p95 = f"{result['p95']:.1f}" if result["p95"] is not None else "-"
+        print(
+            f"{workers:>8} {delivered:>12} {result['throughput']:>10.0f}"
+            f" {p50:>8} {p95:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,14 @@ from flask import Flask
 from slurk.extensions import api as api_ext
 from slurk.extensions import database as database_ext
 from slurk.extensions import events as event_ext
+from slurk.extensions import live_typing as live_typing_ext
+from slurk.extensions import log_writer as log_writer_ext
 from slurk.extensions import login as login_ext
 from slurk.extensions import openvidu as openvidu_ext
+from slurk.extensions import rate_limit as rate_limit_ext
+from slurk.extensions import room_cache as room_cache_ext
+from slurk.extensions import token_cache as token_cache_ext
+from slurk.extensions import typing_state as typing_state_ext
 from slurk.models import Token
 
 
@@ -45,6 +51,12 @@ def create_app(test_config=None, engine=None):
         openvidu_ext.init_app(app)  # NOQA
         api_ext.init_app(app)
         database_ext.init_app(app, engine)
+        log_writer_ext.init_app(app, database_ext.db)
+        room_cache_ext.init_app(app)
+        token_cache_ext.init_app(app)
+        rate_limit_ext.init_app(app)
+        typing_state_ext.init_app(app)
+        live_typing_ext.init_app(app)
 
         if app.config["DEBUG"]:
             admin_token = "00000000-0000-0000-0000-000000000000"
@@ -23,6 +23,60 @@ DATABASE = os.environ.get("SLURK_DATABASE_URI", "sqlite:///:memory:")
 
 ETAG_DISABLED = environ_as_boolean("SLURK_DISABLE_ETAG", False)
 
+# Log entries for these events are buffered and bulk-inserted in the background,
+# all other events are committed synchronously
+LOG_WRITE_BEHIND = environ_as_boolean("SLURK_LOG_WRITE_BEHIND", True)
+LOG_ASYNC_EVENTS = os.environ.get(
+    "SLURK_LOG_ASYNC_EVENTS",
+    "keystroke,mouse,bounding_box,join,leave,connect,disconnect",
+).split(",")
+LOG_BUFFER_SIZE = int(os.environ.get("SLURK_LOG_BUFFER_SIZE", "10000"))
+LOG_FLUSH_SIZE = int(os.environ.get("SLURK_LOG_FLUSH_SIZE", "500"))
+LOG_FLUSH_INTERVAL = float(os.environ.get("SLURK_LOG_FLUSH_INTERVAL", "1.0"))
+
+# Seconds a cached room membership may be served before it is reloaded
+ROOM_CACHE_TTL = float(os.environ.get("SLURK_ROOM_CACHE_TTL", "30"))
+
+# Seconds and number of entries for the REST API token check cache
+TOKEN_CACHE_TTL = float(os.environ.get("SLURK_TOKEN_CACHE_TTL", "60"))
+TOKEN_CACHE_SIZE = int(os.environ.get("SLURK_TOKEN_CACHE_SIZE", "4096"))
+
+# Broadcasts per second and burst size of every sender of `client_broadcast`,
+# a rate of 0 disables the limit
+CLIENT_BROADCAST_RATE = float(os.environ.get("SLURK_CLIENT_BROADCAST_RATE", "10"))
+CLIENT_BROADCAST_BURST = int(os.environ.get("SLURK_CLIENT_BROADCAST_BURST", "20"))
+
+# Seconds between two `typing_users` updates of a room, changes in between are
+# sent together. 0 sends every change right away
+TYPING_INTERVAL = float(os.environ.get("SLURK_TYPING_INTERVAL", "0.5"))
+
+# Seconds between two live-typing frames of a user, and every how many frames
+# the full text is sent instead of the changes. 0 sends every change right away
+LIVE_TYPING_INTERVAL = float(os.environ.get("SLURK_LIVE_TYPING_INTERVAL", "0.1"))
+LIVE_TYPING_KEYFRAME = int(os.environ.get("SLURK_LIVE_TYPING_KEYFRAME", "20"))
+
+# Largest batch of samples a client may send with one `telemetry` event
+TELEMETRY_MAX_SAMPLES = int(os.environ.get("SLURK_TELEMETRY_MAX_SAMPLES", "1000"))
+
+# Pub/sub backend shared by several workers, `redis://...` or `local://`
+MESSAGE_QUEUE = os.environ.get("SLURK_MESSAGE_QUEUE") or None
+MESSAGE_QUEUE_CHANNEL = os.environ.get("SLURK_MESSAGE_QUEUE_CHANNEL", "slurk")
+
+# socket.io transports of the server and the chat client. Polling requires
+# sticky sessions when running several workers, websocket alone does not
+SOCKETIO_TRANSPORTS = os.environ.get(
+    "SLURK_SOCKETIO_TRANSPORTS", "polling,websocket"
+).split(",")
+
+# Number of entries the chat client loads as room history, 0 loads all of them.
+# When limited, only entries for HISTORY_EVENTS count towards the limit
+HISTORY_LENGTH = int(os.environ.get("SLURK_HISTORY_LENGTH", "0"))
+HISTORY_EVENTS = os.environ.get(
+    "SLURK_HISTORY_EVENTS",
+    "text_message,image_message,set_attribute,set_text,class_add,class_removed,"
+    "remove_attribute",
+).split(",")
+
 if "SLURK_OPENVIDU_URL" in os.environ:
     OPENVIDU_URL = os.environ["SLURK_OPENVIDU_URL"]
     OPENVIDU_SECRET = os.environ.get("SLURK_OPENVIDU_SECRET")
@@ -123,12 +123,13 @@ class Blueprint(flask_smorest.Blueprint):
             rule = rule[:-1]
         return super().route(rule, parameters=parameters, **options)
 
-    def query(self, parameter, schema, check_etag=True):
+    def query(self, parameter, schema, check_etag=True, options=()):
         """
         Used as decorator for getting an entity by id.
 
         Searches for "`parameter`_id" and passes the entity as "`parameter`" to the
-        decorated function.
+        decorated function. `options` are loader options for the relationships
+        the endpoint needs, so they are loaded with the entity.
         """
         cls = schema.Meta.model
 
@@ -139,7 +140,7 @@ class Blueprint(flask_smorest.Blueprint):
                 id = kwargs.pop(parameter_id)
                 if isinstance(id, UUID):
                     id = str(id)
-                entry = current_app.session.query(cls).get(id)
+                entry = current_app.session.query(cls).options(*options).get(id)
                 if not entry:
                     abort(
                         NotFound,
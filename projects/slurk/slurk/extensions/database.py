@@ -52,7 +52,9 @@ class Database:
                 cursor.close()
 
     def init(self):
-        Base.metadata.create_all(bind=self.engine)
+        from slurk.models.migrations import migrate
+
+        migrate(self.engine)
 
     def clear(self):
         Base.metadata.drop_all(bind=self.engine)
@@ -1,7 +1,76 @@
+import threading
+
 from flask_socketio import SocketIO
+from slurk.extensions import message_queue
 
 socketio = SocketIO(ping_interval=5, ping_timeout=120)
 
 
+class FanOut:
+    """Number of emits and of receiving sockets per event.
+
+    Only counts the sockets connected to this worker, emits relayed to other
+    workers through the message queue are counted there.
+
+    An event can be split by a `kind` chosen by clients, e.g. the type of a
+    `client_broadcast`. Kinds are cut to `kind_length` characters and only the
+    first `max_kinds` of an event are counted on their own, the others are
+    counted together as `"<event>:other"`.
+    """
+
+    def __init__(self, max_kinds=32, kind_length=32):
+        self.max_kinds = max_kinds
+        self.kind_length = kind_length
+        self._counts = {}
+        self._kinds = {}
+        self._lock = threading.Lock()
+
+    def add(self, event, recipients, kind=None):
+        with self._lock:
+            if kind is not None:
+                event = f"{event}:{self._kind(event, kind)}"
+            emits, total = self._counts.get(event, (0, 0))
+            self._counts[event] = (emits + 1, total + recipients)
+
+    def _kind(self, event, kind):
+        if not isinstance(kind, str):
+            return "other"
+        kind = kind[: self.kind_length]
+        kinds = self._kinds.setdefault(event, set())
+        if kind not in kinds:
+            if len(kinds) >= self.max_kinds:
+                return "other"
+            kinds.add(kind)
+        return kind
+
+    def metrics(self):
+        with self._lock:
+            return {
+                event: dict(emits=emits, recipients=recipients)
+                for event, (emits, recipients) in self._counts.items()
+            }
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+            self._kinds.clear()
+
+
+fanout = FanOut()
+
+
+def connected_sockets(namespace="/"):
+    """Number of sockets connected to this worker"""
+    return len(socketio.server.manager.rooms.get(namespace, {}).get(None, ()))
+
+
 def init_app(app):
-    socketio.init_app(app)
+    socketio.init_app(
+        app,
+        client_manager=message_queue.client_manager(
+            app.config.get("MESSAGE_QUEUE"),
+            app.config.get("MESSAGE_QUEUE_CHANNEL", "slurk"),
+        ),
+        transports=app.config.get("SOCKETIO_TRANSPORTS"),
+    )
+    message_queue.init_app(app, socketio.server)
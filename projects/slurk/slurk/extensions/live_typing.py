@@ -0,0 +1,212 @@
+import atexit
+import logging
+import threading
+
+LOG = logging.getLogger(__name__)
+
+
+def apply_ops(text, ops):
+    """Apply the splice operations `[position, delete, insert]` to `text`
+
+    Positions and lengths count code points, clients have to convert them
+    from the UTF-16 code units of JavaScript strings.
+    """
+    if not isinstance(ops, (list, tuple)):
+        raise ValueError(f"Invalid operations {ops!r}")
+    for op in ops:
+        try:
+            position, delete, insert = op
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid operation {op!r}")
+        if not (
+            isinstance(position, int)
+            and isinstance(delete, int)
+            and isinstance(insert, str)
+            and 0 <= position <= len(text)
+            and 0 <= delete <= len(text) - position
+        ):
+            raise ValueError(f"Invalid operation {op!r}")
+        text = text[:position] + insert + text[position + delete :]
+    return text
+
+
+def diff(old, new):
+    """The splice operation turning `old` into `new`"""
+    prefix = 0
+    end = min(len(old), len(new))
+    while prefix < end and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    end -= prefix
+    while suffix < end and old[-suffix - 1] == new[-suffix - 1]:
+        suffix += 1
+    return [prefix, len(old) - prefix - suffix, new[prefix : len(new) - suffix]]
+
+
+class Preview:
+    """The text a user is typing and what the rooms have seen of it"""
+
+    __slots__ = ("user", "room_ids", "text", "sent", "seq")
+
+    def __init__(self, user, room_ids):
+        self.user = user
+        self.room_ids = room_ids
+        self.text = ""
+        self.sent = None
+        self.seq = 0
+
+
+class LiveTyping:
+    """Buffer for the live-typing previews of the users.
+
+    Clients send the changes of their text on every input, as splice
+    operations or as the full text. The previews are sent to the rooms as
+    frames of at most one per user every `interval` seconds. A frame holds
+    the operation turning the text of the previous frame into the current
+    one, every `keyframe`-th frame and the first frame of a message hold the
+    full text instead, so clients which missed a frame catch up.
+    """
+
+    def __init__(self, interval=0.1, keyframe=20):
+        self.interval = interval
+        self.keyframe = keyframe
+        # user id -> preview
+        self._previews = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = False
+        self.stats = dict(updates=0, frames=0, keyframes=0)
+
+    def init_app(self, app):
+        self.interval = app.config.get("LIVE_TYPING_INTERVAL", self.interval)
+        self.keyframe = app.config.get("LIVE_TYPING_KEYFRAME", self.keyframe)
+        self.clear()
+        if self.interval > 0:
+            self.start()
+        else:
+            self.close()
+
+    def metrics(self):
+        return dict(self.stats, previews=len(self._previews), interval=self.interval)
+
+    def update(self, user, room_ids, text=None, ops=None):
+        """Set the text `user` is typing, or change it by `ops`
+
+        Raises `ValueError` if the text is no string or the operations do not
+        fit the text.
+        """
+        if text is not None and not isinstance(text, str):
+            raise ValueError(f"Invalid text {text!r}")
+        with self._lock:
+            preview = self._previews.get(user["id"])
+            if preview is None:
+                preview = self._previews[user["id"]] = Preview(user, room_ids)
+            preview.room_ids = list(room_ids)
+            if text is None:
+                text = apply_ops(preview.text, ops or ())
+            preview.text = text
+            self._dirty.add(user["id"])
+            self.stats["updates"] += 1
+
+        if self._running:
+            self._wakeup.set()
+        else:
+            self.flush()
+
+    def _frame(self, preview):
+        frame = dict(user=preview.user, seq=preview.seq)
+        if preview.sent is None or preview.seq % self.keyframe == 0:
+            frame["text"] = preview.text
+            self.stats["keyframes"] += 1
+        else:
+            frame["ops"] = [diff(preview.sent, preview.text)]
+        preview.sent = preview.text
+        preview.seq += 1
+        return frame
+
+    def flush(self):
+        """Send a frame for every changed preview, return the number of frames"""
+        from slurk.extensions.events import socketio
+
+        frames = []
+        with self._lock:
+            for user_id in self._dirty:
+                preview = self._previews.get(user_id)
+                if preview is None:
+                    continue
+                if preview.text == (preview.sent or ""):
+                    if not preview.text:
+                        del self._previews[user_id]
+                    continue
+                try:
+                    frames.append((preview.room_ids, self._frame(preview)))
+                except Exception:
+                    # a broken preview must not block the others
+                    LOG.exception(f"Dropping the live-typing preview of {user_id}")
+                    del self._previews[user_id]
+                    continue
+                if not preview.text:
+                    # the message was sent, the next one starts with a keyframe
+                    del self._previews[user_id]
+            self._dirty.clear()
+
+        for room_ids, frame in frames:
+            for room_id in room_ids:
+                socketio.emit(
+                    "typed_message", dict(frame, room=room_id), room=str(room_id)
+                )
+        self.stats["frames"] += len(frames)
+        return len(frames)
+
+    def leave(self, user_id, room_id):
+        """Stop sending the preview of a user who left a room
+
+        The preview is dropped with the last room of the user.
+        """
+        with self._lock:
+            preview = self._previews.get(user_id)
+            if preview is None:
+                return
+            preview.room_ids = [id for id in preview.room_ids if id != room_id]
+            if not preview.room_ids:
+                del self._previews[user_id]
+                self._dirty.discard(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._previews.clear()
+            self._dirty.clear()
+
+    def start(self):
+        from slurk.extensions.events import socketio
+
+        if self._running:
+            return
+        self._running = True
+        socketio.start_background_task(self._run)
+        atexit.register(self.close)
+
+    def close(self):
+        self._running = False
+        self._wakeup.set()
+
+    def _run(self):
+        from slurk.extensions.events import socketio
+
+        while self._running:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                LOG.exception("Sending live-typing frames failed")
+            # changes until then are sent with the next frame
+            socketio.sleep(self.interval)
+
+
+live_typing = LiveTyping()
+
+
+def init_app(app):
+    live_typing.init_app(app)
@@ -0,0 +1,190 @@
+import atexit
+import logging
+import queue
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+LOG = logging.getLogger(__name__)
+
+
+class LogWriter:
+    """Write-behind buffer for `Log` entries and `Telemetry` samples.
+
+    Events listed in `async_events` are not committed by the caller. They are
+    put into a bounded in-memory queue and bulk-inserted by a background task
+    once `flush_size` entries are pending or after `flush_interval` seconds,
+    whichever comes first. All other events keep being written synchronously.
+
+    When the queue is full the caller flushes it inline, which slows down the
+    producer instead of dropping entries.
+    """
+
+    def __init__(
+        self,
+        database=None,
+        enabled=False,
+        async_events=(),
+        buffer_size=10000,
+        flush_size=500,
+        flush_interval=1.0,
+    ):
+        self.database = database
+        self.enabled = enabled
+        self.async_events = frozenset(async_events)
+        self.buffer_size = buffer_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+
+        self._queue = queue.Queue(maxsize=buffer_size)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = False
+
+        self.stats = dict(
+            enqueued=0,
+            written=0,
+            flushes=0,
+            overflows=0,
+            errors=0,
+            lost=0,
+            max_depth=0,
+        )
+
+    def init_app(self, app, database):
+        config = app.config
+        self.database = database
+        self.enabled = config.get("LOG_WRITE_BEHIND", False)
+        self.async_events = frozenset(config.get("LOG_ASYNC_EVENTS", ()))
+        self.flush_size = config.get("LOG_FLUSH_SIZE", self.flush_size)
+        self.flush_interval = config.get("LOG_FLUSH_INTERVAL", self.flush_interval)
+        buffer_size = config.get("LOG_BUFFER_SIZE", self.buffer_size)
+        if buffer_size != self.buffer_size:
+            self.flush()
+            self.buffer_size = buffer_size
+            self._queue = queue.Queue(maxsize=buffer_size)
+
+        if self.enabled:
+            self.start()
+
+    def is_async(self, event):
+        return self.enabled and event in self.async_events
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def metrics(self):
+        return dict(self.stats, depth=self.depth, capacity=self.buffer_size)
+
+    def add(self, row, model=None):
+        """Enqueue a row of `model`, `Log` by default, for
+        `Session.bulk_insert_mappings`.
+
+        `date_created` of log entries is stamped here so that the entry keeps
+        the time of the event and not the time of the flush.
+        """
+        if model is None:
+            row.setdefault("date_created", datetime.utcnow())
+        try:
+            self._queue.put_nowait((model, row))
+        except queue.Full:
+            self.stats["overflows"] += 1
+            self.flush()
+            self._queue.put_nowait((model, row))
+
+        self.stats["enqueued"] += 1
+        depth = self._queue.qsize()
+        if depth > self.stats["max_depth"]:
+            self.stats["max_depth"] = depth
+        if depth >= self.flush_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write all pending rows, return the number of rows written."""
+        from slurk.models import Log
+
+        with self._lock:
+            rows = []
+            while True:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not rows:
+                return 0
+
+            batches = defaultdict(list)
+            for model, row in rows:
+                batches[model or Log].append(row)
+
+            session = self.database.create_session()
+            written = 0
+            try:
+                for model, batch in batches.items():
+                    for start in range(0, len(batch), self.flush_size):
+                        written += self._write(
+                            session, model, batch[start : start + self.flush_size]
+                        )
+            finally:
+                session.close()
+
+            lost = len(rows) - written
+            if lost:
+                self.stats["errors"] += 1
+                self.stats["lost"] += lost
+                LOG.error(f"Could not write {lost} of {len(rows)} buffered log entries")
+            self.stats["flushes"] += 1
+            self.stats["written"] += written
+            return written
+
+    def _write(self, session, model, rows):
+        """Insert `rows`, return the number written
+
+        If the batch fails, its halves are retried, so only the rows which
+        fail on their own, e.g. of a deleted room, are dropped.
+        """
+        try:
+            session.bulk_insert_mappings(model, rows)
+            session.commit()
+            return len(rows)
+        except Exception:
+            session.rollback()
+            if len(rows) == 1:
+                LOG.exception(f"Dropping the buffered entry {rows[0]!r}")
+                return 0
+        middle = len(rows) // 2
+        return self._write(session, model, rows[:middle]) + self._write(
+            session, model, rows[middle:]
+        )
+
+    def start(self):
+        from slurk.extensions.events import socketio
+
+        if self._running:
+            return
+        self._running = True
+        socketio.start_background_task(self._run)
+        atexit.register(self.close)
+
+    def close(self):
+        """Stop the background task and write everything still pending."""
+        self._running = False
+        self._wakeup.set()
+        self.flush()
+
+    def _run(self):
+        while self._running:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                LOG.exception("Flushing buffered log entries failed")
+
+
+log_writer = LogWriter()
+
+
+def init_app(app, database):
+    log_writer.init_app(app, database)
@@ -0,0 +1,145 @@
+"""Message queue between the socket.io servers of several workers.
+
+By default slurk keeps the socket.io clients and their rooms in the memory
+of its process, so it has to run as a single worker. When
+`SLURK_MESSAGE_QUEUE` is set, the workers share them through a pub/sub
+channel: emits, `join_room`/`leave_room` of clients connected to another
+worker and acknowledgement callbacks are relayed to all workers.
+
+- `redis://...` (also `rediss://`, `redis+sentinel://`) uses Redis.
+- `local://` uses a queue in the memory of the process, for tests.
+
+The same channel also carries the invalidations of the in-process caches,
+so a worker drops a cached room as soon as another worker changed it, see
+`subscribe` and `notify`.
+
+Every worker needs the same `SLURK_SECRET_KEY`. Polling clients need sticky
+sessions in the load balancer. With `SLURK_SOCKETIO_TRANSPORTS=websocket`
+the clients only use websockets and connect to any worker.
+"""
+
+import logging
+from collections import defaultdict
+
+import socketio
+
+LOG = logging.getLogger(__name__)
+
+# topic -> function called with the arguments of a notification
+_handlers = {}
+
+# the manager of the current app, if it uses a message queue
+_manager = None
+
+
+def subscribe(topic, handler):
+    """Call `handler` with the arguments of notifications for `topic` sent by
+    other workers"""
+    _handlers[topic] = handler
+
+
+def notify(topic, *args):
+    """Send a notification for `topic` to all other workers"""
+    if _manager is not None:
+        _manager.notify(topic, *args)
+
+
+class NotifyMixin:
+    """Notifications between workers next to the socket.io messages"""
+
+    def notify(self, topic, *args):
+        self._publish(
+            {"method": "notify", "topic": topic, "args": args, "host_id": self.host_id}
+        )
+
+    def _handle_notify(self, message):
+        handler = _handlers.get(message.get("topic"))
+        if handler is None:
+            return
+        try:
+            handler(*message.get("args", ()))
+        except Exception:
+            LOG.exception(f"Handling notification {message.get('topic')!r} failed")
+
+    def _listen(self):
+        # `PubSubManager._thread` only dispatches the socket.io methods
+        for message in super()._listen():
+            if not isinstance(message, dict):
+                try:
+                    message = self.json.loads(message)
+                except ValueError:
+                    continue
+            if message.get("method") == "notify":
+                if message.get("host_id") != self.host_id:
+                    self._handle_notify(message)
+                continue
+            yield message
+
+
+class RedisManager(NotifyMixin, socketio.RedisManager):
+    pass
+
+
+# channel -> queues of the listening local managers
+_local_queues = defaultdict(list)
+
+
+class LocalPubSubManager(socketio.PubSubManager):
+    """Pub/sub between the socket.io servers of one process"""
+
+    name = "local"
+
+    def __init__(self, url="local://", channel="slurk", write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self._queue = None
+
+    def initialize(self):
+        if not self.write_only:
+            # subscribe before the listener starts to not miss any message
+            self._queue = self.server.eio.create_queue()
+            _local_queues[self.channel].append(self._queue)
+        super().initialize()
+
+    def close(self):
+        if self._queue in _local_queues[self.channel]:
+            _local_queues[self.channel].remove(self._queue)
+
+    def _publish(self, data):
+        message = self.json.dumps(data)
+        for queue in _local_queues[self.channel]:
+            queue.put(message)
+
+    def _listen(self):
+        while True:
+            yield self._queue.get()
+
+
+class LocalManager(NotifyMixin, LocalPubSubManager):
+    pass
+
+
+def client_manager(url, channel="slurk"):
+    """The socket.io client manager for the message queue `url`"""
+    if not url:
+        return socketio.Manager()
+    if url.startswith("local://"):
+        return LocalManager(url, channel=channel)
+    if url.startswith(("redis://", "rediss://", "redis+sentinel://")):
+        return RedisManager(url, channel=channel)
+    raise ValueError(f"Unsupported message queue `{url}`, use `redis://` or `local://`")
+
+
+def init_app(app, server):
+    global _manager
+
+    if isinstance(_manager, LocalPubSubManager):
+        _manager.close()
+    _manager = None
+
+    if isinstance(server.manager, NotifyMixin):
+        # listen right away, socket.io would only start with the first client
+        # and miss the invalidations before
+        if not server.manager_initialized:
+            server.manager_initialized = True
+            server.manager.initialize()
+        _manager = server.manager
@@ -0,0 +1,62 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class RateLimiter:
+    """Token bucket per sender.
+
+    A sender may send `burst` events at once and `rate` events per second on
+    average, a `rate` of 0 disables the limit. The buckets live in the memory
+    of the worker which holds the socket of the sender. The `size` bound
+    drops the least recently used buckets, a dropped bucket starts full.
+    """
+
+    def __init__(self, rate=10.0, burst=20, size=4096, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.size = size
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = dict(allowed=0, limited=0)
+
+    def init_app(self, app, name):
+        self.rate = app.config.get(f"{name}_RATE", self.rate)
+        self.burst = app.config.get(f"{name}_BURST", self.burst)
+        self.clear()
+
+    def metrics(self):
+        return dict(
+            self.stats, senders=len(self._buckets), rate=self.rate, burst=self.burst
+        )
+
+    def allow(self, key):
+        """Take a token from the bucket of `key`, False if it is empty"""
+        if self.rate <= 0:
+            self.stats["allowed"] += 1
+            return True
+
+        now = self.clock()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.size:
+                self._buckets.popitem(last=False)
+        self.stats["allowed" if allowed else "limited"] += 1
+        return allowed
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+broadcast_limiter = RateLimiter()
+
+
+def init_app(app):
+    broadcast_limiter.init_app(app, "CLIENT_BROADCAST")
@@ -0,0 +1,201 @@
+import time
+from collections import namedtuple
+
+from slurk.extensions import message_queue
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.orm.attributes import get_history
+
+PERMISSION_FLAGS = (
+    "api",
+    "send_message",
+    "send_html_message",
+    "send_image",
+    "send_command",
+    "send_privately",
+    "receive_bounding_box",
+    "broadcast",
+    "openvidu_role",
+)
+
+Flags = namedtuple("Flags", PERMISSION_FLAGS)
+Member = namedtuple("Member", "id name session_id permissions")
+CachedRoom = namedtuple("CachedRoom", "id read_only members")
+CachedUser = namedtuple("CachedUser", "id name session_id permissions room_ids")
+
+
+def _flags(permissions):
+    return Flags(*(getattr(permissions, flag) for flag in PERMISSION_FLAGS))
+
+
+class RoomCache:
+    """In-process cache of room memberships and permissions.
+
+    Maps a room id to its read-only state and its members (id, name, socket.io
+    session id and permission flags), and a user id to its own flags and the
+    ids of its rooms. Socket.io event handlers use it for routing and
+    authorization instead of loading `Room`, `User`, `Token` and `Permissions`
+    on every event.
+
+    Entries are dropped whenever a flush touches the corresponding rows, see
+    `_collect`, and expire after `ttl` seconds in any case. Other workers
+    sharing a message queue drop them when the changes are committed.
+    """
+
+    def __init__(self, ttl=30.0):
+        self.ttl = ttl
+        self._rooms = {}
+        self._users = {}
+        self.stats = dict(hits=0, misses=0, invalidations=0)
+
+    def init_app(self, app):
+        self.ttl = app.config.get("ROOM_CACHE_TTL", self.ttl)
+        self.clear()
+
+    def metrics(self):
+        return dict(self.stats, rooms=len(self._rooms), users=len(self._users))
+
+    def _lookup(self, entries, key, load):
+        entry = entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.stats["hits"] += 1
+            return entry[1]
+
+        self.stats["misses"] += 1
+        value = load(key)
+        if value is not None:
+            entries[key] = (time.monotonic() + self.ttl, value)
+        return value
+
+    def room(self, room_id):
+        """Return the `CachedRoom` for `room_id` or None if it does not exist"""
+        try:
+            room_id = int(room_id)
+        except (TypeError, ValueError):
+            return None
+        return self._lookup(self._rooms, room_id, self._load_room)
+
+    def user(self, user_id):
+        """Return the `CachedUser` for `user_id` or None if it does not exist"""
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+        return self._lookup(self._users, user_id, self._load_user)
+
+    def invalidate_room(self, room_id):
+        self.stats["invalidations"] += 1
+        self._rooms.pop(room_id, None)
+
+    def invalidate_user(self, user_id):
+        self.stats["invalidations"] += 1
+        self._users.pop(user_id, None)
+        for room_id, (_, room) in list(self._rooms.items()):
+            if user_id in room.members:
+                self._rooms.pop(room_id, None)
+
+    def clear(self):
+        self.stats["invalidations"] += 1
+        self._rooms.clear()
+        self._users.clear()
+
+    @staticmethod
+    def _load_room(room_id):
+        from flask.globals import current_app
+        from slurk.models import Room, Token, User
+
+        room = (
+            current_app.session.query(Room)
+            .options(
+                joinedload(Room.layout),
+                selectinload(Room.users)
+                .joinedload(User.token)
+                .joinedload(Token.permissions),
+            )
+            .get(room_id)
+        )
+        if room is None:
+            return None
+        return CachedRoom(
+            id=room.id,
+            read_only=bool(room.read_only or room.layout.read_only),
+            members={
+                user.id: Member(
+                    user.id, user.name, user.session_id, _flags(user.token.permissions)
+                )
+                for user in room.users
+            },
+        )
+
+    @staticmethod
+    def _load_user(user_id):
+        from flask.globals import current_app
+        from slurk.models import Token, User
+        from slurk.models.common import user_room
+
+        db = current_app.session
+        user = (
+            db.query(User)
+            .options(joinedload(User.token).joinedload(Token.permissions))
+            .get(user_id)
+        )
+        if user is None:
+            return None
+        room_ids = tuple(
+            room_id
+            for (room_id,) in db.query(user_room.c.room_id).filter(
+                user_room.c.user_id == user_id
+            )
+        )
+        return CachedUser(
+            user.id,
+            user.name,
+            user.session_id,
+            _flags(user.token.permissions),
+            room_ids,
+        )
+
+    def _collect(self, session, flush_context):
+        """Drop the entries affected by the flushed changes of `session`"""
+        from slurk.models import Layout, Permissions, Room, Token, User
+
+        pending = session.info.setdefault("room_cache", set())
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, Room):
+                pending.add(("room", obj.id))
+            elif isinstance(obj, User):
+                pending.add(("user", obj.id))
+                history = get_history(obj, "rooms")
+                for room in [*(history.added or ()), *(history.deleted or ())]:
+                    pending.add(("room", room.id))
+            elif isinstance(obj, (Layout, Permissions, Token)):
+                pending.add(("all", None))
+        self._apply(pending)
+
+    def _commit(self, session):
+        # apply again: another session may have re-cached the old state
+        # between the flush and the commit
+        pending = session.info.pop("room_cache", set())
+        self._apply(pending)
+        if pending:
+            message_queue.notify("room_cache", list(pending))
+
+    def _apply(self, pending):
+        for kind, id in pending:
+            if kind == "all":
+                self.clear()
+            elif kind == "room":
+                self.invalidate_room(id)
+            else:
+                self.invalidate_user(id)
+
+
+room_cache = RoomCache()
+
+event.listen(Session, "after_flush", room_cache._collect)
+event.listen(Session, "after_commit", room_cache._commit)
+message_queue.subscribe("room_cache", room_cache._apply)
+
+
+def init_app(app):
+    room_cache.init_app(app)
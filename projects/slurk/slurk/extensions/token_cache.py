@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+
+from slurk.extensions import message_queue
+
+
+class TokenCache:
+    """LRU cache for the REST API token check.
+
+    Maps a token id to whether it exists and whether its permissions allow
+    API access, so `verify_token` does not load `Token` and `Permissions` on
+    every request. Unknown tokens are cached as well, the size bound keeps
+    guessing from filling the memory.
+
+    Entries expire after `ttl` seconds. The token and permissions views
+    invalidate them explicitly when they change, in all workers if they share
+    a message queue.
+    """
+
+    def __init__(self, ttl=60.0, size=4096):
+        self.ttl = ttl
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = dict(hits=0, misses=0, invalidations=0, evictions=0)
+
+    def init_app(self, app):
+        self.ttl = app.config.get("TOKEN_CACHE_TTL", self.ttl)
+        self.size = app.config.get("TOKEN_CACHE_SIZE", self.size)
+        self.clear()
+
+    def metrics(self):
+        return dict(self.stats, size=len(self._entries), capacity=self.size)
+
+    def get(self, token_id, load):
+        """Return whether `token_id` may use the API.
+
+        `load` is called with the token id on a miss and returns the `Token`
+        or None.
+        """
+        with self._lock:
+            entry = self._entries.get(token_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(token_id)
+                self.stats["hits"] += 1
+                return entry[1]
+            self.stats["misses"] += 1
+
+        token = load(token_id)
+        api = bool(token and token.permissions.api)
+        permissions_id = token.permissions_id if token else None
+
+        with self._lock:
+            self._entries[token_id] = (time.monotonic() + self.ttl, api, permissions_id)
+            self._entries.move_to_end(token_id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+        return api
+
+    def invalidate(self, token_id):
+        self._invalidate(str(token_id))
+        message_queue.notify("token_cache.invalidate", str(token_id))
+
+    def _invalidate(self, token_id):
+        with self._lock:
+            self.stats["invalidations"] += 1
+            self._entries.pop(token_id, None)
+
+    def invalidate_permissions(self, permissions_id):
+        """Drop all tokens which use the permissions `permissions_id`"""
+        self._invalidate_permissions(permissions_id)
+        message_queue.notify("token_cache.invalidate_permissions", permissions_id)
+
+    def _invalidate_permissions(self, permissions_id):
+        with self._lock:
+            self.stats["invalidations"] += 1
+            for token_id, entry in list(self._entries.items()):
+                if entry[2] == permissions_id:
+                    del self._entries[token_id]
+
+    def clear(self):
+        with self._lock:
+            self.stats["invalidations"] += 1
+            self._entries.clear()
+
+
+token_cache = TokenCache()
+
+message_queue.subscribe("token_cache.invalidate", token_cache._invalidate)
+message_queue.subscribe(
+    "token_cache.invalidate_permissions", token_cache._invalidate_permissions
+)
+
+
+def init_app(app):
+    token_cache.init_app(app)
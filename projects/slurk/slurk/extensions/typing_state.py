@@ -0,0 +1,145 @@
+import atexit
+import logging
+import threading
+
+from slurk.extensions import message_queue
+
+LOG = logging.getLogger(__name__)
+
+
+class TypingState:
+    """Who is typing in which room.
+
+    `keypress` events only change the state of a (user, room) pair, repeated
+    transitions to the state a pair already has are dropped. A room with
+    changes is sent one `typing_users` event listing everyone typing in it.
+    The first change is sent right away, further changes are collected for
+    `interval` seconds and sent together, so a room gets at most one update
+    per interval however many of its users type. An interval of 0 sends
+    every change immediately.
+
+    Workers sharing a message queue share the state as well. Only the worker
+    which received a change sends the update, but with all users of the
+    room, wherever they are connected.
+    """
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        # room id -> user id -> user name
+        self._rooms = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = False
+        self.stats = dict(transitions=0, duplicates=0, updates=0)
+
+    def init_app(self, app):
+        self.interval = app.config.get("TYPING_INTERVAL", self.interval)
+        self.clear()
+        if self.interval > 0:
+            self.start()
+        else:
+            self.close()
+
+    def metrics(self):
+        with self._lock:
+            typing = sum(len(users) for users in self._rooms.values())
+        return dict(self.stats, typing=typing, interval=self.interval)
+
+    def update(self, user_id, name, room_ids, typing):
+        """Set whether the user is typing in `room_ids`
+
+        Returns the ids of the rooms in which the state changed.
+        """
+        changed = self._update(user_id, name, room_ids, typing)
+        if changed:
+            with self._lock:
+                self._dirty.update(changed)
+            message_queue.notify("typing_state", user_id, name, changed, typing)
+            if self._running:
+                self._wakeup.set()
+            else:
+                self.flush()
+        return changed
+
+    def _update(self, user_id, name, room_ids, typing):
+        changed = []
+        with self._lock:
+            for room_id in room_ids:
+                users = self._rooms.get(room_id, {})
+                if (user_id in users) == typing:
+                    self.stats["duplicates"] += 1
+                    continue
+                if typing:
+                    self._rooms.setdefault(room_id, users)[user_id] = name
+                else:
+                    del users[user_id]
+                    if not users:
+                        self._rooms.pop(room_id, None)
+                changed.append(room_id)
+            self.stats["transitions"] += len(changed)
+        return changed
+
+    def _apply(self, user_id, name, room_ids, typing):
+        # changes of other workers, which send the update themselves
+        self._update(user_id, name, room_ids, typing)
+
+    def flush(self):
+        """Send the pending updates, return the number of rooms updated"""
+        from slurk.extensions.events import socketio
+
+        with self._lock:
+            updates = {
+                room_id: [
+                    dict(id=id, name=name)
+                    for id, name in self._rooms.get(room_id, {}).items()
+                ]
+                for room_id in self._dirty
+            }
+            self._dirty.clear()
+        for room_id, users in updates.items():
+            socketio.emit(
+                "typing_users", dict(room=room_id, users=users), room=str(room_id)
+            )
+        self.stats["updates"] += len(updates)
+        return len(updates)
+
+    def clear(self):
+        with self._lock:
+            self._rooms.clear()
+            self._dirty.clear()
+
+    def start(self):
+        from slurk.extensions.events import socketio
+
+        if self._running:
+            return
+        self._running = True
+        socketio.start_background_task(self._run)
+        atexit.register(self.close)
+
+    def close(self):
+        self._running = False
+        self._wakeup.set()
+
+    def _run(self):
+        from slurk.extensions.events import socketio
+
+        while self._running:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                LOG.exception("Sending typing updates failed")
+            # changes until then are sent with the next update
+            socketio.sleep(self.interval)
+
+
+typing_state = TypingState()
+
+message_queue.subscribe("typing_state", typing_state._apply)
+
+
+def init_app(app):
+    typing_state.init_app(app)
@@ -3,5 +3,6 @@ from .log import Log  # NOQA
 from .permissions import Permissions  # NOQA
 from .room import Room  # NOQA
 from .task import Task  # NOQA
+from .telemetry import Telemetry  # NOQA
 from .token import Token  # NOQA
 from .user import User  # NOQA
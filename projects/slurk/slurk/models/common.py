@@ -1,5 +1,5 @@
 from slurk.extensions.database import Base
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, Table, func
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, Table, func
 
 
 class Common(Base):
@@ -19,4 +19,6 @@ user_room = Table(
     Column(
         "room_id", Integer, ForeignKey("Room.id", ondelete="CASCADE"), primary_key=True
     ),
+    # the primary key only covers lookups by user
+    Index("ix_User_Room_room_id", "room_id"),
 )
@@ -1,4 +1,6 @@
-from sqlalchemy import JSON, Column, ForeignKey, Integer, String
+from datetime import datetime
+
+from sqlalchemy import JSON, Column, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import relationship
 
 from .common import Common
@@ -6,6 +8,16 @@ from .common import Common
 
 class Log(Common):
     __tablename__ = "Log"
+    __table_args__ = (
+        # room history: filtered by room, ordered by creation
+        Index("ix_Log_room_id_date_created", "room_id", "date_created", "id"),
+        # listings filtered by event and the plain listing
+        Index("ix_Log_event_date_created", "event", "date_created", "id"),
+        Index("ix_Log_date_created", "date_created", "id"),
+        # private messages and cascading deletes of users
+        Index("ix_Log_user_id", "user_id"),
+        Index("ix_Log_receiver_id", "receiver_id"),
+    )
 
     event = Column(String, nullable=False)
     user_id = Column(Integer, ForeignKey("User.id", ondelete="CASCADE"))
@@ -17,6 +29,7 @@ class Log(Common):
 
     def add(event, user=None, room=None, receiver=None, data=None):
         from flask.globals import current_app
+        from slurk.extensions.log_writer import log_writer
 
         if not data:
             data = {}
@@ -30,9 +43,39 @@ class Log(Common):
         if event == "disconnect":
             current_app.logger.info(f"{user.name} disconnected")
 
-        log = Log(event=event, user=user, room=room, data=data, receiver=receiver)
+        # only ids are used, so cached rooms and users can be passed as well
+        row = dict(
+            event=event,
+            user_id=user.id if user else None,
+            room_id=room.id if room else None,
+            receiver_id=receiver.id if receiver else None,
+            data=data,
+        )
+        if log_writer.is_async(event):
+            log_writer.add(row)
+            # transient, not attached to the session; written by the log writer
+            return Log(**row)
+
+        log = Log(**row)
 
         db = current_app.session
         db.add(log)
         db.commit()
         return log
+
+    def add_many(rows):
+        """Write the log entries `rows`, dicts of the columns, in one go"""
+        from flask.globals import current_app
+        from slurk.extensions.log_writer import log_writer
+
+        if all(log_writer.is_async(row["event"]) for row in rows):
+            for row in rows:
+                log_writer.add(row)
+            return
+
+        now = datetime.utcnow()
+        for row in rows:
+            row.setdefault("date_created", now)
+        db = current_app.session
+        db.bulk_insert_mappings(Log, rows)
+        db.commit()
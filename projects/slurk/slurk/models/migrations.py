@@ -0,0 +1,154 @@
+"""Schema migrations applied by `Database.init`
+
+`create_all` only creates missing tables, it does not alter existing ones.
+Changes to tables which already exist in deployed databases are therefore
+appended to `MIGRATIONS`. The number of applied migrations is stored in the
+`Schema_Version` table. A new database is created with the current schema
+and starts at the latest version.
+"""
+
+import logging
+import time
+
+from slurk.extensions.database import Base
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    String,
+    Table,
+    func,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.exc import DBAPIError
+
+LOG = logging.getLogger(__name__)
+
+# key of the PostgreSQL advisory lock held while migrating
+MIGRATION_LOCK = 7315023
+
+schema_version = Table(
+    "Schema_Version",
+    Base.metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("date_applied", DateTime, default=func.current_timestamp(), nullable=False),
+)
+
+
+def create_indexes(*names):
+    """Migration creating the indexes `names` as declared on the models"""
+
+    def upgrade(connection):
+        indexes = {
+            index.name: index
+            for table in Base.metadata.tables.values()
+            for index in table.indexes
+        }
+        for name in names:
+            indexes[name].create(bind=connection, checkfirst=True)
+
+    return upgrade
+
+
+def add_columns(table, *names):
+    """Migration adding the columns `names` of `table` as declared on the model"""
+
+    def upgrade(connection):
+        existing = {column["name"] for column in inspect(connection).get_columns(table)}
+        preparer = connection.dialect.identifier_preparer
+        for name in names:
+            if name in existing:
+                continue
+            column = Base.metadata.tables[table].c[name]
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(
+                text(
+                    f"ALTER TABLE {preparer.quote(table)} "
+                    f"ADD COLUMN {preparer.quote(name)} {column_type}"
+                )
+            )
+
+    return upgrade
+
+
+# Indexes for the room history, the log listings, room members and the admin
+# token lookup
+INDEXES = (
+    "ix_Log_room_id_date_created",
+    "ix_Log_event_date_created",
+    "ix_Log_date_created",
+    "ix_Log_user_id",
+    "ix_Log_receiver_id",
+    "ix_User_Room_room_id",
+    "ix_User_token_id",
+    "ix_Token_registrations_left_permissions_id",
+    "ix_Token_room_id",
+)
+
+MIGRATIONS = (
+    ("Index logs, room members and tokens", create_indexes(*INDEXES)),
+    ("Add the close time of rooms", add_columns("Room", "close_at")),
+)
+
+
+def _lock(connection):
+    # concurrent migrations wait for the first one, until the transaction ends
+    if connection.dialect.name == "postgresql":
+        connection.execute(select(func.pg_advisory_xact_lock(MIGRATION_LOCK)))
+
+
+def _migrate(engine):
+    applied = 0
+    with engine.begin() as connection:
+        _lock(connection)
+        fresh = not inspect(connection).has_table("Token")
+        Base.metadata.create_all(bind=connection)
+
+        version = connection.execute(
+            select(func.max(schema_version.c.version))
+        ).scalar()
+        if version is None and fresh:
+            # created from the models, which include all migrations
+            connection.execute(
+                schema_version.insert().values(
+                    version=len(MIGRATIONS), description="Initial schema"
+                )
+            )
+            return applied
+
+        # databases created before migrations were introduced are at version 0
+        for number, (description, upgrade) in enumerate(MIGRATIONS, start=1):
+            if number <= (version or 0):
+                continue
+            LOG.info(f"Applying migration {number}: {description}")
+            upgrade(connection)
+            connection.execute(
+                schema_version.insert().values(version=number, description=description)
+            )
+            applied += 1
+    return applied
+
+
+def migrate(engine, attempts=5):
+    """Create missing tables and apply pending migrations
+
+    Returns the number of migrations applied. Every worker of a server runs
+    this when it starts. On PostgreSQL the workers wait for each other. On
+    other databases a worker which raced with another one fails on the
+    tables, columns or versions created meanwhile, and simply tries again
+    against the updated schema.
+    """
+    # register all tables
+    import slurk.models  # NOQA
+
+    for attempt in range(1, attempts + 1):
+        try:
+            return _migrate(engine)
+        except DBAPIError:
+            if attempt == attempts:
+                raise
+            LOG.warning("Migrating the database raced with another worker, retrying")
+            time.sleep(0.2 * attempt)
@@ -7,7 +7,7 @@ from .common import Common
 class Permissions(Common):
     __tablename__ = "Permissions"
 
-    tokens = relationship("Token", backref="permissions")
+    tokens = relationship("Token", back_populates="permissions")
     api = Column(Boolean, nullable=False)
     send_message = Column(Boolean, nullable=False)
     send_html_message = Column(Boolean, nullable=False)
@@ -1,7 +1,9 @@
+from datetime import datetime, timedelta
+
 from slurk.extensions.database import Base
 from sqlalchemy import Column, ForeignKey, asc
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql.sqltypes import JSON, Boolean, Integer, String
+from sqlalchemy.sql.sqltypes import JSON, Boolean, DateTime, Integer, String
 
 from .common import Common, user_room
 
@@ -16,6 +18,29 @@ class Room(Common):
         "Log", backref="room", order_by=asc("date_modified"), passive_deletes=True
     )
     openvidu_session_id = Column(String, ForeignKey("Session.id"))
+    close_at = Column(DateTime)
+
+    @property
+    def closes_in(self):
+        """Seconds until the room closes, None if it has no close time"""
+        if self.close_at is None:
+            return None
+        return max(0.0, (self.close_at - datetime.utcnow()).total_seconds())
+
+    @closes_in.setter
+    def closes_in(self, seconds):
+        if seconds is None:
+            self.close_at = None
+        else:
+            self.close_at = datetime.utcnow() + timedelta(seconds=seconds)
+
+    def close_time(self):
+        """Payload of the `close_time` event"""
+        return dict(
+            room=self.id,
+            close_at=self.close_at.isoformat() if self.close_at else None,
+            time_left=self.closes_in,
+        )
 
 
 class Session(Base):
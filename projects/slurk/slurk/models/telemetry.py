@@ -0,0 +1,115 @@
+from datetime import datetime
+
+from slurk.extensions.database import Base
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    SmallInteger,
+    String,
+)
+
+# bits of `Telemetry.modifiers`
+MODIFIERS = (("alt", 1), ("ctrl", 2), ("shift", 4))
+
+
+def _number(value, type=float):
+    # values sent by clients, which are stored as NULL if they are no numbers
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return type(value)
+    return None
+
+
+def _string(value):
+    return value if isinstance(value, str) else None
+
+
+class Telemetry(Base):
+    """Keystroke and mouse samples with one typed column per field.
+
+    These are the most frequent events by far. Unlike `Log` entries they are
+    never modified, so they have neither a JSON blob nor a modification date.
+    """
+
+    __tablename__ = "Telemetry"
+    __table_args__ = (
+        # samples of a room within a time range, in order
+        Index("ix_Telemetry_room_id_time", "room_id", "time", "id"),
+        Index("ix_Telemetry_user_id", "user_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    event = Column(String, nullable=False)
+    room_id = Column(Integer, ForeignKey("Room.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("User.id", ondelete="CASCADE"))
+    # time of the server in UTC and of the client in milliseconds
+    time = Column(DateTime, nullable=False)
+    client_time = Column(BigInteger)
+    # mouse: `move` or `click` at `x`, `y` relative to the element
+    type = Column(String)
+    x = Column(Float)
+    y = Column(Float)
+    element_id = Column(String)
+    # keystroke
+    key = Column(String)
+    modifiers = Column(SmallInteger)
+
+    EVENTS = ("keystroke", "mouse")
+    COLUMNS = (
+        "id",
+        "event",
+        "room_id",
+        "user_id",
+        "time",
+        "client_time",
+        "type",
+        "x",
+        "y",
+        "element_id",
+        "key",
+        "modifiers",
+    )
+
+    def row(event, user_id, room_id, data, client_time=None, time=None):
+        """The columns of a sample from the `data` of a `keystroke` or `mouse`"""
+        row = dict(
+            event=event,
+            user_id=user_id,
+            room_id=room_id,
+            time=time or datetime.utcnow(),
+            client_time=_number(client_time, int),
+        )
+        if event == "mouse":
+            coordinates = data.get("coordinates")
+            if not isinstance(coordinates, dict):
+                coordinates = {}
+            row.update(
+                type=_string(data.get("type")),
+                x=_number(coordinates.get("x")),
+                y=_number(coordinates.get("y")),
+                element_id=_string(data.get("element_id")),
+            )
+        else:
+            row.update(
+                key=_string(data.get("key")),
+                modifiers=sum(bit for name, bit in MODIFIERS if data.get(name)),
+            )
+        return row
+
+    def add_many(rows):
+        """Write the samples `rows`, dicts of the columns, in one go"""
+        from flask.globals import current_app
+        from slurk.extensions.log_writer import log_writer
+
+        if all(log_writer.is_async(row["event"]) for row in rows):
+            for row in rows:
+                log_writer.add(row, Telemetry)
+            return
+
+        db = current_app.session
+        db.bulk_insert_mappings(Telemetry, rows)
+        db.commit()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, ForeignKey
+from sqlalchemy import Column, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.sqltypes import Integer, PickleType, String
 
@@ -14,17 +14,26 @@ def uuid():
 
 class Token(Common):
     __tablename__ = "Token"
+    __table_args__ = (
+        # `get_admin_token`
+        Index(
+            "ix_Token_registrations_left_permissions_id",
+            "registrations_left",
+            "permissions_id",
+        ),
+    )
 
     id = Column(String(length=36), primary_key=True, default=uuid)
     permissions_id = Column(Integer, ForeignKey("Permissions.id"), nullable=False)
     registrations_left = Column(Integer, nullable=False)
     task_id = Column(Integer, ForeignKey("Task.id"))
-    room_id = Column(Integer, ForeignKey("Room.id"))
+    room_id = Column(Integer, ForeignKey("Room.id"), index=True)
     openvidu_settings = Column(PickleType, nullable=False)
 
+    permissions = relationship("Permissions", back_populates="tokens")
     task = relationship("Task")
     room = relationship("Room")
-    users = relationship("User", backref="token")
+    users = relationship("User", back_populates="token")
 
     def add_user(self, db_session):
         if self.registrations_left == 0:
@@ -11,8 +11,9 @@ class User(Common):
     __tablename__ = "User"
 
     name = Column(String, nullable=False)
-    token_id = Column(String, ForeignKey("Token.id"), nullable=False)
+    token_id = Column(String, ForeignKey("Token.id"), nullable=False, index=True)
     session_id = Column(String, unique=True)
+    token = relationship("Token", back_populates="users")
     rooms = relationship(
         "Room", secondary=user_room, back_populates="users", lazy="dynamic"
     )
@@ -77,6 +78,8 @@ class User(Common):
                 room=self.session_id,
                 callback=joined,
             )
+            if room.close_at is not None:
+                socketio.emit("close_time", room.close_time(), room=self.session_id)
 
             print(
                 "emitted join",
@@ -164,6 +167,8 @@ class User(Common):
         from flask.globals import current_app
         from flask_socketio import leave_room
         from slurk.extensions.events import socketio
+        from slurk.extensions.live_typing import live_typing
+        from slurk.extensions.typing_state import typing_state
 
         if self in room.users and not event_only:
             room.users.remove(self)
@@ -183,6 +188,9 @@ class User(Common):
 
             leave_room(str(room.id), self.session_id, "/")
 
+        typing_state.update(self.id, self.name, [room.id], False)
+        live_typing.leave(self.id, room.id)
+
         socketio.emit(
             "status",
             dict(
@@ -3,12 +3,24 @@ from flask.globals import current_app
 from marshmallow.exceptions import ValidationError
 from marshmallow.utils import missing
 from slurk.extensions.api import abort
+from sqlalchemy import literal, select, union_all
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.util import identity_key
 from werkzeug.exceptions import UnprocessableEntity
 
 
 def register_blueprints(api):
-    from . import layouts, logs, openvidu, permissions, rooms, tasks, tokens, users
+    from . import (
+        layouts,
+        logs,
+        openvidu,
+        permissions,
+        rooms,
+        stats,
+        tasks,
+        tokens,
+        users,
+    )
 
     MODULES = (
         layouts,
@@ -19,6 +31,7 @@ def register_blueprints(api):
         users,
         tasks,
         logs,
+        stats,
     )
 
     for module in MODULES:
@@ -28,18 +41,55 @@ def register_blueprints(api):
 
 
 class Id(ma.fields.Integer):
+    """ID of an entry of `table`, which has to exist
+
+    Fields of a `BaseSchema` are checked by the schema, together with its
+    other IDs. Fields of other schemas check their entry on their own.
+    """
+
     def __init__(self, table, **kwargs):
         self._table = table
         super().__init__(strict=False, **kwargs)
 
     def _validated(self, value):
-        from flask.globals import current_app
-
         id = super()._validated(value)
-        if current_app.session.query(self._table).get(id) is None:
-            raise ValidationError(f"{self._table.__tablename__} `{id}` does not exist")
+        if not isinstance(self.parent, BaseSchema):
+            if missing_ids({self.name: (self._table, id)}):
+                raise ValidationError(self.does_not_exist(id))
         return id
 
+    def does_not_exist(self, id):
+        return f"{self._table.__tablename__} `{id}` does not exist"
+
+
+def missing_ids(references):
+    """The names of `references`, `{name: (table, id)}`, without an entry
+
+    Entries loaded into the session already are not looked up again, all
+    others are looked up with a single statement.
+    """
+    session = current_app.session
+    pending = {}
+    for table, id in references.values():
+        if session.identity_map.get(identity_key(table, id)) is None:
+            pending.setdefault(table, set()).add(id)
+    if not pending:
+        return []
+
+    selects = [
+        select(literal(table.__tablename__).label("tablename"), table.id).where(
+            table.id.in_(ids)
+        )
+        for table, ids in pending.items()
+    ]
+    statement = selects[0] if len(selects) == 1 else union_all(*selects)
+    found = {tuple(row) for row in session.execute(statement)}
+    return [
+        name
+        for name, (table, id) in references.items()
+        if table in pending and (table.__tablename__, id) not in found
+    ]
+
 
 class BaseSchema(ma.Schema):
     known_schemas = {}
@@ -48,6 +98,27 @@ class BaseSchema(ma.Schema):
         unknown = ma.RAISE
         ordered = True
 
+    @ma.validates_schema
+    def validate_ids(self, data, **kwargs):
+        """Check the entries of all `Id` fields with one statement"""
+        fields = {
+            name: field
+            for name, field in self.load_fields.items()
+            if isinstance(field, Id) and data.get(field.attribute or name) is not None
+        }
+        references = {
+            name: (field._table, data[field.attribute or name])
+            for name, field in fields.items()
+        }
+        missing = missing_ids(references) if references else []
+        if missing:
+            raise ValidationError(
+                {
+                    name: [fields[name].does_not_exist(references[name][1])]
+                    for name in missing
+                }
+            )
+
     def _create_schema(self, name, fields, inner=None):
         name = f'{self.__class__.__name__.split("Schema")[0]}{name}Schema'
         if name in BaseSchema.known_schemas:
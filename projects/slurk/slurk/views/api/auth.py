@@ -3,6 +3,7 @@ from functools import wraps
 from flask.globals import current_app
 from flask_httpauth import HTTPTokenAuth as _FlaskHTTPTokenAuth
 from slurk.extensions.api import abort
+from slurk.extensions.token_cache import token_cache
 from slurk.models import Token
 from sqlalchemy.exc import StatementError
 from werkzeug.exceptions import Unauthorized
@@ -31,9 +32,11 @@ def unauthorized():
 
 @auth.verify_token
 def verify_token(token):
-    db = current_app.session
-    try:
-        token = db.query(Token).get(token)
-    except StatementError:
-        abort(Unauthorized)
-    return token and token.permissions.api
+    def load(token_id):
+        db = current_app.session
+        try:
+            return db.query(Token).get(token_id)
+        except StatementError:
+            abort(Unauthorized)
+
+    return token_cache.get(token, load)
@@ -1,11 +1,22 @@
+from datetime import timezone
+
 import marshmallow as ma
+from flask import Response, json, request, stream_with_context
+from flask.globals import current_app
 from flask.views import MethodView
+from marshmallow.validate import OneOf, Range
 from slurk.extensions.api import Blueprint
+from slurk.extensions.log_writer import log_writer
 from slurk.models import Log, Room, User
-from slurk.views.api import CommonSchema, Id
+from slurk.views.api import BaseSchema, CommonSchema, Id
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import aliased
 
 blp = Blueprint(Log.__tablename__, __name__)
 
+MAX_LOG_PAGE = 10000
+STREAM_BATCH_SIZE = 1000
+
 
 class LogSchema(CommonSchema):
     class Meta:
@@ -37,15 +48,151 @@ class LogSchema(CommonSchema):
     data = ma.fields.Dict(missing={}, description="Data stored inside this log entry")
 
 
+class LogPageSchema(BaseSchema):
+    """Query arguments for paginating and streaming log listings
+
+    Entries are ordered by creation time and ID. To page through a listing,
+    pass the ID of the last entry of a page as `after` (oldest first) or
+    `before` (newest first) of the next request.
+    """
+
+    after = Id(
+        Log,
+        description="Only return entries created after the entry with this ID",
+    )
+    before = Id(
+        Log,
+        description="Only return entries created before the entry with this ID",
+    )
+    since = ma.fields.DateTime(
+        description="Only return entries created at or after this time"
+    )
+    until = ma.fields.DateTime(
+        description="Only return entries created before this time"
+    )
+    limit = ma.fields.Integer(
+        validate=Range(min=1, max=MAX_LOG_PAGE),
+        description="Return at most this many entries",
+    )
+    last = ma.fields.Integer(
+        validate=Range(min=1, max=MAX_LOG_PAGE),
+        description="Only return this many of the newest entries",
+    )
+    format = ma.fields.String(
+        missing="json",
+        validate=OneOf(("json", "ndjson")),
+        description="`ndjson` streams one entry per line instead of returning a list",
+    )
+
+    @ma.validates_schema
+    def validate_window(self, data, **kwargs):
+        if "limit" in data and "last" in data:
+            raise ma.ValidationError(
+                "`limit` and `last` cannot be combined", field_name="last"
+            )
+
+
+class LogFilterSchema(LogSchema.Filter, LogPageSchema):
+    pass
+
+
+PAGE_ARGUMENTS = tuple(LogPageSchema().fields)
+
+
+def _utc(value):
+    # date_created is stored as naive UTC
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _order(descending, log=Log):
+    if descending:
+        return log.date_created.desc(), log.id.desc()
+    return log.date_created.asc(), log.id.asc()
+
+
+def _relative_to(id, newer):
+    anchor = aliased(Log)
+    date_created = select(anchor.date_created).where(anchor.id == id).scalar_subquery()
+    if newer:
+        return or_(
+            Log.date_created > date_created,
+            and_(Log.date_created == date_created, Log.id > id),
+        )
+    return or_(
+        Log.date_created < date_created,
+        and_(Log.date_created == date_created, Log.id < id),
+    )
+
+
+def paginate(query, args, descending=False):
+    """Apply the `LogPageSchema` arguments to a query of `Log` entries"""
+    if args.get("since") is not None:
+        query = query.filter(Log.date_created >= _utc(args["since"]))
+    if args.get("until") is not None:
+        query = query.filter(Log.date_created < _utc(args["until"]))
+    if args.get("after") is not None:
+        query = query.filter(_relative_to(args["after"], newer=True))
+    if args.get("before") is not None:
+        query = query.filter(_relative_to(args["before"], newer=False))
+
+    if args.get("last"):
+        newest = query.order_by(*_order(True)).limit(args["last"]).subquery()
+        log = aliased(Log, newest)
+        return query.session.query(log).order_by(*_order(descending, log))
+
+    query = query.order_by(*_order(descending))
+    if args.get("limit"):
+        query = query.limit(args["limit"])
+    return query
+
+
+def stream(query):
+    """Stream the entries of `query` as newline delimited JSON
+
+    Rows are fetched in batches from a server-side cursor, so the listing is
+    never held in memory as a whole.
+    """
+    entries = query.order_by(None).subquery()
+    count, newest, modified = query.session.query(
+        func.count(entries.c.id),
+        func.max(entries.c.id),
+        func.max(entries.c.date_modified),
+    ).one()
+    blp.set_etag(
+        dict(url=request.full_path, count=count, newest=newest, modified=str(modified))
+    )
+
+    schema = LogSchema.Response()
+
+    def generate():
+        rows = query.execution_options(stream_results=True).yield_per(STREAM_BATCH_SIZE)
+        for log in rows:
+            yield json.dumps(schema.dump(log)) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+def respond(query, args, descending=False):
+    query = paginate(query, args, descending)
+    if args.get("format") == "ndjson":
+        return stream(query)
+    return query.all()
+
+
 @blp.route("/")
 class Logs(MethodView):
     @blp.etag
-    @blp.arguments(LogSchema.Filter, location="query")
+    @blp.arguments(LogFilterSchema, location="query")
     @blp.response(200, LogSchema.Response(many=True))
     @blp.login_required
     def get(self, args):
-        """List logs"""
-        return LogSchema().list(args)
+        """List logs, newest first"""
+        log_writer.flush()
+        page = {key: args.pop(key) for key in PAGE_ARGUMENTS if key in args}
+        query = current_app.session.query(Log).filter_by(**args)
+        return respond(query, page, descending=True)
 
     @blp.etag
     @blp.arguments(LogSchema.Creation)
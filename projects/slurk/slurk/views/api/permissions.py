@@ -3,6 +3,7 @@ from flask.views import MethodView
 from flask_smorest.error_handler import ErrorSchema
 from marshmallow.validate import OneOf
 from slurk.extensions.api import Blueprint
+from slurk.extensions.token_cache import token_cache
 from slurk.models import Permissions
 from slurk.views.api import CommonSchema
 
@@ -95,7 +96,9 @@ class PermissionsById(MethodView):
     @blp.login_required
     def put(self, new_permissions, *, permissions):
         """Replace a permissions identified by ID"""
-        return PermissionsSchema().put(permissions, new_permissions)
+        permissions = PermissionsSchema().put(permissions, new_permissions)
+        token_cache.invalidate_permissions(permissions.id)
+        return permissions
 
     @blp.etag
     @blp.query("permissions", PermissionsSchema)
@@ -104,7 +107,9 @@ class PermissionsById(MethodView):
     @blp.login_required
     def patch(self, new_permissions, *, permissions):
         """Update a permissions identified by ID"""
-        return PermissionsSchema().patch(permissions, new_permissions)
+        permissions = PermissionsSchema().patch(permissions, new_permissions)
+        token_cache.invalidate_permissions(permissions.id)
+        return permissions
 
     @blp.etag
     @blp.query("permissions", PermissionsSchema)
@@ -114,3 +119,4 @@ class PermissionsById(MethodView):
     def delete(self, *, permissions):
         """Delete a permissions identified by ID"""
         PermissionsSchema().delete(permissions)
+        token_cache.invalidate_permissions(permissions.id)
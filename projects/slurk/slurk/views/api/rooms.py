@@ -8,12 +8,15 @@ from flask_smorest import abort
 from flask_smorest.error_handler import ErrorSchema
 from slurk.extensions.api import Blueprint
 from slurk.extensions.events import socketio
+from slurk.extensions.log_writer import log_writer
 from slurk.models import Layout, Log, Room, User
+from slurk.models.common import user_room
 from slurk.views.api.openvidu.fields import SessionId as OpenViduSessionId
 from sqlalchemy.sql.elements import or_
 
 from . import CommonSchema, Id
-from .logs import LogSchema
+from .logs import LogPageSchema, LogSchema, respond
+from .telemetry import TelemetryExportSchema, export
 from .users import UserSchema
 from .users import blp as user_blp
 
@@ -39,6 +42,21 @@ class RoomSchema(CommonSchema):
         description="Session for OpenVidu",
         filter_description="Filter for an OpenVidu session",
     )
+    close_at = ma.fields.DateTime(
+        allow_none=True,
+        description="Server time at which the room closes, shown as a countdown",
+    )
+    closes_in = ma.fields.Float(
+        load_only=True,
+        allow_none=True,
+        validate=ma.validate.Range(min=0),
+        description="Seconds from now until the room closes, sets `close_at`",
+    )
+
+
+def emit_close_time(room):
+    """Send the close time to the users of the room, they count down locally"""
+    socketio.emit("close_time", room.close_time(), room=str(room.id))
 
 
 @blp.route("/")
@@ -75,7 +93,11 @@ class RoomById(MethodView):
     @blp.login_required
     def put(self, new_room, *, room):
         """Replace a room identified by ID"""
-        return RoomSchema().put(room, new_room)
+        close_at = room.close_at
+        room = RoomSchema().put(room, new_room)
+        if room.close_at != close_at:
+            emit_close_time(room)
+        return room
 
     @blp.etag
     @blp.query("room", RoomSchema)
@@ -84,7 +106,11 @@ class RoomById(MethodView):
     @blp.login_required
     def patch(self, new_room, *, room):
         """Update a room identified by ID"""
-        return RoomSchema().patch(room, new_room)
+        close_at = room.close_at
+        room = RoomSchema().patch(room, new_room)
+        if room.close_at != close_at:
+            emit_close_time(room)
+        return room
 
     @blp.etag
     @blp.query("room", RoomSchema)
@@ -103,7 +129,14 @@ class UsersByRoomById(MethodView):
     @blp.response(200, UserSchema.Response(many=True))
     def get(self, *, room):
         """List active users by rooms"""
-        return filter(lambda u: u.session_id is not None, room.users)
+        return (
+            current_app.session.query(User)
+            .join(user_room)
+            .filter(user_room.c.room_id == room.id)
+            .filter(User.session_id != None)  # NOQA
+            .order_by(User.id)
+            .all()
+        )
 
 
 # Note: user_blp. Required here as otherwise we would have circular dependencies
@@ -140,19 +173,27 @@ class UserRoom(MethodView):
         user.leave_room(room)
 
 
+class RoomLogsSchema(LogPageSchema):
+    event = ma.fields.List(
+        ma.fields.String(), description="Only return entries for these events"
+    )
+
+
 @blp.route("/<int:room_id>/users/<int:user_id>/logs")
 class LogsByUserByRoomById(MethodView):
     @blp.etag
     @blp.query("room", RoomSchema)
     @blp.query("user", UserSchema)
+    @blp.arguments(RoomLogsSchema, location="query")
     @blp.response(200, LogSchema.Response(many=True))
-    def get(self, *, room, user, authenticated=True):
-        """List logs by room and user"""
+    def get(self, args, *, room, user, authenticated=True):
+        """List logs by room and user, oldest first"""
         if not authenticated and current_user != user:
             print("CURRENT USER", current_user, "USER", user, flush=True)
             abort(HTTPStatus.UNAUTHORIZED)
 
-        return (
+        log_writer.flush()
+        query = (
             current_app.session.query(Log)
             .filter_by(room_id=room.id)
             .filter(
@@ -162,9 +203,22 @@ class LogsByUserByRoomById(MethodView):
                     Log.receiver_id == user.id,
                 )
             )
-            .order_by(Log.date_created.asc())
-            .all()
         )
+        if args.get("event"):
+            query = query.filter(Log.event.in_(args["event"]))
+        return respond(query, args)
+
+
+@blp.route("/<int:room_id>/telemetry")
+class TelemetryByRoomById(MethodView):
+    @blp.query("room", RoomSchema)
+    @blp.arguments(TelemetryExportSchema, location="query")
+    @blp.response(200, description="The samples as a file, oldest first")
+    @blp.login_required
+    def get(self, args, *, room):
+        """Export the keystroke and mouse samples of a room"""
+        log_writer.flush()
+        return export(current_app.session, room.id, args)
 
 
 class AttributeSchema(ma.Schema):
@@ -0,0 +1,54 @@
+import marshmallow as ma
+from flask.views import MethodView
+from slurk.extensions.api import Blueprint
+from slurk.extensions.events import fanout
+from slurk.extensions.live_typing import live_typing
+from slurk.extensions.log_writer import log_writer
+from slurk.extensions.rate_limit import broadcast_limiter
+from slurk.extensions.room_cache import room_cache
+from slurk.extensions.token_cache import token_cache
+from slurk.extensions.typing_state import typing_state
+from slurk.views.api import BaseSchema
+
+blp = Blueprint("stats", __name__)
+
+
+class StatsSchema(BaseSchema):
+    log_writer = ma.fields.Dict(
+        description="Counters and queue depth of the write-behind log buffer"
+    )
+    room_cache = ma.fields.Dict(
+        description="Hit and miss counters of the room membership cache"
+    )
+    token_cache = ma.fields.Dict(
+        description="Hit and miss counters of the API token cache"
+    )
+    fanout = ma.fields.Dict(
+        description="Emits and receiving sockets per socket.io event"
+    )
+    rate_limits = ma.fields.Dict(
+        description="Allowed and limited events per rate limited socket.io event"
+    )
+    live_typing = ma.fields.Dict(
+        description="Received changes and sent frames of live-typing previews"
+    )
+    typing = ma.fields.Dict(
+        description="Typing transitions, dropped duplicates and sent room updates"
+    )
+
+
+@blp.route("/")
+class Stats(MethodView):
+    @blp.response(200, StatsSchema)
+    @blp.login_required
+    def get(self):
+        """Get runtime metrics of this server process"""
+        return dict(
+            log_writer=log_writer.metrics(),
+            room_cache=room_cache.metrics(),
+            token_cache=token_cache.metrics(),
+            fanout=fanout.metrics(),
+            rate_limits=dict(client_broadcast=broadcast_limiter.metrics()),
+            typing=typing_state.metrics(),
+            live_typing=live_typing.metrics(),
+        )
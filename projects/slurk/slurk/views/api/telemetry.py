@@ -0,0 +1,170 @@
+import csv
+import io
+import zlib
+from http import HTTPStatus
+
+import marshmallow as ma
+from flask import Response, stream_with_context
+from flask_smorest import abort
+from marshmallow.validate import OneOf
+from slurk.models import Telemetry, User
+
+from . import BaseSchema, Id
+from .logs import STREAM_BATCH_SIZE, _utc
+
+FORMATS = ("csv", "parquet")
+
+
+class TelemetryExportSchema(BaseSchema):
+    """Query arguments for exporting the telemetry samples of a room"""
+
+    event = ma.fields.List(
+        ma.fields.String(validate=OneOf(Telemetry.EVENTS)),
+        description="Only export samples of these events",
+    )
+    user_id = Id(User, description="Only export samples of this user")
+    since = ma.fields.DateTime(
+        description="Only export samples recorded at or after this time"
+    )
+    until = ma.fields.DateTime(
+        description="Only export samples recorded before this time"
+    )
+    format = ma.fields.String(
+        missing="csv",
+        validate=OneOf(FORMATS),
+        description="`csv` for gzip compressed CSV, `parquet` requires pyarrow",
+    )
+
+
+def select_samples(session, room_id, args):
+    """The columns of the samples of a room, oldest first"""
+    columns = [getattr(Telemetry, name) for name in Telemetry.COLUMNS]
+    query = session.query(*columns).filter(Telemetry.room_id == room_id)
+    if args.get("event"):
+        query = query.filter(Telemetry.event.in_(args["event"]))
+    if args.get("user_id") is not None:
+        query = query.filter(Telemetry.user_id == args["user_id"])
+    if args.get("since") is not None:
+        query = query.filter(Telemetry.time >= _utc(args["since"]))
+    if args.get("until") is not None:
+        query = query.filter(Telemetry.time < _utc(args["until"]))
+    return query.order_by(Telemetry.time, Telemetry.id)
+
+
+def _rows(query):
+    return query.execution_options(stream_results=True).yield_per(STREAM_BATCH_SIZE)
+
+
+def _attachment(filename):
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+
+def export_csv(query, filename):
+    """Stream the rows of `query` as gzip compressed CSV"""
+
+    def generate():
+        # wbits of 16 + MAX_WBITS write a gzip header and trailer
+        compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(Telemetry.COLUMNS)
+        for number, row in enumerate(_rows(query), start=1):
+            writer.writerow(row)
+            if number % STREAM_BATCH_SIZE == 0:
+                yield compressor.compress(buffer.getvalue().encode())
+                buffer.seek(0)
+                buffer.truncate()
+        yield compressor.compress(buffer.getvalue().encode())
+        yield compressor.flush()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/gzip",
+        headers=_attachment(f"{filename}.csv.gz"),
+    )
+
+
+class _Chunks(io.RawIOBase):
+    """Write-only file collecting what was written since the last `take`"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def export_parquet(query, filename):
+    """Stream the rows of `query` as Parquet, one row group per batch"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        abort(
+            HTTPStatus.BAD_REQUEST,
+            message="Parquet export requires pyarrow to be installed",
+        )
+
+    schema = pa.schema(
+        [
+            ("id", pa.int64()),
+            ("event", pa.string()),
+            ("room_id", pa.int64()),
+            ("user_id", pa.int64()),
+            ("time", pa.timestamp("us", tz="UTC")),
+            ("client_time", pa.int64()),
+            ("type", pa.string()),
+            ("x", pa.float64()),
+            ("y", pa.float64()),
+            ("element_id", pa.string()),
+            ("key", pa.string()),
+            ("modifiers", pa.int16()),
+        ]
+    )
+
+    def write(writer, batch):
+        columns = [list(column) for column in zip(*batch)]
+        writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+
+    def generate():
+        # every finished row group is sent, only the footer waits for the end
+        output = _Chunks()
+        with pq.ParquetWriter(output, schema, compression="zstd") as writer:
+            batch = []
+            for row in _rows(query):
+                batch.append(row)
+                if len(batch) == STREAM_BATCH_SIZE:
+                    write(writer, batch)
+                    batch = []
+                    yield output.take()
+            if batch:
+                write(writer, batch)
+        yield output.take()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/vnd.apache.parquet",
+        headers=_attachment(f"{filename}.parquet"),
+    )
+
+
+def export(session, room_id, args):
+    samples = select_samples(session, room_id, args)
+    filename = f"room-{room_id}-telemetry"
+    if args["format"] == "parquet":
+        return export_parquet(samples, filename)
+    return export_csv(samples, filename)
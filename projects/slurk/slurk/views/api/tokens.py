@@ -3,11 +3,14 @@ from flask.globals import current_app
 from flask.views import MethodView
 from flask_smorest.error_handler import ErrorSchema
 from slurk.extensions.api import Blueprint
+from slurk.extensions.token_cache import token_cache
 from slurk.models import Permissions, Room, Task, Token
 from slurk.views.api import BaseSchema, CommonSchema, Id
 
 blp = Blueprint(Token.__tablename__ + "s", __name__)
 
+MAX_BULK_TOKENS = 10000
+
 
 class TokenId(ma.fields.UUID):
     def _validated(self, value):
@@ -84,6 +87,77 @@ class TokenSchema(CommonSchema):
     )
 
 
+class TokenSpecSchema(BaseSchema):
+    """Token fields of a bulk request
+
+    Foreign keys are plain integers here, they are checked once per request by
+    `TokensBulkSchema` instead of once per token."""
+
+    permissions_id = ma.fields.Integer(
+        strict=False, required=True, description="Permissions for this token"
+    )
+    registrations_left = ma.fields.Integer(
+        validate=ma.validate.Range(min=-1, max=2**63 - 1),
+        missing=1,
+        description="Logins left for this token",
+    )
+    room_id = ma.fields.Integer(
+        strict=False, missing=None, description="Room assigned to this token"
+    )
+    task_id = ma.fields.Integer(
+        strict=False, missing=None, description="Task assigned to this token"
+    )
+    openvidu_settings = ma.fields.Nested(
+        OpenViduSettingsSchema,
+        missing=OpenViduSettingsSchema().load({}),
+        description="Settings for connections used for this token. If a setting is missing, the room default is used",
+    )
+
+
+class TokensBulkSchema(BaseSchema):
+    count = ma.fields.Integer(
+        validate=ma.validate.Range(min=1, max=MAX_BULK_TOKENS),
+        missing=1,
+        description="Number of tokens created from `token`",
+    )
+    token = ma.fields.Nested(
+        TokenSpecSchema, description="Specification shared by all `count` tokens"
+    )
+    tokens = ma.fields.List(
+        ma.fields.Nested(TokenSpecSchema),
+        validate=ma.validate.Length(min=1, max=MAX_BULK_TOKENS),
+        description="Individual specifications, one token is created for each",
+    )
+
+    @ma.validates_schema
+    def validate_references(self, data, **kwargs):
+        if ("token" in data) == ("tokens" in data):
+            raise ma.ValidationError("Exactly one of `token` and `tokens` is required")
+        specs = data["tokens"] if "tokens" in data else [data["token"]]
+
+        db = current_app.session
+        for field, table in (
+            ("permissions_id", Permissions),
+            ("room_id", Room),
+            ("task_id", Task),
+        ):
+            ids = {spec[field] for spec in specs if spec.get(field) is not None}
+            if not ids:
+                continue
+            found = {id for (id,) in db.query(table.id).filter(table.id.in_(ids))}
+            missing = sorted(ids - found)
+            if missing:
+                raise ma.ValidationError(
+                    f"{table.__tablename__} `{missing[0]}` does not exist", field
+                )
+
+
+class TokensBulkResponseSchema(BaseSchema):
+    ids = ma.fields.List(
+        ma.fields.String(), description="IDs of the created tokens in request order"
+    )
+
+
 @blp.route("/")
 class Tokens(MethodView):
     @blp.etag
@@ -103,6 +177,29 @@ class Tokens(MethodView):
         return TokenSchema().post(item)
 
 
+@blp.route("/bulk")
+class TokensBulk(MethodView):
+    @blp.etag
+    @blp.arguments(TokensBulkSchema)
+    @blp.response(201, TokensBulkResponseSchema)
+    @blp.login_required
+    def post(self, args):
+        """Add multiple tokens in a single transaction
+
+        Either pass `token` together with `count` to create `count` identical
+        tokens, or pass a list of specifications as `tokens`."""
+        if "tokens" in args:
+            specs = args["tokens"]
+        else:
+            specs = [args["token"]] * args["count"]
+
+        tokens = [Token(**dict(spec)) for spec in specs]
+        db = current_app.session
+        db.add_all(tokens)
+        db.commit()
+        return {"ids": [token.id for token in tokens]}
+
+
 @blp.route("/<uuid:token_id>")
 class TokensById(MethodView):
     @blp.etag
@@ -119,7 +216,9 @@ class TokensById(MethodView):
     @blp.login_required
     def put(self, new_token, *, token):
         """Replace a token identified by ID"""
-        return TokenSchema().put(token, new_token)
+        token = TokenSchema().put(token, new_token)
+        token_cache.invalidate(token.id)
+        return token
 
     @blp.etag
     @blp.query("token", TokenSchema)
@@ -128,7 +227,9 @@ class TokensById(MethodView):
     @blp.login_required
     def patch(self, new_token, *, token):
         """Update a token identified by ID"""
-        return TokenSchema().patch(token, new_token)
+        token = TokenSchema().patch(token, new_token)
+        token_cache.invalidate(token.id)
+        return token
 
     @blp.etag
     @blp.query("token", TokenSchema)
@@ -138,3 +239,4 @@ class TokensById(MethodView):
     def delete(self, *, token):
         """Delete a token identified by ID"""
         TokenSchema().delete(token)
+        token_cache.invalidate(token.id)
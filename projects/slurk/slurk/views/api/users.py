@@ -3,7 +3,8 @@ from flask.globals import current_app
 from flask.views import MethodView
 from flask_smorest.error_handler import ErrorSchema
 from slurk.extensions.api import Blueprint, abort
-from slurk.models import Task, Token, User
+from slurk.models import Token, User
+from sqlalchemy.orm import joinedload
 from werkzeug.exceptions import UnprocessableEntity
 
 from . import CommonSchema
@@ -134,19 +135,22 @@ class UserById(MethodView):
 @blp.route("/<int:user_id>/task")
 class TaskByUserById(MethodView):
     @blp.etag
-    @blp.query("user", UserSchema)
+    @blp.query(
+        "user", UserSchema, options=[joinedload(User.token).joinedload(Token.task)]
+    )
     @blp.response(200, TaskSchema.Response)
     def get(self, *, user):
-        task_id = user.token.task_id
-        if task_id is not None:
-            task = current_app.session.query(Task).get(task_id)
-            return task
+        return user.token.task
 
 
 @blp.route("/<int:user_id>/permissions")
 class PermissionsByUserById(MethodView):
     @blp.etag
-    @blp.query("user", UserSchema)
+    @blp.query(
+        "user",
+        UserSchema,
+        options=[joinedload(User.token).joinedload(Token.permissions)],
+    )
     @blp.response(200, PermissionsSchema.Response)
     def get(self, *, user):
         # only return permissions if this token is not going to
@@ -24,4 +24,14 @@ def index():
             current_user.rooms.append(current_user.token.room)
             db.commit()
 
-    return render_template("chat.html", title="slurk", token=current_user.token.id)
+    history = dict(
+        length=current_app.config.get("HISTORY_LENGTH", 0),
+        events=current_app.config.get("HISTORY_EVENTS", []),
+    )
+    return render_template(
+        "chat.html",
+        title="slurk",
+        token=current_user.token.id,
+        history=history,
+        transports=current_app.config.get("SOCKETIO_TRANSPORTS"),
+    )
@@ -2,8 +2,12 @@ from datetime import datetime
 
 from flask.globals import current_app
 from flask_login import current_user, login_required
-from slurk.extensions.events import socketio
-from slurk.models import Log, Room, Task, User
+from slurk.extensions.events import connected_sockets, fanout, socketio
+from slurk.extensions.live_typing import live_typing
+from slurk.extensions.rate_limit import broadcast_limiter
+from slurk.extensions.room_cache import room_cache
+from slurk.extensions.typing_state import typing_state
+from slurk.models import Log, Room, Task, Telemetry
 
 
 @socketio.event
@@ -35,7 +39,50 @@ def room_created(payload):
 
 @socketio.event
 def client_broadcast(payload):
-    socketio.emit("client_broadcast", payload)
+    """Relay `payload` to other clients.
+
+    With `"scope": "room"` it is sent to the users of `payload["room"]`, with
+    `"scope": "user"` only to the user `payload["user"]` of that room, in both
+    cases the sender has to be a member of the room. Without a scope it is
+    sent to every client and requires the broadcast permission.
+    """
+    sender = room_cache.user(current_user.get_id())
+    if sender is None:
+        return False, "invalid session id"
+    if not broadcast_limiter.allow(sender.id):
+        return False, "Too many broadcasts"
+
+    scope = payload.get("scope")
+    if scope is None:
+        if not sender.permissions.broadcast:
+            return False, "You are not allowed to broadcast"
+        target, recipients = None, connected_sockets()
+    elif scope in ("room", "user"):
+        if "room" not in payload:
+            return False, 'Missing argument "room"'
+        room = room_cache.room(payload["room"])
+        if room is None:
+            return False, "Room not found"
+        if sender.id not in room.members:
+            return False, "User not in this room"
+
+        if scope == "room":
+            target = str(room.id)
+            recipients = sum(1 for m in room.members.values() if m.session_id)
+        else:
+            try:
+                receiver = room.members.get(int(payload.get("user")))
+            except (TypeError, ValueError):
+                receiver = None
+            if receiver is None or receiver.session_id is None:
+                return False, "Receiver not in this room"
+            target, recipients = receiver.session_id, 1
+    else:
+        return False, f'Unknown scope "{scope}"'
+
+    socketio.emit("client_broadcast", payload, room=target)
+    fanout.add("client_broadcast", recipients, kind=payload.get("type"))
+    return True
 
 
 @socketio.event
@@ -43,12 +90,11 @@ def bounding_box(payload):
     if "room" not in payload:
         return False, 'missing argument: "room"'
 
-    db = current_app.session
-    room = db.query(Room).get(payload.pop("room"))
+    room = room_cache.room(payload.pop("room"))
 
     if not room:
         return False, "Room not found"
-    if current_user not in room.users:
+    if current_user.get_id() not in room.members:
         return False, "User not in this room"
 
     if "type" not in payload:
@@ -59,12 +105,15 @@ def bounding_box(payload):
     Log.add(event="bounding_box", user=current_user, room=room, data=payload)
 
     user = {"id": current_user.get_id(), "name": current_user.name}
+    emit_bounding_box(room, user, payload)
+
 
-    for usr in room.users:
-        if usr.token.permissions.receive_bounding_box and usr.session_id:
+def emit_bounding_box(room, user, data):
+    for usr in room.members.values():
+        if usr.permissions.receive_bounding_box and usr.session_id:
             socketio.emit(
                 "bounding_box",
-                {"user": user, "room": room.id, **payload},
+                {"user": user, "room": room.id, **data},
                 room=usr.session_id,
             )
 
@@ -75,16 +124,13 @@ def keystroke(payload):
     if not current_user_id:
         return False, "invalid session id"
 
-    db = current_app.session
-    room = db.query(Room).get(payload.pop("room"))
+    room = room_cache.room(payload.pop("room"))
 
     if room is None:
         return False, "Room not found"
 
-    data = payload["data"]
-    data["timestamp"] = str(datetime.utcnow())
-
-    Log.add(event="keystroke", user=current_user, room=room, data=data)
+    row = Telemetry.row("keystroke", current_user_id, room.id, payload["data"])
+    Telemetry.add_many([row])
 
 
 @socketio.event
@@ -93,46 +139,41 @@ def keypress(message):
     if typing is None:
         return
 
-    current_user_id = current_user.get_id()
-    if not current_user_id:
+    cached_user = room_cache.user(current_user.get_id())
+    if cached_user is None:
         return
 
-    for room in current_user.rooms:
-        user = {
-            "id": current_user_id,
-            "name": current_user.name,
-        }
-        if typing:
-            socketio.emit(
-                "start_typing", {"user": user, "room": room.id}, room=str(room.id)
-            )
-        else:
-            socketio.emit(
-                "stop_typing", {"user": user, "room": room.id}, room=str(room.id)
-            )
+    typing_state.update(
+        cached_user.id, cached_user.name, cached_user.room_ids, bool(typing)
+    )
 
 
 @socketio.event
 def typed_message(payload):
     """
     This function handles live-typing mode. It is called when 'typed_message'
-    event is fired and broadcasts the current message that the user typed to
-    the room through 'user_message' event.
+    event is fired with the changes of the message the user is typing, as
+    splice operations in "ops" or as the full "text". The rooms of the user
+    receive them as 'typed_message' frames at a bounded rate.
     """
-    current_user_id = current_user.get_id()
-    if not current_user_id:
-        return
+    cached_user = room_cache.user(current_user.get_id())
+    if cached_user is None:
+        return False, "invalid session id"
 
-    for room in current_user.rooms:
-        user = {
-            "id": current_user_id,
-            "name": current_user.name,
-        }
-        socketio.emit(
-            "typed_message",
-            {"user": user, "text": payload["text"]},
-            room=str(room.id),
+    if "ops" not in payload and "text" not in payload:
+        return False, 'missing argument: "ops" or "text"'
+
+    user = {
+        "id": cached_user.id,
+        "name": cached_user.name,
+    }
+    try:
+        live_typing.update(
+            user, cached_user.room_ids, text=payload.get("text"), ops=payload.get("ops")
         )
+    except ValueError as e:
+        return False, str(e)
+    return True
 
 
 @socketio.event
@@ -143,18 +184,25 @@ def mouse(payload):
 
     user = dict(id=current_user_id, name=current_user.name)
 
-    db = current_app.session
-    room = db.query(Room).get(payload["room"]) if "room" in payload else None
+    room = room_cache.room(payload["room"]) if "room" in payload else None
 
     if room is None:
         return False, "Room not found"
 
-    data = dict(
+    data = mouse_data(payload)
+    emit_mouse(room, user, data)
+    Telemetry.add_many([Telemetry.row("mouse", current_user_id, room.id, data)])
+
+
+def mouse_data(payload):
+    return dict(
         type=payload.get("type"),
         coordinates=payload.get("coordinates"),
         element_id=payload.get("element_id"),
     )
 
+
+def emit_mouse(room, user, data):
     socketio.emit(
         "mouse",
         dict(
@@ -165,56 +213,133 @@ def mouse(payload):
         ),
         room=str(room.id),
     )
-    Log.add(event="mouse", user=current_user, room=room, data=data)
+
+
+TELEMETRY_EVENTS = ("keystroke", "mouse", "bounding_box")
+
+
+@socketio.event
+def telemetry(payload):
+    """Log a batch of keystroke, mouse and bounding_box samples.
+
+    `payload["samples"]` is a list of `{"event": ..., "time": ..., "data":
+    {...}}` with the time of the client in milliseconds. Membership in
+    `payload["room"]` is checked once for the whole batch and the samples are
+    written in one go, keystrokes and mouse samples to `Telemetry`. Of the
+    mouse movements only the last one is sent on to the room, clicks and
+    bounding boxes are sent on like single events.
+    """
+    sender = room_cache.user(current_user.get_id())
+    if sender is None:
+        return False, "invalid session id"
+    if "room" not in payload:
+        return False, 'missing argument: "room"'
+    room = room_cache.room(payload["room"])
+    if room is None:
+        return False, "Room not found"
+    if sender.id not in room.members:
+        return False, "User not in this room"
+
+    samples = payload.get("samples")
+    if not isinstance(samples, list):
+        return False, 'missing argument: "samples"'
+    if len(samples) > current_app.config.get("TELEMETRY_MAX_SAMPLES", 1000):
+        return False, "Too many samples"
+
+    rows, log_rows = [], []
+    moved = None
+    emits = []
+    now = datetime.utcnow()
+    for sample in samples:
+        event = sample.get("event") if isinstance(sample, dict) else None
+        data = sample.get("data") if event else None
+        if event not in TELEMETRY_EVENTS or not isinstance(data, dict):
+            return False, f"Invalid sample {sample!r}"
+
+        if event == "mouse":
+            data = mouse_data(data)
+            if data["type"] == "move":
+                moved = data
+            else:
+                emits.append((emit_mouse, data))
+        elif event == "bounding_box":
+            if "type" not in data:
+                return False, "Missing type"
+            if data["type"] == "add" and "coordinates" not in data:
+                return False, "Missing coordinates"
+            emits.append((emit_bounding_box, data))
+            data = dict(data, client_time=sample.get("time"))
+            log_rows.append(
+                dict(event=event, user_id=sender.id, room_id=room.id, data=data)
+            )
+            continue
+        rows.append(
+            Telemetry.row(event, sender.id, room.id, data, sample.get("time"), now)
+        )
+
+    if rows:
+        Telemetry.add_many(rows)
+    if log_rows:
+        Log.add_many(log_rows)
+
+    user = {"id": sender.id, "name": sender.name}
+    if moved is not None:
+        emits.append((emit_mouse, moved))
+    for emit, data in emits:
+        emit(room, user, data)
+    return True
 
 
 def emit_message(event, payload, data):
     if "room" not in payload:
         return False, 'missing argument: "room"'
 
-    db = current_app.session
-    room = db.query(Room).get(payload["room"])
+    room = room_cache.room(payload["room"])
 
     if not room:
         return False, "Room not found"
 
+    sender_entry = room_cache.user(current_user.get_id())
+    if sender_entry is None:
+        return False, "invalid session id"
+
     broadcast = data["broadcast"] = payload.get("broadcast", False)
 
     if broadcast:
-        if not current_user.token.permissions.broadcast:
+        if not sender_entry.permissions.broadcast:
             return False, "You are not allowed to broadcast"
 
         target = None
         private = False
     else:
         if "receiver_id" in payload:
-            if not current_user.token.permissions.send_privately:
+            if not sender_entry.permissions.send_privately:
                 return False, "You are not allowed to send privately"
             receiver_id = payload["receiver_id"]
-            receiver = db.query(User).get(receiver_id)
+            receiver = room_cache.user(receiver_id)
             if not receiver:
                 return False, f'User "{receiver_id}" does not exist'
             if not receiver.session_id:
                 return False, f'User "{receiver_id}" is not logged in'
-            if room not in receiver.rooms:
+            if room.id not in receiver.room_ids:
                 return False, f'User "{receiver_id}" is not in this room'
             target = receiver.session_id
             private = True
         else:
-            if current_user not in room.users:
+            if sender_entry.id not in room.members:
                 return False, "Not in room"
-            if room.layout.read_only or room.read_only:
+            if room.read_only:
                 return False, f"Room {room.id} is read-only"
             target = str(room.id)
             private = False
 
-    sender = dict(id=current_user.get_id(), name=current_user.name)
+    sender = dict(id=sender_entry.id, name=sender_entry.name)
     impersonate = payload.get("impersonate")
     if impersonate:
         # only impersonate someone who is in the room
-        for user in room.users:
-            if user.id == impersonate:
-                sender = dict(id=user.id, name=user.name)
+        member = room.members.get(impersonate)
+        if member is not None:
+            sender = dict(id=member.id, name=member.name)
 
     extra_args = {"room": target}
     if broadcast:
@@ -240,10 +365,9 @@ def emit_message(event, payload, data):
         data=data,
     )
 
-    for room in current_user.rooms:
-        socketio.emit(
-            "stop_typing", {"user": sender, "room": room.id}, room=str(room.id)
-        )
+    typing_state.update(
+        sender_entry.id, sender_entry.name, sender_entry.room_ids, False
+    )
 
     return True
 
@@ -255,10 +379,9 @@ def text(payload):
     if not current_user_id:
         return False, "invalid session id"
 
+    permissions = room_cache.user(current_user_id).permissions
     html = payload.get("html", False)
-    if not current_user.token.permissions.send_html_message and (
-        html or not current_user.token.permissions.send_message
-    ):
+    if not permissions.send_html_message and (html or not permissions.send_message):
         return False, "insufficient rights"
     if "message" not in payload:
         return False, 'missing argument: "message"'
@@ -276,7 +399,7 @@ def message_command(payload):
     current_user_id = current_user.get_id()
     if not current_user_id:
         return False, "invalid session id"
-    if not current_user.token.permissions.send_command:
+    if not room_cache.user(current_user_id).permissions.send_command:
         return False, "insufficient rights"
     if "command" not in payload:
         return False, 'missing argument: "command"'
@@ -290,7 +413,7 @@ def image(payload):
     current_user_id = current_user.get_id()
     if not current_user_id:
         return False, "invalid session id"
-    if not current_user.token.permissions.send_image:
+    if not room_cache.user(current_user_id).permissions.send_image:
         return False, "insufficient rights"
     if "url" not in payload:
         return False, 'missing argument: "url"'
@@ -18,9 +18,12 @@ def connect():
 @socketio.on("disconnect")
 @login_required
 def disconnect():
-    for room in current_user.rooms:
-        current_user.leave_room(room, event_only=True)
-    current_user.session_id = None
-    current_app.session.commit()
+    # with several workers the user may have reconnected to another worker
+    # before this one noticed the disconnect, keep the new session then
+    if current_user.session_id == request.sid:
+        for room in current_user.rooms:
+            current_user.leave_room(room, event_only=True)
+        current_user.session_id = None
+        current_app.session.commit()
     Log.add("disconnect", current_user)
     logout_user()
@@ -24,13 +24,25 @@ function verify_query(success, message) {
     return true;
 }
 
+function history_query() {
+    // only request the newest entries if the history is limited
+    if (typeof HISTORY === "undefined" || !HISTORY.length)
+        return "";
+    let query = "?last=" + HISTORY.length;
+    for (let i = 0; i < HISTORY.events.length; i++) {
+        query += "&event=" + encodeURIComponent(HISTORY.events[i]);
+    }
+    return query;
+}
+
 function headers(xhr) {
     xhr.setRequestHeader("Authorization", "Bearer " + TOKEN);
 }
 
 $(document).ready(() => {
     let uri = location.protocol + '//' + document.domain + ':' + location.port + "/slurk/api";
-    socket = io.connect(location.protocol + '//' + document.domain + ':' + location.port);
+    let options = TRANSPORTS ? {transports: TRANSPORTS} : {};
+    socket = io.connect(location.protocol + '//' + document.domain + ':' + location.port, options);
 
     function apply_layout(layout) {
         if (!layout)
@@ -83,7 +95,7 @@ $(document).ready(() => {
 
         let room_request = $.get({ url: uri + "/rooms/" + self_room, beforeSend: headers });
         let user_request = $.get({ url: uri + "/users/" + data.user, beforeSend: headers });
-        let history_request = $.get({ url: uri + "/rooms/" + data.room + "/users/" + data.user + '/logs', beforeSend: headers });
+        let history_request = $.get({ url: uri + "/rooms/" + data.room + "/users/" + data.user + '/logs' + history_query(), beforeSend: headers });
         let token_request = $.get({ url: uri + "/tokens/" + TOKEN, beforeSend: headers });
 
 
@@ -129,6 +141,31 @@ $(document).ready(() => {
         $('#text').prop('readonly', true).prop('placeholder', 'Disconnected!')
         $('#user-list').fadeTo(null, false);
         $('#latency').fadeTo(null, false);
+        clearInterval(close_timer);
+        $('#close-time').hide();
+    }
+
+    let close_timer = null;
+
+    // The server only sends the close time on join and on changes, the
+    // countdown runs locally
+    function close_time(data) {
+        clearInterval(close_timer);
+        if (data.time_left === null) {
+            $('#close-time').hide();
+            return;
+        }
+        const deadline = Date.now() + data.time_left * 1000;
+        function show_time_left() {
+            const time_left = Math.max(0, Math.round((deadline - Date.now()) / 1000));
+            const seconds = time_left % 60;
+            $('#time-left').text(Math.floor(time_left / 60) + ":" + (seconds < 10 ? "0" : "") + seconds);
+            if (time_left === 0)
+                clearInterval(close_timer);
+        }
+        show_time_left();
+        close_timer = setInterval(show_time_left, 1000);
+        $('#close-time').show();
     }
 
     async function openvidu(data) {
@@ -179,6 +216,7 @@ $(document).ready(() => {
     socket.on('joined_room', joined_room);
     socket.on('left_room', left_room);
     socket.on('openvidu', openvidu);
+    socket.on('close_time', close_time);
 
     window.onbeforeunload = function () {
         if (session) session.disconnect();
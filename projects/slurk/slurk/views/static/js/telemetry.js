@@ -0,0 +1,34 @@
+// keystrokes, mouse movements and bounding boxes are collected here and sent
+// to the server as one `telemetry` event every second instead of one event
+// per sample
+let telemetry = {
+    interval: 1000,
+    max_samples: 50,
+    room: undefined,
+    samples: [],
+
+    add: function (event, data) {
+        if (this.room !== self_room) {
+            this.flush();
+            this.room = self_room;
+        }
+        this.samples.push({ event: event, time: Date.now(), data: data });
+        if (this.samples.length >= this.max_samples) {
+            this.flush();
+        }
+    },
+
+    flush: function () {
+        if (this.samples.length === 0 || this.room === undefined) {
+            this.samples = [];
+            return;
+        }
+        socket.emit("telemetry", { room: this.room, samples: this.samples });
+        this.samples = [];
+    }
+};
+
+$(document).ready(() => {
+    setInterval(() => telemetry.flush(), telemetry.interval);
+    $(window).on("pagehide", () => telemetry.flush());
+});
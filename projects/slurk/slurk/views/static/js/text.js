@@ -24,30 +24,17 @@ $(document).ready(() => {
         }
     });
 
-    socket.on("start_typing", function (data) {
-        console.log("start_typing", data, self_user);
-        if (self_user === undefined) {
-            return;
-        }
-        if (data.user.id === self_user.id) {
-            return
-        }
-        typing[data.user.id] = data.user.name;
-        console.log("OK, update", typing);
-        if (update_typing !== undefined) {
-
-            update_typing(typing);
-        }
-    });
-
-    socket.on("stop_typing", function (data) {
-        if (self_user === undefined) {
+    // the server sends everyone typing in the room whenever this changes
+    socket.on("typing_users", function (data) {
+        if (self_user === undefined || data.room !== self_room) {
             return;
         }
-        if (data.user.id === self_user.id) {
-            return
+        typing = {};
+        for (const user of data.users) {
+            if (user.id !== self_user.id) {
+                typing[user.id] = user.name;
+            }
         }
-        delete typing[data.user.id];
         if (update_typing !== undefined) {
             update_typing(typing);
         }
@@ -177,10 +177,8 @@ $(document).ready(() => {
                 drawRectangle(context, rectangle);
                 rectangles.push(rectangle);
 
-                socket.emit(
-                    "bounding_box",
-                    { type: "add", room: self_room, coordinates: rectangle }
-                );
+                telemetry.add("bounding_box", { type: "add", coordinates: rectangle });
+                telemetry.flush();
             } else {
                 tempContext.clearRect(0, 0, canvas.width, canvas.height);
             }
@@ -196,10 +194,8 @@ $(document).ready(() => {
                 context.clearRect(0, 0, canvas.width, canvas.height);
                 rectangles = [];
 
-                socket.emit(
-                    "bounding_box",
-                    { type: "remove", room: self_room }
-                );
+                telemetry.add("bounding_box", { type: "remove" });
+                telemetry.flush();
             }
         }
     };
@@ -1,32 +1,30 @@
 let old_value = "";
+// the text other users are typing and the sequence number of its last frame,
+// by user id
 let typed_messages = {};
 
 
-function showMessagePreview(data) {
-    if (self_user === undefined || data.user.id === self_user.id) {
-        return;
-    }
-
+function showMessagePreview(user, text) {
     let scrollbar_at_bottom = false;
     let content = $('#content');
     if (content.prop("scrollTop") + content.prop("clientHeight") + 20 >= content.prop("scrollHeight")) {
         scrollbar_at_bottom = true;
     }
 
-    if (data.text == "") {
-        delete typed_messages[data.user.name];
+    if (text == "") {
+        delete typed_messages[user.id];
     } else {
-        typed_messages[data.user.name] = data.text;
+        typed_messages[user.id].text = text;
     }
 
     $("#typing").empty();
-    for (let user_name in typed_messages) {
+    for (let user_id in typed_messages) {
         let bubble = $(
         "<li class='other'>" +
         "  <div class='message-box'>" +
         "    <div class='dot-flashing'></div>" +
-        "    <span class='message'>" + user_name + "</span>" +
-            "    <div>" + typed_messages[user_name] + "</div>" +
+        "    <span class='message'>" + typed_messages[user_id].name + "</span>" +
+            "    <div>" + typed_messages[user_id].text + "</div>" +
         "  </div>" +
         "</li>");
         $("#typing").append(bubble);
@@ -37,6 +35,56 @@ function showMessagePreview(data) {
     }
 }
 
+// Frames hold the full text or the splice operations [position, delete,
+// insert] turning the text of the previous frame into the current one.
+// Positions count code points, as the server does, not UTF-16 code units.
+// After a missed frame the preview waits for the next frame with the full text
+function receiveFrame(data) {
+    if (self_user === undefined || data.user.id === self_user.id || data.room !== self_room) {
+        return;
+    }
+    let preview = typed_messages[data.user.id];
+    let text;
+    if ("text" in data) {
+        text = data.text;
+    } else if (preview !== undefined && preview.seq === data.seq - 1) {
+        let chars = Array.from(preview.text);
+        for (const [position, remove, insert] of data.ops) {
+            chars.splice(position, remove, ...Array.from(insert));
+        }
+        text = chars.join("");
+    } else {
+        return;
+    }
+    if (preview === undefined) {
+        preview = typed_messages[data.user.id] = { name: data.user.name, text: "" };
+    }
+    preview.seq = data.seq;
+    showMessagePreview(data.user, text);
+}
+
+// the splice operation turning `old_text` into `new_text`, in code points
+function diff(old_text, new_text) {
+    let old_chars = Array.from(old_text);
+    let new_chars = Array.from(new_text);
+    let prefix = 0;
+    let end = Math.min(old_chars.length, new_chars.length);
+    while (prefix < end && old_chars[prefix] === new_chars[prefix]) {
+        prefix++;
+    }
+    let suffix = 0;
+    end -= prefix;
+    while (suffix < end && old_chars[old_chars.length - suffix - 1] === new_chars[new_chars.length - suffix - 1]) {
+        suffix++;
+    }
+    let insert = new_chars.slice(prefix, new_chars.length - suffix).join("");
+    return [prefix, old_chars.length - prefix - suffix, insert];
+}
+
+function sendText(text) {
+    socket.emit("typed_message", { "text": text });
+}
+
 // at some point the user should submit the message
 // in order not to encourage them to communicate only
 // via the message preview, deleting and changing messages is disabled
@@ -47,9 +95,14 @@ function updateMessage() {
         $("#text").val(old_value);
         alert("You may not edit a typed message.");
     } else {
+        // only send the change, the server sends it on at a bounded rate
+        let ops = [diff(old_value, new_value)];
         old_value = new_value;
-        socket.emit("typed_message", {
-            "text": old_value
+        socket.emit("typed_message", { "ops": ops }, function (ok) {
+            if (ok !== true) {
+                // the server lost track of the text, send all of it
+                sendText(old_value);
+            }
         });
     }
 }
@@ -58,17 +111,12 @@ function submitMessage(event) {
     let code = event.keyCode || event.which;
     if (code === 13) {
         old_value = "";
-        socket.emit("typed_message", {
-            "text": old_value
-        });
+        sendText(old_value);
     }
 }
 
-function submitMessageOnInactivity(data) {
-    if (self_user === undefined || keypress === undefined) {
-        return;
-    }
-    if (data.user.id === self_user.id) {
+function stoppedTyping(user) {
+    if (user.id === self_user.id) {
         if (old_value !== "") {
             let date = new Date();
             let time = date.getTime() - date.getTimezoneOffset() * 60000;
@@ -76,25 +124,44 @@ function submitMessageOnInactivity(data) {
 
             old_value = "";
             $("#text").val("");
+            sendText(old_value);
+        }
+    } else if (user.id in typed_messages) {
+        showMessagePreview(user, "");
+    }
+}
+
+// users typing in the room at the last update, by id
+let typing_users = {};
+
+function submitMessageOnInactivity(data) {
+    if (self_user === undefined || keypress === undefined || data.room !== self_room) {
+        return;
+    }
+    let still_typing = {};
+    for (const user of data.users) {
+        still_typing[user.id] = user;
+    }
+    for (const id in typing_users) {
+        if (!(id in still_typing)) {
+            stoppedTyping(typing_users[id]);
         }
-    } else {
-        data.text = "";
-        showMessagePreview(data);
     }
+    typing_users = still_typing;
 }
 
 
 $("#text").on("keypress", submitMessage);
 $("#text").on("input", updateMessage);
 
-socket.on("typed_message", showMessagePreview);
-socket.on("stop_typing", submitMessageOnInactivity);
+socket.on("typed_message", receiveFrame);
+socket.on("typing_users", submitMessageOnInactivity);
 
 socket.on('left_room', function removeHandlers() {
     $("#text").off("keypress", submitMessage);
     $("#text").off("input", updateMessage);
 
-    socket.off("typed_message", showMessagePreview);
-    socket.off("stop_typing", submitMessageOnInactivity);
+    socket.off("typed_message", receiveFrame);
+    socket.off("typing_users", submitMessageOnInactivity);
     socket.off("left_room", removeHandlers);
 });
@@ -16,12 +16,11 @@ function trackGetPosition (evt, area) {
 
 function emitPosition(area) {
     if (trackMousePointer.isMoving) {
-        socket.emit("mouse", {
-           type: "move",
-           coordinates: trackMousePointer.pos,
-           element_id: area,
-           room: self_room
-	});
+        telemetry.add("mouse", {
+            type: "move",
+            coordinates: {...trackMousePointer.pos},
+            element_id: area
+        });
         trackMousePointer.isMoving = false;
     }
 }
@@ -37,12 +36,13 @@ function trackMovement(area, interval) {
 function trackClicks(area) {
     $("#" + area).click(function(e) {
         trackGetPosition(e, area);
-        socket.emit("mouse", {
+        telemetry.add("mouse", {
             type: "click",
-            coordinates: trackMousePointer.pos,
-            element_id: area,
-            room: self_room
+            coordinates: {...trackMousePointer.pos},
+            element_id: area
         });
+        // clicks are shown to the others right away
+        telemetry.flush();
     });
 }
 
@@ -1,7 +1,10 @@
 """Helper functions."""
 
+from contextlib import contextmanager
 from json.decoder import JSONDecodeError
 
+from sqlalchemy import event
+
 
 def parse_error(response):
     try:
@@ -15,3 +18,18 @@ def parse_error(response):
     if "message" in json:
         return response.json["message"]
     return response.json
+
+
+@contextmanager
+def count_statements(engine):
+    """Collect the SQL statements executed on `engine` within the block"""
+    statements = []
+
+    def record(connection, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
@@ -69,6 +69,82 @@ class TestGetInvalid:
         assert response.status_code == HTTPStatus.UNAUTHORIZED, parse_error(response)
 
 
+@pytest.mark.depends(
+    on=[
+        f"{PREFIX}::TestRequestOptions::test_request_option[GET]",
+        f"{PREFIX}::TestPostValid",
+    ]
+)
+class TestGetPaginated:
+    @pytest.fixture
+    def paged_logs(self, client):
+        return [
+            client.post(
+                "/slurk/api/logs", json={"event": "Paged Event", "data": {"i": i}}
+            ).json["id"]
+            for i in range(5)
+        ]
+
+    def get(self, client, **query):
+        response = client.get(
+            "/slurk/api/logs", query_string=dict(event="Paged Event", **query)
+        )
+        assert response.status_code == HTTPStatus.OK, parse_error(response)
+        return [log["id"] for log in response.json]
+
+    def test_cursor(self, client, paged_logs):
+        newest_first = paged_logs[::-1]
+        assert self.get(client)[:5] == newest_first
+
+        first = self.get(client, limit=2)
+        assert first == newest_first[:2]
+        second = self.get(client, limit=2, before=first[-1])
+        assert second == newest_first[2:4]
+        assert self.get(client, after=paged_logs[2])[-2:] == newest_first[:2]
+
+    def test_last(self, client, paged_logs):
+        assert self.get(client, last=3) == paged_logs[:1:-1]
+
+    def test_time_window(self, client, paged_logs):
+        past, future = "2000-01-01T00:00:00", "2100-01-01T00:00:00+01:00"
+        assert self.get(client, until=past) == []
+        assert self.get(client, since=future) == []
+        assert self.get(client, since=past, until=future)[:5] == paged_logs[::-1]
+
+    def test_ndjson(self, client, paged_logs):
+        response = client.get(
+            "/slurk/api/logs",
+            query_string=dict(event="Paged Event", format="ndjson", last=5),
+        )
+        assert response.status_code == HTTPStatus.OK, parse_error(response)
+        assert response.mimetype == "application/x-ndjson"
+        lines = response.get_data(as_text=True).splitlines()
+        assert [json.loads(line)["id"] for line in lines] == paged_logs[::-1]
+
+        response = client.get(
+            "/slurk/api/logs",
+            query_string=dict(event="Paged Event", format="ndjson", last=5),
+            headers={"If-None-Match": response.headers["ETag"]},
+        )
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+    @pytest.mark.parametrize(
+        "query",
+        [
+            {"limit": 0},
+            {"limit": 2, "last": 2},
+            {"after": -42},
+            {"since": "yesterday"},
+            {"format": "xml"},
+        ],
+    )
+    def test_invalid_request(self, client, query):
+        response = client.get("/slurk/api/logs", query_string=query)
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY, parse_error(
+            response
+        )
+
+
 @pytest.mark.depends(
     on=[
         f"{PREFIX}::TestRequestOptions::test_request_option[POST]",
@@ -420,6 +420,8 @@ class TestPatchInvalid(RoomsTable, InvalidWithEtagTemplate):
         ({"json": {"layout_id": -42}}, HTTPStatus.UNPROCESSABLE_ENTITY),
         ({"json": {"read_only": 42}}, HTTPStatus.UNPROCESSABLE_ENTITY),
         ({"json": {"date_modified": "something"}}, HTTPStatus.UNPROCESSABLE_ENTITY),
+        ({"json": {"closes_in": -5}}, HTTPStatus.UNPROCESSABLE_ENTITY),
+        ({"json": {"close_at": "tomorrow"}}, HTTPStatus.UNPROCESSABLE_ENTITY),
         ({"data": {"layout_id": -1}}, HTTPStatus.UNSUPPORTED_MEDIA_TYPE),
     ]
 
@@ -438,6 +440,68 @@ class TestPatchInvalid(RoomsTable, InvalidWithEtagTemplate):
         assert response.status_code == status, parse_error(response)
 
 
+@pytest.mark.depends(
+    on=[
+        f"{PREFIX}::TestRequestOptions::test_request_option_with_id[PATCH]",
+        f"{PREFIX}::TestPostValid",
+    ]
+)
+class TestPatchCloseTimeValid:
+    def test_closes_in(self, client, rooms):
+        with mock.patch("slurk.views.api.rooms.socketio.emit") as socketio_mock:
+            response = client.patch(
+                f'/slurk/api/rooms/{rooms.json["id"]}',
+                json={"closes_in": 300},
+                headers={"If-Match": rooms.headers["ETag"]},
+            )
+        assert response.status_code == HTTPStatus.OK, parse_error(response)
+        assert response.json["close_at"] is not None
+        assert "closes_in" not in response.json
+
+        # the users of the room are told once, they count down locally
+        socketio_mock.assert_called_once()
+        event, payload = socketio_mock.call_args.args
+        assert event == "close_time"
+        assert payload["room"] == rooms.json["id"]
+        assert payload["close_at"] == response.json["close_at"]
+        assert 299 < payload["time_left"] <= 300
+        assert socketio_mock.call_args.kwargs == {"room": str(rooms.json["id"])}
+
+    def test_unchanged_close_time(self, client, rooms):
+        with mock.patch("slurk.views.api.rooms.socketio.emit") as socketio_mock:
+            response = client.patch(
+                f'/slurk/api/rooms/{rooms.json["id"]}',
+                json={"read_only": True},
+                headers={"If-Match": rooms.headers["ETag"]},
+            )
+        assert response.status_code == HTTPStatus.OK, parse_error(response)
+        assert response.json["close_at"] is None
+        socketio_mock.assert_not_called()
+
+    def test_remove_close_time(self, client, rooms):
+        response = client.patch(
+            f'/slurk/api/rooms/{rooms.json["id"]}',
+            json={"close_at": "2030-01-01T12:00:00"},
+            headers={"If-Match": rooms.headers["ETag"]},
+        )
+        assert response.status_code == HTTPStatus.OK, parse_error(response)
+        assert response.json["close_at"] == "2030-01-01T12:00:00"
+
+        with mock.patch("slurk.views.api.rooms.socketio.emit") as socketio_mock:
+            response = client.patch(
+                f'/slurk/api/rooms/{rooms.json["id"]}',
+                json={"close_at": None},
+                headers={"If-Match": response.headers["ETag"]},
+            )
+        assert response.status_code == HTTPStatus.OK, parse_error(response)
+        assert response.json["close_at"] is None
+        socketio_mock.assert_called_once_with(
+            "close_time",
+            {"room": rooms.json["id"], "close_at": None, "time_left": None},
+            room=str(rooms.json["id"]),
+        )
+
+
 @pytest.mark.depends(
     on=[
         f"{PREFIX}::TestRequestOptions::test_request_option_with_id_attribute[PATCH]",
@@ -868,6 +932,27 @@ class TestGetLogsByUserByRoomByIdValid:
         )
         assert response.status_code == HTTPStatus.NOT_MODIFIED
 
+    def test_last_entries_of_events(self, client, rooms, users, logs):
+        def post(event):
+            return client.post(
+                "/slurk/api/logs",
+                json={
+                    "event": event,
+                    "user_id": users.json["id"],
+                    "room_id": rooms.json["id"],
+                },
+            ).json["id"]
+
+        ids = [post("text_message"), post("keystroke"), post("text_message")]
+
+        response = client.get(
+            f'/slurk/api/rooms/{rooms.json["id"]}/users/{users.json["id"]}/logs',
+            query_string={"last": 2, "event": ["text_message", "Test Event"]},
+        )
+        assert response.status_code == HTTPStatus.OK, parse_error(response)
+        # oldest first, even though only the newest are returned
+        assert [log["id"] for log in response.json] == [ids[0], ids[2]]
+
 
 class TestGetLogsByUserByRoomByIdInvalid:
     @pytest.mark.depends(
@@ -879,3 +964,101 @@ class TestGetLogsByUserByRoomByIdInvalid:
             headers={"Authorization": f'Bearer {tokens.json["id"]}'},
         )
         assert response.status_code == HTTPStatus.UNAUTHORIZED, parse_error(response)
+
+
+@pytest.mark.depends(
+    on=[f"{PREFIX}::TestPostValid", "tests/api/test_users.py::TestPostValid"]
+)
+class TestGetTelemetryByRoomByIdValid:
+    @pytest.fixture
+    def samples(self, app, rooms, users):
+        from datetime import datetime, timedelta
+
+        from slurk.models import Telemetry
+
+        start = datetime(2024, 1, 1)
+        move = {"type": "move", "coordinates": {"x": 0.25, "y": 0.5}}
+        rows = [
+            Telemetry.row("mouse", users.json["id"], rooms.json["id"], move, 1, start),
+            Telemetry.row(
+                "keystroke",
+                users.json["id"],
+                rooms.json["id"],
+                {"key": "a", "shift": True},
+                2,
+                start + timedelta(seconds=1),
+            ),
+        ]
+        with app.app_context():
+            app.session.query(Telemetry).delete()
+            app.session.bulk_insert_mappings(Telemetry, rows)
+            app.session.commit()
+        return rows
+
+    def url(self, rooms):
+        return f'/slurk/api/rooms/{rooms.json["id"]}/telemetry'
+
+    def test_csv(self, client, rooms, samples):
+        import csv
+        import gzip
+
+        response = client.get(self.url(rooms))
+        assert response.status_code == HTTPStatus.OK, parse_error(response)
+        assert response.mimetype == "application/gzip"
+        assert "telemetry.csv.gz" in response.headers["Content-Disposition"]
+
+        rows = list(
+            csv.DictReader(gzip.decompress(response.data).decode().splitlines())
+        )
+        assert [(row["event"], row["client_time"]) for row in rows] == [
+            ("mouse", "1"),
+            ("keystroke", "2"),
+        ]
+        assert (rows[0]["x"], rows[0]["y"], rows[0]["key"]) == ("0.25", "0.5", "")
+        assert (rows[1]["key"], rows[1]["modifiers"]) == ("a", "4")
+
+    def test_filters(self, client, rooms, samples):
+        import gzip
+
+        def count(**query):
+            response = client.get(self.url(rooms), query_string=query)
+            assert response.status_code == HTTPStatus.OK, parse_error(response)
+            # without the header
+            return len(gzip.decompress(response.data).splitlines()) - 1
+
+        assert count(event="keystroke") == 1
+        assert count(since="2024-01-01T00:00:01") == 1
+        assert count(until="2024-01-01T00:00:01") == 1
+        assert count(since="2024-01-02T00:00:00") == 0
+
+    def test_parquet(self, client, rooms, samples):
+        import io
+
+        pq = pytest.importorskip("pyarrow.parquet")
+
+        response = client.get(self.url(rooms), query_string={"format": "parquet"})
+        assert response.status_code == HTTPStatus.OK, parse_error(response)
+        table = pq.read_table(io.BytesIO(response.data))
+        assert table.column("event").to_pylist() == ["mouse", "keystroke"]
+        assert table.column("x").to_pylist() == [0.25, None]
+
+    def test_parquet_streams_row_groups(self, client, rooms, samples, monkeypatch):
+        import io
+
+        pq = pytest.importorskip("pyarrow.parquet")
+        monkeypatch.setattr("slurk.views.api.telemetry.STREAM_BATCH_SIZE", 1)
+
+        response = client.get(
+            self.url(rooms), query_string={"format": "parquet"}, buffered=False
+        )
+        assert response.status_code == HTTPStatus.OK, parse_error(response)
+        chunks = [chunk for chunk in response.response if chunk]
+        # a chunk for every row group and one with the footer
+        assert len(chunks) == 3
+        parquet = pq.ParquetFile(io.BytesIO(b"".join(chunks)))
+        assert parquet.metadata.num_row_groups == 2
+        assert parquet.read().column("client_time").to_pylist() == [1, 2]
+
+    def test_invalid_format(self, client, rooms):
+        response = client.get(self.url(rooms), query_string={"format": "xlsx"})
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""Test the number of SQL statements of frequently used requests."""
+
+from http import HTTPStatus
+
+import pytest
+from slurk.extensions.log_writer import log_writer
+
+from .. import count_statements, parse_error
+
+ROWS = 10
+
+
+@pytest.fixture
+def room(app, client, layouts, permissions, tasks):
+    """A room with active users, the tokens of which have a task, and logs"""
+    room = client.post("/slurk/api/rooms", json={"layout_id": layouts.json["id"]})
+    users = []
+    for i in range(ROWS):
+        token = client.post(
+            "/slurk/api/tokens",
+            json={
+                "permissions_id": permissions.json["id"],
+                "room_id": room.json["id"],
+                "task_id": tasks.json["id"],
+                "registrations_left": 2,
+            },
+        )
+        user = client.post(
+            "/slurk/api/users", json={"name": f"User {i}", "token_id": token.json["id"]}
+        )
+        users.append(user.json["id"])
+        client.post(
+            "/slurk/api/logs",
+            json={
+                "event": "text_message",
+                "user_id": user.json["id"],
+                "room_id": room.json["id"],
+                "receiver_id": users[0],
+            },
+        )
+
+    with app.app_context():
+        from slurk.models import User
+
+        for user in app.session.query(User).filter(User.id.in_(users)):
+            user.session_id = f"session-{user.id}"
+        app.session.commit()
+
+    log_writer.flush()
+    return room.json["id"], users
+
+
+def budgets(room, users):
+    first, second = users[:2]
+    return [
+        ("get", f"/slurk/api/rooms/{room}/users", {}, 2),
+        ("get", f"/slurk/api/users/{first}/rooms", {}, 2),
+        ("get", f"/slurk/api/users/{first}/task", {}, 1),
+        ("get", f"/slurk/api/users/{first}/permissions", {}, 1),
+        ("get", f"/slurk/api/rooms/{room}/users/{first}/logs", {}, 3),
+        (
+            "get",
+            "/slurk/api/logs",
+            {"query_string": dict(user_id=first, room_id=room, receiver_id=second)},
+            2,
+        ),
+        (
+            "post",
+            "/slurk/api/logs",
+            {"json": dict(event="x", user_id=first, room_id=room, receiver_id=second)},
+            3,
+        ),
+    ]
+
+
+@pytest.mark.depends(
+    on=[
+        "tests/api/test_rooms.py::TestPostValid",
+        "tests/api/test_users.py::TestPostValid",
+        "tests/api/test_logs.py::TestPostValid",
+        "tests/api/test_tasks.py::TestPostValid",
+    ]
+)
+def test_budgets(client, engine, room):
+    for method, url, kwargs, budget in budgets(*room):
+        # the token of the client is cached by the first request
+        getattr(client, method)(url, **kwargs)
+        with count_statements(engine) as statements:
+            response = getattr(client, method)(url, **kwargs)
+        assert response.status_code < 300, parse_error(response)
+        assert len(statements) <= budget, (method, url, statements)
+
+    # every user of the room is listed, without a statement per user
+    response = client.get(f"/slurk/api/rooms/{room[0]}/users")
+    assert response.status_code == HTTPStatus.OK, parse_error(response)
+    assert [user["id"] for user in response.json] == room[1]
+
+
+def test_missing_ids_are_reported_per_field(client, rooms):
+    response = client.get(
+        "/slurk/api/logs",
+        query_string={"user_id": 2**31, "room_id": rooms.json["id"], "receiver_id": -1},
+    )
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    errors = response.json["errors"]["query"]
+    assert errors == {
+        "user_id": [f"User `{2**31}` does not exist"],
+        "receiver_id": ["User `-1` does not exist"],
+    }
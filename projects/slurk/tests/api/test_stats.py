@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""Test requests to the `stats` endpoint."""
+
+from http import HTTPStatus
+
+import pytest
+
+from .. import parse_error
+
+
+class TestGet:
+    def test_valid_request(self, client):
+        response = client.get("/slurk/api/stats")
+        assert response.status_code == HTTPStatus.OK, parse_error(response)
+        assert {"depth", "enqueued", "written", "overflows"} <= set(
+            response.json["log_writer"]
+        )
+        assert {"allowed", "limited", "senders"} <= set(
+            response.json["rate_limits"]["client_broadcast"]
+        )
+        assert isinstance(response.json["fanout"], dict)
+
+    @pytest.mark.depends(on=["tests/api/test_tokens.py::TestPostValid"])
+    def test_unauthorized_access(self, client, tokens):
+        response = client.get(
+            "/slurk/api/stats", headers={"Authorization": f'Bearer {tokens.json["id"]}'}
+        )
+        assert response.status_code == HTTPStatus.UNAUTHORIZED, parse_error(response)
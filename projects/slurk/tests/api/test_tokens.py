@@ -95,6 +95,108 @@ class TestPostValid:
         assert token["room_id"] == data.get("room_id", None)
 
 
+@pytest.mark.depends(
+    on=[
+        f"{PREFIX}::TestPostValid",
+        "tests/api/test_permissions.py::TestPostValid",
+        "tests/api/test_tasks.py::TestPostValid",
+        "tests/api/test_rooms.py::TestPostValid",
+    ]
+)
+class TestBulkPostValid:
+    def test_count(self, client, permissions, rooms, tasks):
+        spec = {
+            "permissions_id": permissions.json["id"],
+            "room_id": rooms.json["id"],
+            "task_id": tasks.json["id"],
+            "registrations_left": 3,
+        }
+        response = client.post(
+            "/slurk/api/tokens/bulk", json={"count": 4, "token": spec}
+        )
+        assert response.status_code == HTTPStatus.CREATED, parse_error(response)
+
+        ids = response.json["ids"]
+        assert len(ids) == len(set(ids)) == 4
+        for id in ids:
+            token = client.get(f"/slurk/api/tokens/{id}").json
+            for key, value in spec.items():
+                assert token[key] == value
+
+    def test_list(self, client, permissions, rooms):
+        specs = [
+            {"permissions_id": permissions.json["id"]},
+            {"permissions_id": permissions.json["id"], "room_id": rooms.json["id"]},
+        ]
+        response = client.post("/slurk/api/tokens/bulk", json={"tokens": specs})
+        assert response.status_code == HTTPStatus.CREATED, parse_error(response)
+
+        tokens = [
+            client.get(f"/slurk/api/tokens/{id}").json for id in response.json["ids"]
+        ]
+        assert [token["room_id"] for token in tokens] == [None, rooms.json["id"]]
+        assert [token["registrations_left"] for token in tokens] == [1, 1]
+
+
+@pytest.mark.depends(
+    on=[
+        f"{PREFIX}::TestRequestOptions::test_request_option[POST]",
+        "tests/api/test_permissions.py::TestPostValid",
+    ]
+)
+class TestBulkPostInvalid:
+    REQUEST_CONTENT = [
+        ({"json": {}}, HTTPStatus.UNPROCESSABLE_ENTITY),
+        ({"json": {"count": 2}}, HTTPStatus.UNPROCESSABLE_ENTITY),
+        (
+            {"json": {"count": 0, "token": {"permissions_id": -1}}},
+            HTTPStatus.UNPROCESSABLE_ENTITY,
+        ),
+        (
+            {"json": {"token": {"permissions_id": -1, "room_id": -42}}},
+            HTTPStatus.UNPROCESSABLE_ENTITY,
+        ),
+        (
+            {
+                "json": {
+                    "token": {"permissions_id": -1},
+                    "tokens": [{"permissions_id": -1}],
+                }
+            },
+            HTTPStatus.UNPROCESSABLE_ENTITY,
+        ),
+        (
+            {"json": {"tokens": [{"permissions_id": -1}, {"permissions_id": -42}]}},
+            HTTPStatus.UNPROCESSABLE_ENTITY,
+        ),
+        ({"json": {"tokens": []}}, HTTPStatus.UNPROCESSABLE_ENTITY),
+    ]
+
+    @pytest.mark.parametrize("content, status", REQUEST_CONTENT)
+    def test_invalid_request(self, client, content, status, permissions):
+        # replace placeholder ids with valid ones
+        specs = content["json"].get("tokens", [])
+        if "token" in content["json"]:
+            specs = specs + [content["json"]["token"]]
+        for spec in specs:
+            if spec.get("permissions_id") == -1:
+                spec["permissions_id"] = permissions.json["id"]
+
+        before = len(client.get("/slurk/api/tokens").json)
+        response = client.post("/slurk/api/tokens/bulk", **content)
+        assert response.status_code == status, parse_error(response)
+        assert len(client.get("/slurk/api/tokens").json) == before
+
+    @pytest.mark.depends(on=["tests/api/test_tokens.py::TestPostValid"])
+    def test_unauthorized_access(self, client, tokens, permissions):
+        response = client.post(
+            "/slurk/api/tokens/bulk",
+            json={"token": {"permissions_id": permissions.json["id"]}},
+            headers={"Authorization": f'Bearer {tokens.json["id"]}'},
+        )
+        assert response.status_code == HTTPStatus.UNAUTHORIZED, parse_error(response)
+
+
 @pytest.mark.depends(
     on=[
         f"{PREFIX}::TestRequestOptions::test_request_option[POST]",
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""Test the socket.io events of the chat."""
+
+from unittest import mock
+
+import pytest
+from slurk.extensions.events import fanout, socketio
+from slurk.extensions.live_typing import live_typing
+from slurk.extensions.rate_limit import broadcast_limiter
+from slurk.extensions.typing_state import typing_state
+
+
+@pytest.fixture
+def connect(app, client, rooms):
+    """Log in a new user of `rooms` and connect it to socket.io"""
+    connected = []
+
+    def connect(**permissions):
+        permissions = client.post("/slurk/api/permissions", json=permissions).json
+        token = client.post(
+            "/slurk/api/tokens",
+            json={"permissions_id": permissions["id"], "room_id": rooms.json["id"]},
+        ).json
+        user = client.post(
+            "/slurk/api/users", json={"name": "Test User", "token_id": token["id"]}
+        ).json
+        sio = socketio.test_client(
+            app,
+            headers={"Authorization": f"Bearer {token['id']}", "user": user["id"]},
+        )
+        assert sio.is_connected()
+        sio.user = user
+        connected.append(sio)
+        return sio
+
+    broadcast_limiter.clear()
+    fanout.clear()
+    typing_state.clear()
+    live_typing.clear()
+    yield connect
+    for sio in connected:
+        if sio.is_connected():
+            sio.disconnect()
+
+
+def broadcast(sio, payload):
+    with mock.patch("slurk.views.chat.events.socketio.emit") as emit:
+        result = sio.emit("client_broadcast", payload, callback=True)
+    return result, emit
+
+
+class TestClientBroadcast:
+    def test_room(self, connect, rooms):
+        sio = connect()
+        payload = {"scope": "room", "room": rooms.json["id"], "type": "timer"}
+
+        result, emit = broadcast(sio, payload)
+        assert result is True
+        emit.assert_called_once_with(
+            "client_broadcast", payload, room=str(rooms.json["id"])
+        )
+        assert fanout.metrics() == {
+            "client_broadcast:timer": {"emits": 1, "recipients": 1}
+        }
+
+    def test_user(self, connect, rooms):
+        sender, receiver = connect(), connect()
+        payload = {
+            "scope": "user",
+            "room": rooms.json["id"],
+            "user": receiver.user["id"],
+        }
+
+        result, emit = broadcast(sender, payload)
+        assert result is True
+        ((event, sent), kwargs) = emit.call_args
+        assert (event, sent) == ("client_broadcast", payload)
+        assert kwargs["room"] not in (None, str(rooms.json["id"]))
+
+    def test_sender_not_in_room(self, client, connect, layouts):
+        sio = connect()
+        other = client.post("/slurk/api/rooms", json={"layout_id": layouts.json["id"]})
+
+        result, emit = broadcast(sio, {"scope": "room", "room": other.json["id"]})
+        assert result == [False, "User not in this room"]
+        emit.assert_not_called()
+
+    @pytest.mark.parametrize(
+        "payload, error",
+        [
+            ({"scope": "room"}, 'Missing argument "room"'),
+            ({"scope": "room", "room": 0}, "Room not found"),
+            ({"scope": "user", "room": -1, "user": 0}, "Receiver not in this room"),
+            ({"scope": "everyone"}, 'Unknown scope "everyone"'),
+        ],
+    )
+    def test_invalid(self, connect, rooms, payload, error):
+        sio = connect()
+        if payload.get("room") == -1:
+            payload["room"] = rooms.json["id"]
+
+        result, emit = broadcast(sio, payload)
+        assert result == [False, error]
+        emit.assert_not_called()
+
+    def test_global_requires_permission(self, connect):
+        result, emit = broadcast(connect(), {"type": "timer"})
+        assert result == [False, "You are not allowed to broadcast"]
+        emit.assert_not_called()
+
+        result, emit = broadcast(connect(broadcast=True), {"type": "timer"})
+        assert result is True
+        emit.assert_called_once_with("client_broadcast", {"type": "timer"}, room=None)
+
+    def test_rate_limit(self, connect, rooms, monkeypatch):
+        monkeypatch.setattr(broadcast_limiter, "rate", 0.001)
+        monkeypatch.setattr(broadcast_limiter, "burst", 2)
+        sender, other = connect(), connect()
+        payload = {"scope": "room", "room": rooms.json["id"]}
+
+        assert broadcast(sender, payload)[0] is True
+        assert broadcast(sender, payload)[0] is True
+        assert broadcast(sender, payload)[0] == [False, "Too many broadcasts"]
+        # every sender has a bucket of its own
+        assert broadcast(other, payload)[0] is True
+
+    def test_fanout_types_are_bounded(self, connect, rooms, monkeypatch):
+        monkeypatch.setattr(broadcast_limiter, "rate", 0)
+        monkeypatch.setattr(fanout, "max_kinds", 3)
+        sender = connect()
+        for kind in ["a", "b", "x" * 100, "c", {"nested": 1}]:
+            payload = {"scope": "room", "room": rooms.json["id"], "type": kind}
+            assert broadcast(sender, payload)[0] is True
+
+        assert fanout.metrics() == {
+            "client_broadcast:a": {"emits": 1, "recipients": 1},
+            "client_broadcast:b": {"emits": 1, "recipients": 1},
+            "client_broadcast:" + "x" * 32: {"emits": 1, "recipients": 1},
+            "client_broadcast:other": {"emits": 2, "recipients": 2},
+        }
+
+
+def typing_updates(emit):
+    return [c.args[1] for c in emit.call_args_list if c.args[0] == "typing_users"]
+
+
+class TestKeypress:
+    def test_transitions(self, connect, rooms):
+        sio = connect(send_message=True)
+        user = {"id": sio.user["id"], "name": sio.user["name"]}
+        room = rooms.json["id"]
+
+        with mock.patch("slurk.extensions.events.socketio.emit") as emit:
+            sio.emit("keypress", {"typing": True})
+            sio.emit("keypress", {"typing": True})
+        assert typing_updates(emit) == [{"room": room, "users": [user]}]
+
+        with mock.patch("slurk.extensions.events.socketio.emit") as emit:
+            sio.emit("text", {"room": room, "message": "Hello"}, callback=True)
+            sio.emit("keypress", {"typing": False})
+        assert typing_updates(emit) == [{"room": room, "users": []}]
+
+    def test_users_of_a_room_are_sent_together(self, connect, rooms):
+        first, second = connect(), connect()
+
+        with mock.patch("slurk.extensions.events.socketio.emit") as emit:
+            first.emit("keypress", {"typing": True})
+            second.emit("keypress", {"typing": True})
+        ids = [[user["id"] for user in u["users"]] for u in typing_updates(emit)]
+        assert ids == [[first.user["id"]], [first.user["id"], second.user["id"]]]
+
+        # a user leaving the room stops typing there
+        with mock.patch("slurk.extensions.events.socketio.emit") as emit:
+            first.disconnect()
+        ids = [[user["id"] for user in u["users"]] for u in typing_updates(emit)]
+        assert ids == [[second.user["id"]]]
+
+
+class TestTypedMessage:
+    def test_frames(self, connect, rooms):
+        sio = connect()
+        user = {"id": sio.user["id"], "name": sio.user["name"]}
+        room = rooms.json["id"]
+
+        with mock.patch("slurk.extensions.events.socketio.emit") as emit:
+            assert sio.emit("typed_message", {"text": "Hi"}, callback=True) is True
+            assert sio.emit("typed_message", {"ops": [[2, 0, "!"]]}, callback=True)
+        assert [c.args[1] for c in emit.call_args_list] == [
+            {"user": user, "seq": 0, "text": "Hi", "room": room},
+            {"user": user, "seq": 1, "ops": [[2, 0, "!"]], "room": room},
+        ]
+
+    def test_invalid(self, connect):
+        sio = connect()
+        result = sio.emit("typed_message", {"ops": [[5, 0, "!"]]}, callback=True)
+        assert result == [False, "Invalid operation [5, 0, '!']"]
+        result = sio.emit("typed_message", {}, callback=True)
+        assert result == [False, 'missing argument: "ops" or "text"']
+        result = sio.emit("typed_message", {"text": 1}, callback=True)
+        assert result == [False, "Invalid text 1"]
+
+
+class TestTelemetry:
+    def test_batch(self, app, connect, rooms):
+        sio = connect(receive_bounding_box=True)
+        room = rooms.json["id"]
+        move = {"type": "move", "coordinates": {"x": 0.5, "y": 0.5}, "element_id": "a"}
+        samples = [
+            {"event": "keystroke", "time": 1, "data": {"key": "a"}},
+            {"event": "mouse", "time": 2, "data": dict(move, type="click")},
+            {"event": "mouse", "time": 3, "data": move},
+            {"event": "mouse", "time": 4, "data": move},
+            {"event": "bounding_box", "time": 5, "data": {"type": "remove"}},
+        ]
+
+        with mock.patch("slurk.views.chat.events.socketio.emit") as emit:
+            result = sio.emit(
+                "telemetry", {"room": room, "samples": samples}, callback=True
+            )
+        assert result is True
+        # the click, the bounding box and only the last of the movements
+        events = [(c.args[0], c.args[1]["type"]) for c in emit.call_args_list]
+        assert events == [
+            ("mouse", "click"),
+            ("bounding_box", "remove"),
+            ("mouse", "move"),
+        ]
+
+        with app.app_context():
+            from slurk.extensions.log_writer import log_writer
+            from slurk.models import Log, Telemetry
+
+            log_writer.flush()
+            samples = (
+                app.session.query(Telemetry)
+                .filter_by(user_id=sio.user["id"])
+                .order_by(Telemetry.id)
+                .all()
+            )
+            assert [s.client_time for s in samples] == [1, 2, 3, 4]
+            assert [s.type for s in samples] == [None, "click", "move", "move"]
+            assert samples[0].key == "a"
+            assert samples[1].x == samples[1].y == 0.5
+
+            boxes = (
+                app.session.query(Log)
+                .filter_by(user_id=sio.user["id"], event="bounding_box")
+                .all()
+            )
+            assert [log.data["client_time"] for log in boxes] == [5]
+
+    @pytest.mark.parametrize(
+        "payload, error",
+        [
+            ({"samples": []}, 'missing argument: "room"'),
+            ({"room": 0, "samples": []}, "Room not found"),
+            ({"room": -1}, 'missing argument: "samples"'),
+            ({"room": -1, "samples": [{"event": "text"}]}, "Invalid sample"),
+            (
+                {"room": -1, "samples": [{"event": "bounding_box", "data": {}}]},
+                "Missing type",
+            ),
+        ],
+    )
+    def test_invalid(self, connect, rooms, payload, error):
+        sio = connect()
+        if payload.get("room") == -1:
+            payload["room"] = rooms.json["id"]
+
+        with mock.patch("slurk.views.chat.events.socketio.emit") as emit:
+            result = sio.emit("telemetry", payload, callback=True)
+        assert result[0] is False
+        assert result[1].startswith(error)
+        emit.assert_not_called()
+
+    def test_too_many_samples(self, app, connect, rooms, monkeypatch):
+        monkeypatch.setitem(app.config, "TELEMETRY_MAX_SAMPLES", 2)
+        sio = connect()
+        sample = {"event": "keystroke", "time": 0, "data": {"key": "a"}}
+        payload = {"room": rooms.json["id"], "samples": [sample] * 3}
+
+        result = sio.emit("telemetry", payload, callback=True)
+        assert result == [False, "Too many samples"]
+
+
+class TestText:
+    @pytest.mark.parametrize("receiver_id", ["abc", None, [1], 2**31])
+    def test_unknown_receiver(self, connect, rooms, receiver_id):
+        sio = connect(send_message=True, send_privately=True)
+        payload = {
+            "room": rooms.json["id"],
+            "message": "Hi",
+            "receiver_id": receiver_id,
+        }
+
+        result = sio.emit("text", payload, callback=True)
+        assert result == [False, f'User "{receiver_id}" does not exist']
@@ -96,6 +96,9 @@ def app(database, openvidu_impl, secret):
     test_config = dict(
         TESTING=True,
         SECRET_KEY=secret,
+        # send typing updates right away instead of from a background task
+        TYPING_INTERVAL=0,
+        LIVE_TYPING_INTERVAL=0,
     )
 
     if not isinstance(openvidu_impl, str):
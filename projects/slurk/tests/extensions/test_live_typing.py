@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""Test the live-typing frames sent to the rooms."""
+
+from unittest import mock
+
+import pytest
+from slurk.extensions.live_typing import LiveTyping, apply_ops, diff
+
+ALICE = {"id": 1, "name": "Alice"}
+
+
+@pytest.fixture
+def emit():
+    with mock.patch("slurk.extensions.events.socketio.emit") as emit:
+        yield emit
+
+
+def frames(emit):
+    return [c.args[1] for c in emit.call_args_list]
+
+
+@pytest.mark.parametrize(
+    "old, new",
+    [
+        ("", "abc"),
+        ("abc", "abXc"),
+        ("hello", "help"),
+        ("aaa", "aaaa"),
+        ("\U0001f600ab", "\U0001f600axb"),
+    ],
+)
+def test_diff(old, new):
+    assert apply_ops(old, [diff(old, new)]) == new
+
+
+def test_positions_count_code_points():
+    # an emoji is one position, as in `Array.from` of the client
+    assert diff("\U0001f600", "\U0001f600a") == [1, 0, "a"]
+    assert apply_ops("\U0001f600ab", [[2, 0, "x"]]) == "\U0001f600axb"
+    with pytest.raises(ValueError):
+        apply_ops("\U0001f600ab", [[4, 0, "x"]])
+
+
+@pytest.mark.parametrize("op", [[4, 0, "x"], [0, 4, ""], [0, 0], "abc", [0, 0, 1]])
+def test_invalid_ops(op):
+    with pytest.raises(ValueError):
+        apply_ops("abc", [op])
+
+
+def test_frames(emit):
+    typing = LiveTyping(interval=0, keyframe=3)
+    typing.update(ALICE, [7, 8], text="He")
+    typing.update(ALICE, [7], ops=[[2, 0, "llo"]])
+    typing.update(ALICE, [7], ops=[[5, 0, "!"]])
+    typing.update(ALICE, [7], ops=[[5, 1, "?"]])
+
+    assert frames(emit) == [
+        {"user": ALICE, "seq": 0, "text": "He", "room": 7},
+        {"user": ALICE, "seq": 0, "text": "He", "room": 8},
+        {"user": ALICE, "seq": 1, "ops": [[2, 0, "llo"]], "room": 7},
+        {"user": ALICE, "seq": 2, "ops": [[5, 0, "!"]], "room": 7},
+        # every third frame holds the full text
+        {"user": ALICE, "seq": 3, "text": "Hello?", "room": 7},
+    ]
+
+
+def test_changes_are_buffered(emit, monkeypatch):
+    typing = LiveTyping(interval=1)
+    # pretend the background task is running, it would flush after the interval
+    monkeypatch.setattr(typing, "_running", True)
+
+    typing.update(ALICE, [7], text="H")
+    assert typing.flush() == 1
+    emit.reset_mock()
+    for position, char in enumerate("ello", start=1):
+        typing.update(ALICE, [7], ops=[[position, 0, char]])
+    emit.assert_not_called()
+
+    # one frame for all changes since the last one
+    assert typing.flush() == 1
+    assert frames(emit) == [
+        {"user": ALICE, "seq": 1, "ops": [[1, 0, "ello"]], "room": 7}
+    ]
+    assert typing.flush() == 0
+
+    # a sent message clears the preview, the next one starts with the full text
+    typing.update(ALICE, [7], text="")
+    typing.flush()
+    typing.update(ALICE, [7], text="B")
+    typing.flush()
+    assert frames(emit)[1:] == [
+        {"user": ALICE, "seq": 2, "ops": [[0, 5, ""]], "room": 7},
+        {"user": ALICE, "seq": 0, "text": "B", "room": 7},
+    ]
+
+
+def test_invalid_text_is_rejected(emit):
+    typing = LiveTyping(interval=0)
+    with pytest.raises(ValueError):
+        typing.update(ALICE, [7], text=1)
+    with pytest.raises(ValueError):
+        typing.update(ALICE, [7], ops=5)
+    typing.update(ALICE, [7], text="Hi")
+    assert frames(emit) == [{"user": ALICE, "seq": 0, "text": "Hi", "room": 7}]
+
+
+def test_broken_preview_does_not_block_others(emit, monkeypatch):
+    typing = LiveTyping(interval=1)
+    monkeypatch.setattr(typing, "_running", True)
+    typing.update(ALICE, [7], text="Hi")
+    typing.update({"id": 2, "name": "Bob"}, [7], text="Yo")
+    # a text of the wrong type, as stored before updates were checked
+    typing._previews[ALICE["id"]].sent = 1
+    typing._previews[ALICE["id"]].seq = 1
+
+    assert typing.flush() == 1
+    assert typing.metrics()["previews"] == 1
+    assert not typing._dirty
+
+
+def test_leaving_drops_the_preview(emit, monkeypatch):
+    typing = LiveTyping(interval=1)
+    monkeypatch.setattr(typing, "_running", True)
+    typing.update(ALICE, [7, 8], text="Hi")
+
+    typing.leave(ALICE["id"], 7)
+    assert typing.flush() == 1
+    assert {c.args[1]["room"] for c in emit.call_args_list} == {8}
+
+    typing.leave(ALICE["id"], 8)
+    assert typing.metrics()["previews"] == 0
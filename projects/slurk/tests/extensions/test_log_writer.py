@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Test the write-behind buffer for log entries."""
+
+import pytest
+from slurk.extensions.log_writer import LogWriter
+from slurk.models import Log
+
+
+def count(database, event):
+    with database.create_session() as session:
+        return session.query(Log).filter_by(event=event).count()
+
+
+@pytest.fixture
+def writer(database):
+    return LogWriter(
+        database, enabled=True, async_events={"buffered"}, buffer_size=4, flush_size=2
+    )
+
+
+def test_only_async_events_are_buffered(writer):
+    assert writer.is_async("buffered")
+    assert not writer.is_async("text_message")
+    assert not LogWriter(async_events={"buffered"}).is_async("buffered")
+
+
+def test_flush_bulk_inserts(database, writer):
+    for i in range(3):
+        writer.add(dict(event="buffered", data={"i": i}))
+    assert writer.depth == 3
+    assert count(database, "buffered") == 0
+
+    assert writer.flush() == 3
+    assert writer.depth == 0
+    assert count(database, "buffered") == 3
+    assert writer.flush() == 0
+
+    metrics = writer.metrics()
+    assert metrics["enqueued"] == metrics["written"] == 3
+    assert metrics["flushes"] == 1
+    assert metrics["max_depth"] == 3
+    assert metrics["capacity"] == 4
+
+
+def test_full_buffer_is_flushed_by_producer(database, writer):
+    before = count(database, "buffered")
+    for i in range(5):
+        writer.add(dict(event="buffered", data={"i": i}))
+
+    assert writer.stats["overflows"] == 1
+    assert count(database, "buffered") == before + 4
+    writer.close()
+    assert count(database, "buffered") == before + 5
+
+
+def test_failed_flush_is_counted(writer):
+    writer.add(dict(event="buffered", data={}, user_id=-42))
+    assert writer.flush() == 0
+    assert writer.stats["errors"] == 1
+    assert writer.stats["lost"] == 1
+
+
+def test_log_add_uses_writer(app, database, writer, monkeypatch):
+    import slurk.extensions.log_writer
+
+    monkeypatch.setattr(slurk.extensions.log_writer, "log_writer", writer)
+    with app.app_context():
+        log = Log.add("buffered", data={"x": 1})
+        assert log.id is None
+        assert writer.depth == 1
+
+        Log.add("not_buffered")
+        assert writer.depth == 1
+        assert count(database, "not_buffered") == 1
+
+
+def test_rows_of_other_models(database, writer, rooms):
+    from slurk.models import Telemetry
+
+    row = Telemetry.row("keystroke", None, rooms.json["id"], {"key": "b", "ctrl": 1})
+    writer.add(row, Telemetry)
+    writer.add(dict(event="buffered", data={}))
+    assert writer.flush() == 2
+
+    with database.create_session() as session:
+        sample = session.query(Telemetry).filter_by(key="b").one()
+        assert sample.modifiers == 2
+
+
+def test_failing_rows_do_not_drop_the_batch(database, writer):
+    writer.add(dict(event="buffered", data={"i": 0}))
+    writer.add(dict(event="buffered", data={}, user_id=-42))
+    writer.add(dict(event="buffered", data={"i": 2}))
+
+    before = count(database, "buffered")
+    assert writer.flush() == 2
+    assert count(database, "buffered") == before + 2
+    assert writer.stats["lost"] == 1
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Test the message queue between the socket.io servers of several workers."""
+
+import json
+import queue
+import time
+import uuid
+from http import HTTPStatus
+
+import pytest
+import socketio
+from slurk.extensions import message_queue
+from slurk.extensions.message_queue import LocalManager, client_manager
+
+
+def worker(channel):
+    """A socket.io server recording the packets it sends to its clients"""
+    server = socketio.Server(
+        async_mode="threading", client_manager=LocalManager(channel=channel)
+    )
+    server.sent = queue.Queue()
+    server._send_eio_packet = lambda eio_sid, pkt: server.sent.put((eio_sid, pkt))
+    server.manager_initialized = True
+    server.manager.initialize()
+    return server
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def channel():
+    channel = uuid.uuid4().hex
+    yield channel
+    message_queue._local_queues.pop(channel, None)
+
+
+def test_emit_reaches_other_worker(channel):
+    first, second = worker(channel), worker(channel)
+    sid = second.manager.connect("eio-1", "/")
+
+    # the client is connected to the second worker, the first relays the join
+    first.manager.enter_room(sid, "/", "7")
+    wait_for(lambda: sid in second.manager.rooms["/"].get("7", {}))
+
+    first.emit("status", {"type": "join"}, room="7")
+    eio_sid, pkt = second.sent.get(timeout=2)
+    assert eio_sid == "eio-1"
+    assert '"status"' in pkt.data
+
+    first.manager.leave_room(sid, "/", "7")
+    wait_for(lambda: sid not in second.manager.rooms["/"].get("7", {}))
+
+
+def test_notify_other_workers(channel):
+    calls = queue.Queue()
+    message_queue.subscribe("test", lambda *args: calls.put(args))
+    first = worker(channel)
+    worker(channel)
+
+    first.manager.notify("test", 1, "room")
+    assert calls.get(timeout=2) == (1, "room")
+    # the notifying worker does not handle its own notification
+    with pytest.raises(queue.Empty):
+        calls.get(timeout=0.2)
+
+
+def test_commit_notifies_room_cache(client, rooms, channel, monkeypatch):
+    manager = worker(channel).manager
+    monkeypatch.setattr(message_queue, "_manager", manager)
+    listener = queue.Queue()
+    message_queue._local_queues[channel].append(listener)
+
+    response = client.patch(
+        f'/slurk/api/rooms/{rooms.json["id"]}',
+        json={"read_only": True},
+        headers={"If-Match": rooms.headers["ETag"]},
+    )
+    assert response.status_code == HTTPStatus.OK, response.json
+
+    messages = [json.loads(message) for message in listener.queue]
+    notified = [m["args"][0] for m in messages if m["topic"] == "room_cache"]
+    assert [["room", rooms.json["id"]]] in notified
+
+
+def test_client_manager():
+    assert type(client_manager(None)) is socketio.Manager
+    assert isinstance(client_manager("local://", "test"), LocalManager)
+    with pytest.raises(ValueError):
+        client_manager("amqp://guest@localhost//")
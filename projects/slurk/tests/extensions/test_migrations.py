@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Test the schema migrations applied by `Database.init`."""
+
+import pytest
+from slurk.models.migrations import MIGRATIONS, migrate, schema_version
+from sqlalchemy import create_engine, inspect, select
+
+
+@pytest.fixture
+def engine():
+    return create_engine("sqlite:///:memory:")
+
+
+def versions(engine):
+    with engine.connect() as connection:
+        return [row.version for row in connection.execute(select(schema_version))]
+
+
+def log_indexes(engine):
+    return {index["name"] for index in inspect(engine).get_indexes("Log")}
+
+
+def test_new_database_is_current(engine):
+    assert migrate(engine) == 0
+    assert versions(engine) == [len(MIGRATIONS)]
+    assert "ix_Log_room_id_date_created" in log_indexes(engine)
+
+
+def test_existing_database_is_migrated(engine):
+    migrate(engine)
+    # roll back to a database created before migrations were introduced
+    with engine.begin() as connection:
+        for name in log_indexes(engine):
+            connection.exec_driver_sql(f'DROP INDEX "{name}"')
+        schema_version.drop(connection)
+
+    assert migrate(engine) == len(MIGRATIONS)
+    assert versions(engine) == list(range(1, len(MIGRATIONS) + 1))
+    assert "ix_Log_room_id_date_created" in log_indexes(engine)
+
+    assert migrate(engine) == 0
+
+
+def test_room_close_time_is_added(engine):
+    migrate(engine)
+    # roll back to a database from before rooms had a close time
+    with engine.begin() as connection:
+        connection.exec_driver_sql('ALTER TABLE "Room" DROP COLUMN "close_at"')
+        connection.execute(schema_version.delete())
+        connection.execute(
+            schema_version.insert().values(version=1, description="Indexes")
+        )
+
+    assert migrate(engine) == len(MIGRATIONS) - 1
+    columns = {column["name"] for column in inspect(engine).get_columns("Room")}
+    assert "close_at" in columns
+
+
+def test_new_tables_are_created_with_their_indexes(engine):
+    migrate(engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql('DROP TABLE "Telemetry"')
+
+    # new tables need no migration
+    assert migrate(engine) == 0
+    indexes = {index["name"] for index in inspect(engine).get_indexes("Telemetry")}
+    assert "ix_Telemetry_room_id_time" in indexes
+
+
+def test_race_with_another_worker_is_retried(engine, monkeypatch):
+    import slurk.models.migrations as migrations
+    from sqlalchemy.exc import IntegrityError
+
+    migrate(engine)
+    with engine.begin() as connection:
+        connection.execute(schema_version.delete())
+        connection.execute(
+            schema_version.insert().values(version=1, description="Indexes")
+        )
+
+    run = migrations._migrate
+    calls = []
+
+    def racing(engine):
+        calls.append(engine)
+        if len(calls) == 1:
+            # another worker applies the migrations first
+            run(engine)
+            raise IntegrityError("INSERT", {}, Exception("UNIQUE constraint failed"))
+        return run(engine)
+
+    monkeypatch.setattr(migrations, "_migrate", racing)
+    monkeypatch.setattr(migrations.time, "sleep", lambda seconds: None)
+    assert migrate(engine) == 0
+    assert len(calls) == 2
+    assert versions(engine) == list(range(1, len(MIGRATIONS) + 1))
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""Test the per sender rate limit of socket.io events."""
+
+from slurk.extensions.rate_limit import RateLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_burst_and_refill():
+    clock = Clock()
+    limiter = RateLimiter(rate=2.0, burst=3, clock=clock)
+
+    assert [limiter.allow("a") for _ in range(4)] == [True, True, True, False]
+    clock.now += 0.5
+    assert limiter.allow("a")
+    assert not limiter.allow("a")
+    # the bucket never holds more than the burst
+    clock.now += 60
+    assert [limiter.allow("a") for _ in range(4)] == [True, True, True, False]
+
+    assert limiter.metrics()["allowed"] == 7
+    assert limiter.metrics()["limited"] == 3
+
+
+def test_disabled():
+    limiter = RateLimiter(rate=0, burst=1, clock=Clock())
+    assert all(limiter.allow("a") for _ in range(100))
+
+
+def test_size_bound():
+    limiter = RateLimiter(rate=1.0, burst=1, size=2, clock=Clock())
+    assert limiter.allow("a")
+    assert limiter.allow("b")
+    assert limiter.allow("c")
+    assert limiter.metrics()["senders"] == 2
+    # the evicted bucket of `a` starts full again
+    assert limiter.allow("a")
+    assert not limiter.allow("c")
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""Test the cache of room memberships and permissions."""
+
+from http import HTTPStatus
+
+from slurk.extensions.room_cache import room_cache
+
+
+def test_room_is_cached(app, client, users, rooms):
+    with app.app_context():
+        room = room_cache.room(rooms.json["id"])
+        assert room.id == rooms.json["id"]
+        assert users.json["id"] in room.members
+        assert room.members[users.json["id"]].permissions.send_message
+
+        hits = room_cache.stats["hits"]
+        assert room_cache.room(rooms.json["id"]) is room
+        assert room_cache.stats["hits"] == hits + 1
+
+        assert room_cache.room(2**31) is None
+        assert room_cache.room("not a room") is None
+
+
+def test_user_is_cached(app, client, users, rooms):
+    with app.app_context():
+        user = room_cache.user(users.json["id"])
+        assert user.name == "Test User"
+        assert user.room_ids == (rooms.json["id"],)
+        assert user.permissions.send_message
+        assert not user.permissions.broadcast
+
+        assert room_cache.user(None) is None
+        assert room_cache.user("not a user") is None
+        assert room_cache.user([1]) is None
+
+
+def test_join_invalidates_room(app, client, users, tokens, layouts):
+    other = client.post("/slurk/api/rooms", json={"layout_id": layouts.json["id"]})
+    with app.app_context():
+        assert room_cache.room(other.json["id"]).members == {}
+        room_cache.user(users.json["id"])
+
+    response = client.post(
+        f'/slurk/api/users/{users.json["id"]}/rooms/{other.json["id"]}',
+        headers={"If-Match": users.headers["ETag"]},
+    )
+    assert response.status_code == HTTPStatus.CREATED, response.json
+
+    with app.app_context():
+        assert users.json["id"] in room_cache.room(other.json["id"]).members
+        assert other.json["id"] in room_cache.user(users.json["id"]).room_ids
+
+
+def test_login_invalidates_room(app, client, tokens, rooms):
+    with app.app_context():
+        assert room_cache.room(rooms.json["id"]).members == {}
+
+    response = client.get(
+        "/login/", query_string={"token": tokens.json["id"], "name": "Login User"}
+    )
+    assert response.status_code == HTTPStatus.FOUND
+
+    with app.app_context():
+        members = room_cache.room(rooms.json["id"]).members.values()
+        assert [member.name for member in members] == ["Login User"]
+
+
+def test_permission_change_invalidates_everything(
+    app, client, users, rooms, permissions
+):
+    with app.app_context():
+        assert not room_cache.user(users.json["id"]).permissions.send_image
+
+    response = client.patch(
+        f'/slurk/api/permissions/{permissions.json["id"]}',
+        json={"send_image": True},
+        headers={"If-Match": permissions.headers["ETag"]},
+    )
+    assert response.status_code == HTTPStatus.OK, response.json
+
+    with app.app_context():
+        assert room_cache.user(users.json["id"]).permissions.send_image
+        member = room_cache.room(rooms.json["id"]).members[users.json["id"]]
+        assert member.permissions.send_image
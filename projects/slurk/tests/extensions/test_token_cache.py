@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Test the cache of the REST API token check."""
+
+from http import HTTPStatus
+from types import SimpleNamespace
+
+from slurk.extensions.token_cache import TokenCache, token_cache
+
+
+def token(api, permissions_id=1):
+    return SimpleNamespace(
+        permissions=SimpleNamespace(api=api), permissions_id=permissions_id
+    )
+
+
+def test_lookups_are_cached():
+    cache = TokenCache()
+    loaded = []
+
+    def load(token_id):
+        loaded.append(token_id)
+        return token(True) if token_id == "known" else None
+
+    assert cache.get("known", load)
+    assert cache.get("known", load)
+    assert not cache.get("unknown", load)
+    assert not cache.get("unknown", load)
+    assert loaded == ["known", "unknown"]
+    assert cache.stats["hits"] == cache.stats["misses"] == 2
+
+
+def test_least_recently_used_is_evicted():
+    cache = TokenCache(size=2)
+    cache.get("a", lambda _: token(True))
+    cache.get("b", lambda _: token(True))
+    cache.get("a", lambda _: token(False))
+    cache.get("c", lambda _: token(True))
+
+    assert cache.stats["evictions"] == 1
+    assert cache.get("a", lambda _: token(False))
+    assert not cache.get("b", lambda _: token(False))
+
+
+def test_expired_entries_are_reloaded():
+    cache = TokenCache(ttl=0)
+    assert cache.get("a", lambda _: token(True))
+    assert not cache.get("a", lambda _: token(False))
+
+
+def test_invalidate_permissions():
+    cache = TokenCache()
+    cache.get("a", lambda _: token(True, permissions_id=1))
+    cache.get("b", lambda _: token(True, permissions_id=2))
+
+    cache.invalidate_permissions(1)
+    assert not cache.get("a", lambda _: None)
+    assert cache.get("b", lambda _: None)
+
+
+def test_rest_changes_invalidate(client, tokens, permissions):
+    headers = {"Authorization": f'Bearer {tokens.json["id"]}'}
+    assert client.get("/slurk/api/stats", headers=headers).status_code == (
+        HTTPStatus.UNAUTHORIZED
+    )
+
+    response = client.patch(
+        f'/slurk/api/permissions/{permissions.json["id"]}',
+        json={"api": True},
+        headers={"If-Match": permissions.headers["ETag"]},
+    )
+    assert response.status_code == HTTPStatus.OK, response.json
+    response = client.get("/slurk/api/stats", headers=headers)
+    assert response.status_code == HTTPStatus.OK
+    assert response.json["token_cache"] == token_cache.metrics()
+
+    response = client.delete(
+        f'/slurk/api/tokens/{tokens.json["id"]}',
+        headers={"If-Match": tokens.headers["ETag"]},
+    )
+    assert response.status_code == HTTPStatus.NO_CONTENT, response.json
+    assert client.get("/slurk/api/stats", headers=headers).status_code == (
+        HTTPStatus.UNAUTHORIZED
+    )
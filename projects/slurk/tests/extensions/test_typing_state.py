@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Test the typing state of the users per room."""
+
+from unittest import mock
+
+import pytest
+from slurk.extensions.typing_state import TypingState
+
+
+@pytest.fixture
+def emit():
+    with mock.patch("slurk.extensions.events.socketio.emit") as emit:
+        yield emit
+
+
+def updates(emit):
+    return [(c.args[1], c.kwargs["room"]) for c in emit.call_args_list]
+
+
+def test_duplicate_transitions_are_dropped(emit):
+    state = TypingState(interval=0)
+    assert state.update(1, "Alice", [7, 8], True) == [7, 8]
+    assert state.update(1, "Alice", [7, 8], True) == []
+    assert state.update(1, "Alice", [8], False) == [8]
+
+    assert sorted(updates(emit)[:2], key=lambda u: u[1]) == [
+        ({"room": 7, "users": [{"id": 1, "name": "Alice"}]}, "7"),
+        ({"room": 8, "users": [{"id": 1, "name": "Alice"}]}, "8"),
+    ]
+    assert updates(emit)[2:] == [({"room": 8, "users": []}, "8")]
+    metrics = state.metrics()
+    assert metrics["transitions"] == 3
+    assert metrics["duplicates"] == 2
+    assert metrics["typing"] == 1
+
+
+def test_changes_are_coalesced(emit, monkeypatch):
+    state = TypingState(interval=1)
+    # pretend the background task is running, it would flush after the interval
+    monkeypatch.setattr(state, "_running", True)
+
+    state.update(1, "Alice", [7], True)
+    state.update(2, "Bob", [7], True)
+    state.update(1, "Alice", [7], False)
+    emit.assert_not_called()
+
+    assert state.flush() == 1
+    assert updates(emit) == [({"room": 7, "users": [{"id": 2, "name": "Bob"}]}, "7")]
+    assert state.flush() == 0
+
+
+def test_changes_of_other_workers(emit):
+    state = TypingState(interval=0)
+    state._apply(2, "Bob", [7], True)
+    emit.assert_not_called()
+
+    # the update of this worker includes the user typing on the other one
+    state.update(1, "Alice", [7], True)
+    assert updates(emit) == [
+        (
+            {
+                "room": 7,
+                "users": [{"id": 2, "name": "Bob"}, {"id": 1, "name": "Alice"}],
+            },
+            "7",
+        )
+    ]
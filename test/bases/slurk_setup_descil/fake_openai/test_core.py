@@ -0,0 +1,5 @@
+from slurk_setup_descil.fake_openai_api import core
+
+
+def test_sample():
+    assert core is not None
@@ -0,0 +1,11 @@
+from slurk_setup_descil.loadtest_cli import core
+
+
+def test_sample():
+    assert core is not None
+
+
+def test_defaults():
+    args = core.parse_args(["--experiments", "3"])
+    assert args.experiments == 3
+    assert args.setup_url == "http://localhost:8789"
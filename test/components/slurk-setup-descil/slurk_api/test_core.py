@@ -1,5 +1,62 @@
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
 from slurk_setup_descil.slurk_api import core
 
 
 def test_sample():
     assert core is not None
+
+
+def _run_with_server(check):
+    async def handler(request):
+        return web.json_response(
+            {"id": 1, "authorization": request.headers["Authorization"]}
+        )
+
+    async def inner():
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", handler)
+        server = TestServer(app)
+        await server.start_server()
+        try:
+            return await check(str(server.make_url("")).rstrip("/"))
+        finally:
+            await core.close_client()
+            await server.close()
+
+    return asyncio.run(inner())
+
+
+def test_helpers_share_pooled_session():
+    async def check(uri):
+        client = core.get_client()
+        async with core.get("token", uri + "/a") as r:
+            assert (await r.json())["authorization"] == "Bearer token"
+        session = client.session
+        assert await core.create_layout(uri, "token", {}) == 1
+        async with core.delete("token", uri + "/a", etag="x") as r:
+            assert r.ok
+        assert core.get_client() is client
+        assert client.session is session
+        return client
+
+    client = _run_with_server(check)
+    assert client.closed
+
+
+def test_client_per_event_loop():
+    async def inner():
+        return core.get_client()
+
+    assert asyncio.run(inner()) is not asyncio.run(inner())
+
+
+def test_client_settings_from_environment(monkeypatch):
+    monkeypatch.setenv("SLURK_API_CONNECTION_LIMIT", "7")
+    monkeypatch.setenv("SLURK_API_TIMEOUT", "2.5")
+    client = core.SlurkClient(limit_per_host=3)
+    assert client.limit == 7
+    assert client.limit_per_host == 3
+    assert client.timeout == 2.5
@@ -1,5 +1,541 @@
-from slurk_setup_descil.chatbot import core
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from slurk_setup_descil.chatbot import (
+    Conversation,
+    PromptCache,
+    ReplyScheduler,
+    completion_cache,
+    context,
+    core,
+    gating,
+    gpt_bot,
+    interaction,
+    prompt_cache,
+)
+from slurk_setup_descil.chatbot import scheduler as reply_scheduler
+from slurk_setup_descil.slurk_api import get_client
 
 
 def test_sample():
     assert core is not None
+
+
+class FakeOpenAI:
+    """Chat completions endpoint answering "yes" and streaming `chunks`."""
+
+    def __init__(self, chunks, delay=0.0, forever=False, answer="yes"):
+        self.chunks = chunks
+        self.answer = answer
+        self.delay = delay
+        self.forever = forever
+        self.disconnected = asyncio.Event()
+
+    async def completions(self, request):
+        body = await request.json()
+        if not body.get("stream"):
+            return web.json_response(
+                {
+                    "id": "completion",
+                    "object": "chat.completion",
+                    "created": 0,
+                    "model": body["model"],
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": self.answer},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                }
+            )
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        try:
+            chunks = list(self.chunks)
+            while chunks or self.forever:
+                content = chunks.pop(0) if chunks else "more "
+                chunk = {
+                    "id": "completion",
+                    "object": "chat.completion.chunk",
+                    "created": 0,
+                    "model": body["model"],
+                    "choices": [
+                        {
+                            "index": 0,
+                            "delta": {"content": content},
+                            "finish_reason": None,
+                        }
+                    ],
+                }
+                await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                await asyncio.sleep(self.delay)
+            await response.write(b"data: [DONE]\n\n")
+        except (ConnectionError, asyncio.CancelledError):
+            self.disconnected.set()
+            raise
+        return response
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.completions)
+        return app
+
+
+def use_fake_openai(monkeypatch, server):
+    monkeypatch.setenv("AI_PROVIDER", "")
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("OPENAI_BASE_URL", str(server.make_url("/v1")))
+    monkeypatch.setattr(gpt_bot, "client", None)
+
+
+def test_stream_strips_sender(monkeypatch):
+    openai = FakeOpenAI(["As", "h: ", "Hello", " there"])
+
+    async def inner():
+        async with TestServer(openai.app()) as server:
+            use_fake_openai(monkeypatch, server)
+            bot = gpt_bot.gpt_bot(1)
+            past = [{"sender": "Alice", "text": "Hi"}]
+            return [chunk async for chunk in bot.stream(past, 1)]
+
+    assert "".join(asyncio.run(inner())) == "Hello there"
+
+
+def test_no_answer_yields_nothing(monkeypatch):
+    openai = FakeOpenAI(["Hello"], answer="No.")
+
+    async def inner():
+        async with TestServer(openai.app()) as server:
+            use_fake_openai(monkeypatch, server)
+            bot = gpt_bot.gpt_bot(1)
+            past = [{"sender": "Alice", "text": "lol"}]
+            return await bot(past, 1), [chunk async for chunk in bot.stream(past, 1)]
+
+    assert asyncio.run(inner()) == (None, [])
+
+
+def completion(content):
+    async def complete(messages, **kwargs):
+        complete.calls.append((messages, kwargs))
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    complete.calls = []
+    return complete
+
+
+def test_combined_gate_answers_in_one_call():
+    complete = completion('{"answer": true, "message": "Ash: sure, why not"}')
+    messages = [{"role": "user", "content": "Alice: Ash, coming along?"}]
+
+    decision = asyncio.run(gating.CombinedGate().decide(complete, messages))
+    assert decision == gating.Decision(True, "sure, why not")
+    [(sent, kwargs)] = complete.calls
+    assert sent[:-1] == messages
+    assert kwargs["response_format"] == {"type": "json_object"}
+
+
+def test_combined_gate_skips_invalid_output():
+    for content in ('{"answer": false}', "yes", "[]"):
+        decision = asyncio.run(gating.CombinedGate().decide(completion(content), []))
+        assert decision == gating.SKIP
+
+
+def test_heuristic_gate():
+    gate = gating.HeuristicGate()
+    complete = completion("unused")
+
+    def decide(*contents):
+        messages = [{"role": "system", "content": "prompt"}]
+        for content in contents:
+            role = "assistant" if content.startswith("Ash:") else "user"
+            messages.append({"role": role, "content": content})
+        return asyncio.run(gate.decide(complete, messages)).answer
+
+    assert decide("Alice: what about the map?")
+    assert decide("Alice: ash")
+    assert decide("Alice: the water is the most important item")
+    assert not decide("Alice: ok lol")
+    assert not decide("Alice: what about the map?", "Ash: dunno")
+    assert not decide()
+    assert complete.calls == []
+
+
+def test_get_gate(monkeypatch):
+    monkeypatch.setenv("AI_GATING", "")
+    assert isinstance(gating.get_gate(), gating.TwoCallGate)
+    monkeypatch.setenv("AI_GATING", "Combined")
+    assert isinstance(gating.get_gate(), gating.CombinedGate)
+
+
+def test_replay_serves_recorded_completions(monkeypatch, tmp_path):
+    openai = FakeOpenAI(["Ash: ", "Hello", " there"])
+    past = [{"sender": "Alice", "text": "Hi"}]
+    monkeypatch.setenv("AI_COMPLETION_CACHE_PATH", str(tmp_path / "cache.db"))
+
+    def use_mode(mode):
+        monkeypatch.setenv("AI_COMPLETION_CACHE", mode)
+        monkeypatch.setattr(completion_cache, "_cache", None)
+        monkeypatch.setattr(gpt_bot, "client", None)
+
+    async def record():
+        use_mode("record")
+        async with TestServer(openai.app()) as server:
+            use_fake_openai(monkeypatch, server)
+            bot = gpt_bot.gpt_bot(1)
+            return [chunk async for chunk in bot.stream(past, 1)]
+
+    async def replay(messages):
+        use_mode("replay")
+        bot = gpt_bot.gpt_bot(1)
+        return [chunk async for chunk in bot.stream(messages, 1)]
+
+    assert "".join(asyncio.run(record())) == "Hello there"
+    assert completion_cache.completion_metrics()["recorded"] == 2
+
+    monkeypatch.setenv("OPENAI_BASE_URL", "http://127.0.0.1:9/v1")
+    assert "".join(asyncio.run(replay(past))) == "Hello there"
+    metrics = completion_cache.completion_metrics()
+    assert metrics["hits"] == 2
+    assert metrics["replay_fallbacks"] == 0
+
+    other = [{"sender": "Bob", "text": "Something never recorded"}]
+    assert "".join(asyncio.run(replay(other))) == "Hello there"
+    # the gating question was recorded, only the reply falls back
+    assert completion_cache.completion_metrics()["replay_fallbacks"] == 1
+
+
+def test_completion_store_evicts_least_recently_used(tmp_path):
+    store = completion_cache.CompletionStore(tmp_path / "cache.db", size=2)
+    for key in "abc":
+        store.put(key, "params", completion_cache.Recording(key, 0.0, 0.0))
+        if key == "b":
+            store.get("a")
+
+    assert len(store) == 2
+    assert store.get("b") is None
+    assert store.get("a").response == "a"
+    store.close()
+
+
+def test_concurrent_requests_open_one_store(monkeypatch, tmp_path):
+    opened = []
+
+    class SlowStore:
+        def __init__(self, path):
+            time.sleep(0.05)
+            opened.append(path)
+
+    monkeypatch.setattr(completion_cache, "CompletionStore", SlowStore)
+    cache = completion_cache.CompletionCache("cache", tmp_path / "cache.db")
+
+    async def inner():
+        return await asyncio.gather(
+            *(asyncio.to_thread(lambda: cache.store) for _ in range(4))
+        )
+
+    stores = asyncio.run(inner())
+    assert len(opened) == 1
+    assert all(store is stores[0] for store in stores)
+
+
+def test_identical_requests_keep_their_variants(tmp_path):
+    answers = iter(["yes", "no", "yes"])
+
+    async def create(**params):
+        return completion_cache.ChatCompletion.model_validate(
+            {
+                "id": "completion",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "gpt",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": next(answers)},
+                        "finish_reason": "stop",
+                    }
+                ],
+            }
+        )
+
+    client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+    )
+    params = dict(model="gpt", messages=[{"role": "user", "content": "Answer?"}])
+    path = tmp_path / "cache.db"
+
+    async def ask(mode, times):
+        cache = completion_cache.CompletionCache(mode, path)
+        answers = [
+            (await cache.create(client, **params)).choices[0].message.content
+            for _ in range(times)
+        ]
+        cache.store.close()
+        return answers
+
+    assert asyncio.run(ask("record", 3)) == ["yes", "no", "yes"]
+    # the same question is answered as it was recorded, not always alike
+    assert asyncio.run(ask("cache", 3)) == ["yes", "no", "yes"]
+    assert asyncio.run(ask("replay", 4)) == ["yes", "no", "yes", "yes"]
+
+
+def test_cancel_closes_upstream_stream(monkeypatch):
+    openai = FakeOpenAI(["Hello "], delay=0.01, forever=True)
+
+    async def inner():
+        async with TestServer(openai.app()) as server:
+            use_fake_openai(monkeypatch, server)
+            first_chunk = asyncio.Event()
+
+            async def reply():
+                async for _ in gpt_bot.gpt_bot(1).stream([], 1):
+                    first_chunk.set()
+
+            task = asyncio.create_task(reply())
+            await asyncio.wait_for(first_chunk.wait(), 5)
+            task.cancel()
+            await asyncio.wait_for(openai.disconnected.wait(), 5)
+            return task.cancelled()
+
+    assert asyncio.run(inner())
+
+
+def test_conversation_keeps_latest_messages_within_budget():
+    one = context.count_tokens("Alice: message 0")
+    conversation = Conversation(budget=3 * one)
+    for i in range(10):
+        conversation.append({"sender": "Alice", "text": f"message {i}"})
+    conversation.append({"sender": "Ash", "text": "ok"})
+
+    assert len(conversation) == 3
+    assert conversation.tokens <= 3 * one
+    assert conversation.dropped == 8
+    assert conversation[-1]["text"] == "ok"
+    assert [msg["content"] for msg in conversation.bot_messages()] == [
+        "Alice: message 8",
+        "Alice: message 9",
+        "Ash: ok",
+    ]
+    assert conversation.bot_messages()[-1]["role"] == "assistant"
+
+
+def test_system_prompt_counts_against_budget():
+    one = context.count_tokens("Alice: message 0")
+    conversation = Conversation(budget=3 * one)
+    for i in range(3):
+        conversation.append({"sender": "Alice", "text": f"message {i}"})
+    prompt = "You are Ash"
+
+    messages = conversation.bot_messages(prompt)
+
+    assert messages[0] == {"role": "system", "content": prompt}
+    assert [msg["content"] for msg in messages[1:]] == [
+        "Alice: message 1",
+        "Alice: message 2",
+    ]
+    assert len(conversation) == 3
+    assert conversation.bot_messages("word " * 10_000)[1:] == [
+        {"role": "user", "content": "Alice: message 2"}
+    ]
+
+
+def test_variants_without_stream_yield_whole_message():
+    async def inner():
+        past = [{"sender": "Alice", "text": "Hi"}]
+        return [chunk async for chunk in interaction.stream_bot_message(0, past, 1)]
+
+    assert asyncio.run(inner()) == ["Hi"]
+
+
+def test_rooms_do_not_cancel_each_other():
+    first, second = ReplyScheduler(debounce=0), ReplyScheduler(debounce=0)
+    replied = []
+
+    def reply(name):
+        async def inner():
+            await asyncio.sleep(0.05)
+            replied.append(name)
+            return True
+
+        return inner
+
+    async def inner():
+        await asyncio.gather(
+            first.schedule(1, reply("first")), second.schedule(2, reply("second"))
+        )
+
+    asyncio.run(inner())
+    assert sorted(replied) == ["first", "second"]
+    assert first.stats["delivered"] == second.stats["delivered"] == 1
+
+
+def test_bursts_are_coalesced():
+    replies = ReplyScheduler(debounce=0.05)
+    calls = []
+
+    async def reply():
+        calls.append(len(calls))
+        return False
+
+    async def inner():
+        for _ in range(3):
+            task = replies.schedule(1, reply)
+            await asyncio.sleep(0.01)
+        await task
+
+    asyncio.run(inner())
+    assert calls == [0]
+    assert replies.stats["coalesced"] == 2
+    assert replies.stats["skipped"] == 1
+    assert replies.pending() == 0
+
+
+def test_llm_calls_are_bounded(monkeypatch):
+    monkeypatch.setattr(reply_scheduler, "MAX_CONCURRENT_REPLIES", 2)
+    in_flight = []
+    peak = []
+
+    def bot():
+        replies = ReplyScheduler(debounce=0)
+
+        async def reply():
+            async with replies.llm():
+                in_flight.append(1)
+                peak.append(len(in_flight))
+                await asyncio.sleep(0.02)
+                in_flight.pop()
+            return True
+
+        return replies.schedule(1, reply)
+
+    async def inner():
+        await asyncio.gather(*(bot() for _ in range(6)))
+
+    asyncio.run(inner())
+    assert max(peak) == 2
+    assert reply_scheduler.reply_metrics()["delivered"] >= 6
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_prompt_cache_refreshes_stale_prompts_in_background():
+    clock = Clock()
+    cache = PromptCache(ttl=10, stale=100, clock=clock)
+    prompts = iter(["first", "second"])
+
+    async def load(etag):
+        return next(prompts), None
+
+    async def inner():
+        assert await cache.get(1, load) == "first"
+        clock.now = 5
+        assert await cache.get(1, load) == "first"
+        clock.now = 50
+        assert await cache.get(1, load) == "first"
+        await asyncio.sleep(0)
+        return await cache.get(1, load)
+
+    assert asyncio.run(inner()) == "second"
+    assert cache.metrics()["fetches"] == 2
+    assert cache.metrics()["hits"] == 2
+
+
+def test_prompt_cache_fetches_once_for_concurrent_requests():
+    cache = PromptCache(ttl=10, stale=0)
+    calls = []
+
+    async def load(etag):
+        calls.append(etag)
+        await asyncio.sleep(0.01)
+        return "prompt", '"v1"'
+
+    async def inner():
+        return await asyncio.gather(*(cache.get(1, load) for _ in range(5)))
+
+    assert asyncio.run(inner()) == ["prompt"] * 5
+    assert calls == [None]
+
+
+def test_prompt_cache_serves_last_prompt_when_upstream_fails():
+    clock = Clock()
+    cache = PromptCache(ttl=10, stale=0, clock=clock)
+
+    async def load(etag):
+        return "prompt", None
+
+    async def fail(etag):
+        raise prompt_cache.PromptUnavailable("down")
+
+    async def inner():
+        assert await cache.get(1, fail) == ""
+        assert await cache.get(1, load) == "prompt"
+        clock.now = 1000
+        return await cache.get(1, fail)
+
+    assert asyncio.run(inner()) == "prompt"
+    assert cache.metrics()["errors"] == 2
+
+
+def test_prompt_cache_keeps_unexpected_errors_out_of_background_refreshes():
+    clock = Clock()
+    cache = PromptCache(ttl=10, stale=100, clock=clock)
+    loop_errors = []
+
+    async def load(etag):
+        return "prompt", None
+
+    async def broken(etag):
+        raise RuntimeError("bug")
+
+    async def inner():
+        asyncio.get_running_loop().set_exception_handler(
+            lambda loop, context: loop_errors.append(context)
+        )
+        assert await cache.get(1, broken) == ""
+        assert await cache.get(1, load) == "prompt"
+        clock.now = 50
+        assert await cache.get(1, broken) == "prompt"
+        await asyncio.sleep(0)
+        return cache._fetches
+
+    assert asyncio.run(inner()) == {}
+    assert cache.metrics()["errors"] == 2
+    assert loop_errors == []
+
+
+def test_prompt_fetch_revalidates_with_etag(monkeypatch):
+    monkeypatch.setattr(prompt_cache, "cache", PromptCache(ttl=0, stale=0))
+    requests = []
+
+    async def prompt(request):
+        requests.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304)
+        return web.Response(text="Be nice.", headers={"ETag": '"v1"'})
+
+    async def inner():
+        app = web.Application()
+        app.router.add_get("/prompt", prompt)
+        async with TestServer(app) as server:
+            monkeypatch.setenv("POLYBOX_URL", str(server.make_url("/prompt")))
+            fetch_prompt = interaction.polybox_prompt.fetch_prompt
+            prompts = [await fetch_prompt(1) for _ in range(2)]
+            await get_client().close()
+            return prompts
+
+    assert asyncio.run(inner()) == ["Be nice.", "Be nice."]
+    assert requests == [None, '"v1"']
+    assert prompt_cache.cache.metrics()["not_modified"] == 1
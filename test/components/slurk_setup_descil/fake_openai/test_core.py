@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+import pytest
+from aiohttp.test_utils import TestServer
+from openai import AsyncAzureOpenAI, AsyncOpenAI, InternalServerError
+from slurk_setup_descil.fake_openai import FakeOpenAI, core
+
+
+def test_sample():
+    assert core is not None
+
+
+def run(fake, request):
+    async def inner():
+        async with TestServer(fake.app()) as server:
+            client = AsyncOpenAI(
+                api_key="key", base_url=str(server.make_url("/v1")), max_retries=0
+            )
+            return await request(client)
+
+    return asyncio.run(inner())
+
+
+def test_completion():
+    fake = FakeOpenAI(latency=0, tokens_per_second=0, seed=1)
+
+    async def request(client):
+        return await client.chat.completions.create(
+            model="gpt", messages=[{"role": "user", "content": "Alice: Hi there"}]
+        )
+
+    response = run(fake, request)
+    assert response.choices[0].message.content.startswith("Ash: ")
+    assert response.usage.prompt_tokens == 3
+    assert fake.stats["requests"] == 1
+
+
+def test_stream():
+    fake = FakeOpenAI(latency=0, tokens_per_second=0, replies=["one two three"])
+
+    async def request(client):
+        stream = await client.chat.completions.create(
+            model="gpt", messages=[{"role": "user", "content": "Hi"}], stream=True
+        )
+        return [
+            chunk.choices[0].delta.content
+            async for chunk in stream
+            if chunk.choices[0].delta.content
+        ]
+
+    assert run(fake, request) == ["Ash: ", "one ", "two ", "three"]
+
+
+def test_gating_and_json_decisions():
+    fake = FakeOpenAI(latency=0, tokens_per_second=0, answer_rate=0)
+
+    async def request(client):
+        question = await client.chat.completions.create(
+            model="gpt",
+            messages=[{"role": "user", "content": "Please answer only yes or no."}],
+        )
+        decision = await client.chat.completions.create(
+            model="gpt",
+            messages=[{"role": "user", "content": "Decide"}],
+            response_format={"type": "json_object"},
+        )
+        return question.choices[0].message.content, decision.choices[0].message
+
+    answer, decision = run(fake, request)
+    assert answer == "no"
+    assert json.loads(decision.content) == {"answer": False}
+
+
+def test_errors():
+    fake = FakeOpenAI(latency=0, error_rate=1)
+
+    async def request(client):
+        await client.chat.completions.create(model="gpt", messages=[])
+
+    with pytest.raises(InternalServerError):
+        run(fake, request)
+    assert fake.stats["errors"] == 1
+
+
+def test_azure_deployment():
+    fake = FakeOpenAI(latency=0, tokens_per_second=0)
+
+    async def inner():
+        async with TestServer(fake.app()) as server:
+            client = AsyncAzureOpenAI(
+                api_key="key",
+                api_version="2023-12-01-preview",
+                azure_endpoint=str(server.make_url("")),
+            )
+            return await client.chat.completions.create(
+                model="css-openai-gpt35", messages=[{"role": "user", "content": "Hi"}]
+            )
+
+    assert asyncio.run(inner()).model == "css-openai-gpt35"
@@ -0,0 +1,38 @@
+import json
+
+from slurk_setup_descil.loadtest import core, percentile, regressions, summarize
+
+
+def test_sample():
+    assert core is not None
+
+
+def test_percentile():
+    values = [0.4, 0.1, 0.3, 0.2, 0.5]
+    assert percentile(values, 50) == 0.3
+    assert percentile(values, 100) == 0.5
+    assert abs(percentile(values, 95) - 0.48) < 1e-9
+    assert percentile([], 50) is None
+
+
+def test_summarize():
+    assert summarize([]) == {"count": 0}
+    assert summarize([1.0])["p99"] == 1.0
+
+
+def test_parse_stats():
+    line = json.dumps(
+        {"Name": "chatbot-1", "CPUPerc": "12.50%", "MemUsage": "64MiB / 1.5GiB"}
+    )
+    assert core.parse_stats(line) == ("chatbot-1", 12.5, 64.0)
+    assert core.parse_stats("not json") == (None, None, None)
+
+
+def test_regressions():
+    def results(p95):
+        return {"latencies": {"fanout": {"count": 10, "p95": p95}}}
+
+    assert regressions(results(0.11), results(0.1), 0.2) == {}
+    assert regressions(results(0.2), results(0.1), 0.2) == {
+        "fanout": {"baseline": 0.1, "p95": 0.2}
+    }
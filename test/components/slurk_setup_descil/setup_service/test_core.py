@@ -1,5 +1,130 @@
+import asyncio
+import itertools
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
 from slurk_setup_descil.setup_service import core
+from slurk_setup_descil.slurk_api import close_client
 
 
 def test_sample():
     assert core is not None
+
+
+class FakeSlurk:
+    def __init__(self, delay=0.02, fail=None):
+        self.delay = delay
+        self.fail = fail
+        self.ids = itertools.count(1)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+        self.registered = None
+        self.tokens_requested = asyncio.Event()
+
+    async def create(self, request):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            table = request.match_info["table"]
+            self.calls.append(table)
+            if table == "tokens":
+                self.tokens_requested.set()
+            if self.fail is not None and await request.json() == self.fail:
+                # fail while the concierge branch is creating its token
+                await self.tokens_requested.wait()
+                return web.Response(status=500)
+            await asyncio.sleep(self.delay)
+            return web.json_response({"id": next(self.ids)})
+        finally:
+            self.in_flight -= 1
+
+    async def create_bulk(self, request):
+        self.calls.append("tokens/bulk")
+        count = (await request.json())["count"]
+        return web.json_response({"ids": [str(next(self.ids)) for _ in range(count)]})
+
+    async def register(self, request):
+        self.registered = await request.json()
+        return web.Response()
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post("/slurk/api/tokens/bulk", self.create_bulk)
+        app.router.add_post("/slurk/api/{table}", self.create)
+        app.router.add_post("/register", self.register)
+        return app
+
+
+def test_provision_experiment_runs_concurrently():
+    slurk = FakeSlurk()
+    setup = dict(
+        api_token="token",
+        num_users=5,
+        chat_room_timeout_seconds=20,
+        waiting_room_conciergebot_name="Concierge",
+    )
+
+    async def inner():
+        server = TestServer(slurk.app())
+        await server.start_server()
+        uri = str(server.make_url("")).rstrip("/")
+        try:
+            return await core.provision_experiment(uri, uri, setup, max_concurrency=3)
+        finally:
+            await close_client()
+            await server.close()
+
+    timings = asyncio.run(inner())
+
+    assert set(timings) == {
+        "waiting_room",
+        "chat_room",
+        "user_tokens",
+        "concierge_user",
+        "register_concierge",
+        "total",
+    }
+    assert len(setup["user_tokens"]) == 5
+    assert slurk.calls.count("tokens/bulk") == 1
+    assert slurk.calls.count("tokens") == 1
+    assert 1 < slurk.max_in_flight <= 3
+    assert slurk.registered["concierge_user"] == setup["concierge_user"]
+    assert slurk.registered["chat_room_id"] == setup["chat_room_id"]
+
+
+def test_failed_provisioning_cancels_every_branch():
+    slurk = FakeSlurk(delay=0.05, fail=core.MESSAGE_PERMISSIONS)
+    setup = dict(
+        api_token="token",
+        num_users=5,
+        chat_room_timeout_seconds=20,
+        waiting_room_conciergebot_name="Concierge",
+    )
+
+    async def inner():
+        server = TestServer(slurk.app())
+        await server.start_server()
+        uri = str(server.make_url("")).rstrip("/")
+        try:
+            try:
+                await core.provision_experiment(uri, uri, setup)
+            except Exception as e:
+                failure = e
+            branches = [
+                task
+                for task in asyncio.all_tasks()
+                if getattr(task.get_coro(), "cr_code", None) is core._timed.__code__
+            ]
+            return failure, branches
+        finally:
+            await close_client()
+            await server.close()
+
+    failure, branches = asyncio.run(inner())
+    assert failure is not None
+    # the concierge branch was creating its token and must not go on
+    assert "tokens" in slurk.calls
+    assert branches == []
+    assert "users" not in slurk.calls
+    assert "user_tokens" not in setup
@@ -0,0 +1,41 @@
+import asyncio
+
+from slurk_setup_descil.timers import Timers, core
+
+
+def test_sample():
+    assert core is not None
+
+
+def test_timers_fire_in_order():
+    async def run():
+        timers = Timers()
+        fired = []
+        timers.call_later(0.03, fired.append, "late")
+        timers.call_later(0.01, fired.append, "early")
+        cancelled = timers.call_later(0.02, fired.append, "cancelled")
+        cancelled.cancel()
+        await asyncio.sleep(0.1)
+        return fired, timers.metrics()
+
+    fired, metrics = asyncio.run(run())
+    assert fired == ["early", "late"]
+    assert metrics["fired"] == 2
+    assert metrics["cancelled"] == 1
+    assert metrics["pending"] == 0
+    # one wakeup per deadline, no polling
+    assert metrics["wakeups"] == 2
+
+
+def test_coroutine_callbacks_run_as_tasks():
+    async def run():
+        timers = Timers()
+        done = asyncio.Event()
+
+        async def callback():
+            done.set()
+
+        timers.call_later(0, callback)
+        await asyncio.wait_for(done.wait(), 1)
+
+    asyncio.run(run())